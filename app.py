@@ -6,41 +6,101 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-from flask import Flask
+from flask import Flask, jsonify
 from flask_socketio import SocketIO
+from sqlalchemy import exc as sa_exc
 from config import Config
-from routes.api import api_bp
-from routes.views import views_bp
-
-app = Flask(__name__)
-app.config.from_object(Config)
-socketio = SocketIO(app, cors_allowed_origins="*")
-
-from routes.management import management_bp
-from routes.device import device_bp
-from routes.user_devices import user_devices_bp
-from routes.camera_api import camera_api_bp
-
-# Register Blueprints
-app.register_blueprint(api_bp)
-app.register_blueprint(views_bp)
-app.register_blueprint(management_bp)
-app.register_blueprint(device_bp)
-app.register_blueprint(user_devices_bp)
-app.register_blueprint(camera_api_bp)
-
-# Initialize DB
 from models import db
-db.init_app(app)
 
-# Register Socket Events
+socketio = SocketIO()
+
+# Register Socket Events (handlers are kept on the SocketIO object and bound on init_app)
 from routes.terminal_socket import register_socket_events
 from routes.camera_socket import register_camera_socket_events
+from routes.command_socket import register_command_socket_events
+from routes.device_socket import register_device_socket_events
 register_socket_events(socketio)
 register_camera_socket_events(socketio)
+register_command_socket_events(socketio)
+register_device_socket_events(socketio)
+
+
+def create_app(config_object=Config):
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    from services.json_codec import ORJSONProvider
+    app.json = ORJSONProvider(app)
+
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        async_mode=app.config.get("ASYNC_MODE"),
+        message_queue=app.config.get("SOCKETIO_MESSAGE_QUEUE")
+    )
+
+    from routes.api import api_bp
+    from routes.views import views_bp
+    from routes.management import management_bp
+    from routes.device import device_bp
+    from routes.user_devices import user_devices_bp
+    from routes.camera_api import camera_api_bp
+    from routes.health import health_bp
+
+    # Register Blueprints
+    app.register_blueprint(api_bp)
+    app.register_blueprint(views_bp)
+    app.register_blueprint(management_bp)
+    app.register_blueprint(device_bp)
+    app.register_blueprint(user_devices_bp)
+    app.register_blueprint(camera_api_bp)
+    app.register_blueprint(health_bp)
+
+    # Initialize DB. No connection is made here: the schema is owned by
+    # `python -m migrations`, and the pool connects on first use.
+    from services.db_pool import engine_options
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
+    db.init_app(app)
+
+    from services.pagination import PaginationError
+    from services.device_sync import CursorExpired
+    from services.device_payload import PayloadError
+
+    @app.errorhandler(PaginationError)
+    def handle_bad_page(e):
+        return jsonify({"error": str(e)}), 400
+
+    @app.errorhandler(PayloadError)
+    def handle_bad_payload(e):
+        return jsonify({"error": str(e)}), e.status
+
+    @app.errorhandler(CursorExpired)
+    def handle_expired_cursor(e):
+        return jsonify({"error": "since cursor expired, reload with since=0", "resync": True}), 410
+
+    @app.errorhandler(sa_exc.TimeoutError)
+    def handle_pool_timeout(e):
+        # Pool exhausted: shed load instead of queueing more requests behind it
+        db.session.rollback()
+        return jsonify({"error": "Database busy, retry later"}), 503, {"Retry-After": "1"}
+
+    return app
+
+
+def __getattr__(name):
+    # `from app import app` (scripts, older entry points) still works, but importing
+    # this module no longer builds an app; wsgi.py calls create_app() itself.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-with app.app_context():
-    db.create_all()
 
 if __name__ == "__main__":
-    socketio.run(app, host="0.0.0.0", port=Config.FLASK_PORT, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    # Development server only; production goes through wsgi.py
+    from services.device_sweeper import start_sweeper
+    from services.socket_registry import start_heartbeat
+    app = create_app()
+    start_sweeper(app, socketio)
+    start_heartbeat(socketio)
+    socketio.run(app, host="0.0.0.0", port=Config.FLASK_PORT, debug=Config.FLASK_DEBUG, allow_unsafe_werkzeug=True)
@@ -10,13 +10,84 @@ class Config:
     AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
     AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
     S3_BUCKET = os.getenv("S3_BUCKET_NAME", "uploads")
+    UPLOAD_PART_SIZE_BYTES = int(os.getenv("UPLOAD_PART_SIZE_BYTES", 8 * 1024 * 1024)) # POST /upload multipart part size (min 5 MiB)
+    USER_QUOTA_BYTES = int(os.getenv("USER_QUOTA_BYTES", 0)) # Per-user storage limit, 0 = unlimited
+    # Artifact download proxy (GET /update/artifacts/<id>/download): devices fetch through a
+    # local disk cache instead of each reading the object from SeaweedFS
+    ARTIFACT_PROXY_ENABLED = os.getenv("ARTIFACT_PROXY_ENABLED", "False").lower() in ("true", "1", "yes")
+    ARTIFACT_PROXY_BASE_URL = os.getenv("ARTIFACT_PROXY_BASE_URL") # Public base for the proxy links in /update/check
+    ARTIFACT_ORPHAN_GRACE_HOURS = int(os.getenv("ARTIFACT_ORPHAN_GRACE_HOURS", 24)) # Unreferenced objects younger than this are in-flight uploads
+    ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "/tmp/artifact-cache")
+    ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", 10 * 1024 ** 3))
+    S3_DELETE_CONCURRENCY = int(os.getenv("S3_DELETE_CONCURRENCY", 4)) # DeleteObjects calls in flight per bulk delete
+    S3_CONNECT_TIMEOUT_SECONDS = float(os.getenv("S3_CONNECT_TIMEOUT_SECONDS", 10))
+    HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", 2)) # Per dependency in /readyz
     FLASK_PORT = int(os.getenv("FLASK_PORT", 5000))
+    FLASK_DEBUG = os.getenv("FLASK_DEBUG", "false").lower() == "true"
+    # Serving: eventlet or gevent in production (see wsgi.py / gunicorn.conf.py)
+    ASYNC_MODE = os.getenv("ASYNC_MODE") or None
+    WORKER_CONNECTIONS = int(os.getenv("WORKER_CONNECTIONS", 5000)) # Max concurrent sockets per worker
     AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8080")
     # Database Config
     DB_USER = os.getenv("POSTGRES_USER", "ins001")
     DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "123456")
     DB_HOST = os.getenv("POSTGRES_HOST", "72.60.102.111")
     DB_NAME = os.getenv("POSTGRES_DB", "ins001db")
-    SQLALCHEMY_DATABASE_URI = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+    # Explicit driver: psycopg2 is what Requirements.txt installs and what wsgi.py makes cooperative
+    SQLALCHEMY_DATABASE_URI = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool (see services/db_pool.py). A short pool timeout makes request
+    # bursts fail fast with 503 instead of stalling every worker on checkout.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 3)) # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800)) # Seconds
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv("DB_CONNECT_TIMEOUT_SECONDS", 5))
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000)) # 0 disables
     SUPER_ADMIN_ID = os.getenv("SUPER_ADMIN_ID")
+    PERMISSIONS_CACHE_TTL_SECONDS = int(os.getenv("PERMISSIONS_CACHE_TTL_SECONDS", 60)) # Backstop for missed invalidations
+    SOCKET_OWNERSHIP_MISS_TTL_SECONDS = float(os.getenv("SOCKET_OWNERSHIP_MISS_TTL_SECONDS", 5)) # Refused socket joins are not re-queried for this long
+    # Shared Socket.IO state. When set, room emits go through the message queue and the
+    # authoritative-SID registry lives in Redis, so several workers/nodes can serve sockets.
+    REDIS_URL = os.getenv("REDIS_URL")
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", REDIS_URL)
+    SOCKET_REGISTRY_HEARTBEAT_SECONDS = float(os.getenv("SOCKET_REGISTRY_HEARTBEAT_SECONDS", 15))
+    SOCKET_REGISTRY_WORKER_TIMEOUT_SECONDS = float(os.getenv("SOCKET_REGISTRY_WORKER_TIMEOUT_SECONDS", 60)) # Then its SIDs are released
+    # List endpoints (services/pagination.py)
+    PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", 100))
+    PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", 1000))
+    DEVICE_OFFLINE_AFTER_SECONDS = int(os.getenv("DEVICE_OFFLINE_AFTER_SECONDS", 90)) # No heartbeat for this long = offline
+    DEVICE_SWEEPER_ENABLED = os.getenv("DEVICE_SWEEPER_ENABLED", "True").lower() in ("true", "1", "yes")
+    DEVICE_SWEEP_INTERVAL_SECONDS = float(os.getenv("DEVICE_SWEEP_INTERVAL_SECONDS", 10))
+    DEVICE_SWEEP_BATCH_SIZE = int(os.getenv("DEVICE_SWEEP_BATCH_SIZE", 1000))
+    DEVICE_SUMMARY_TTL_SECONDS = float(os.getenv("DEVICE_SUMMARY_TTL_SECONDS", 10))
+    DEVICE_SYNC_GRACE_SECONDS = int(os.getenv("DEVICE_SYNC_GRACE_SECONDS", 5)) # Longest expected devices write transaction
+    DEVICE_TOMBSTONE_RETENTION_DAYS = int(os.getenv("DEVICE_TOMBSTONE_RETENTION_DAYS", 7)) # Older ?since= cursors must resync
+    DEVICE_MAX_BODY_BYTES = int(os.getenv("DEVICE_MAX_BODY_BYTES", 8 * 1024 * 1024)) # Device request bodies, after decompression
+    # Device log storage (services/log_store.py)
+    LOG_COMPRESSION = os.getenv("LOG_COMPRESSION", "gzip") # gzip or zstd (needs zstandard)
+    LOG_INLINE_MAX_BYTES = int(os.getenv("LOG_INLINE_MAX_BYTES", 64 * 1024)) # Larger compressed segments go to S3
+    LOG_MAX_CHUNK_BYTES = int(os.getenv("LOG_MAX_CHUNK_BYTES", 4 * 1024 * 1024))
+    LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", 30))
+    LOG_COMPACT_TARGET_BYTES = int(os.getenv("LOG_COMPACT_TARGET_BYTES", 1024 * 1024)) # Uncompressed
+    LOG_SEARCH_MAX_CHARS = int(os.getenv("LOG_SEARCH_MAX_CHARS", 200000)) # Text indexed per segment/snapshot
+    LOG_STREAM_POLL_SECONDS = float(os.getenv("LOG_STREAM_POLL_SECONDS", 2)) # Cross-worker tail latency
+    LOG_STREAM_MAX_SECONDS = int(os.getenv("LOG_STREAM_MAX_SECONDS", 300)) # Clients reconnect with Last-Event-ID
+    LOG_STREAM_DEFAULT_TAIL = int(os.getenv("LOG_STREAM_DEFAULT_TAIL", 64 * 1024)) # Bytes replayed on first connect
+    # ?token= for the log stream, since EventSource cannot send an Authorization header.
+    # Signed with this secret, which must be the same on every worker; unset disables them.
+    STREAM_TOKEN_SECRET = os.getenv("STREAM_TOKEN_SECRET")
+    STREAM_TOKEN_TTL_SECONDS = int(os.getenv("STREAM_TOKEN_TTL_SECONDS", 60)) # To open (or reopen) a stream
+    # Device command queue (services/command_queue.py)
+    COMMAND_LEASE_SECONDS = int(os.getenv("COMMAND_LEASE_SECONDS", 120)) # Unacknowledged commands are re-sent after this
+    COMMAND_MAX_ATTEMPTS = int(os.getenv("COMMAND_MAX_ATTEMPTS", 3)) # Then the command is marked timed_out
+    COMMAND_RETRY_BACKOFF_SECONDS = int(os.getenv("COMMAND_RETRY_BACKOFF_SECONDS", 15)) # Doubles per attempt
+    COMMAND_RETRY_BACKOFF_MAX_SECONDS = int(os.getenv("COMMAND_RETRY_BACKOFF_MAX_SECONDS", 600))
+    COMMAND_CLAIM_LIMIT = int(os.getenv("COMMAND_CLAIM_LIMIT", 20)) # Per heartbeat
+    COMMAND_OUTPUT_MAX_CHUNK_BYTES = int(os.getenv("COMMAND_OUTPUT_MAX_CHUNK_BYTES", 256 * 1024))
+    COMMAND_OUTPUT_INLINE_MAX_BYTES = int(os.getenv("COMMAND_OUTPUT_INLINE_MAX_BYTES", 16 * 1024)) # Compressed; larger goes to S3
+    COMMAND_RESULT_INLINE_MAX_CHARS = int(os.getenv("COMMAND_RESULT_INLINE_MAX_CHARS", 64 * 1024)) # Longer final results become an output chunk
+    # Terminal relay
+    TERMINAL_COALESCE_MS = float(os.getenv("TERMINAL_COALESCE_MS", 8)) # 0 disables output batching
+    TERMINAL_LOG_SAMPLE_EVERY = int(os.getenv("TERMINAL_LOG_SAMPLE_EVERY", 1000))
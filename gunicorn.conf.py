@@ -0,0 +1,25 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_async_mode = os.getenv("ASYNC_MODE") or "eventlet"
+
+bind = f"0.0.0.0:{os.getenv('FLASK_PORT', 5000)}"
+
+# Socket.IO needs sticky sessions, which gunicorn cannot provide across its own
+# workers. Keep one worker per gunicorn and scale out with more containers behind
+# a sticky load balancer, sharing state via SOCKETIO_MESSAGE_QUEUE.
+workers = int(os.getenv("WEB_WORKERS", 1))
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", 5000))
+
+if _async_mode == "gevent":
+    worker_class = "geventwebsocket.gunicorn.workers.GeventWebSocketWorker"
+else:
+    worker_class = "eventlet"
+
+# Long-lived websockets; the async workers heartbeat independently of requests
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+keepalive = 5
+graceful_timeout = 30
+accesslog = "-"
@@ -1,42 +1,109 @@
 from functools import wraps
 from flask import request, g, jsonify
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 import requests
 import logging
 from config import Config
 
 logger = logging.getLogger("seaweed-flask")
 
+STREAM_TOKEN_SALT = "stream-token"
+
+
+class AuthError(Exception):
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def verify_token(auth_header):
+    """
+    Verifies an Authorization header value against the auth service and
+    returns the user_id as a string. Raises AuthError (401, or 503 when the
+    auth service cannot be reached).
+    """
+    if not auth_header:
+        raise AuthError("Missing Authorization header")
+
+    # Remote verification
+    try:
+        resp = requests.get(
+            f"{Config.AUTH_SERVICE_URL}/api/token/verify",
+            headers={"Authorization": auth_header},
+            timeout=5
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Auth Service unreachable: {e}")
+        raise AuthError("Authentication unavailable", 503)
+
+    if resp.status_code != 200:
+        logger.warning(f"Auth failed: {resp.status_code} {resp.text}")
+        raise AuthError("Unauthorized")
+
+    # Parse user user_id from response
+    # TokenController returns: {"isValid": true, "user_id": 123}
+    try:
+        user_id = resp.json().get("user_id")
+    except ValueError:
+        user_id = None
+    if not user_id:
+        raise AuthError("Invalid token payload")
+
+    return str(user_id) # Convert to string for S3 prefixes
+
+
 def require_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            return jsonify({"error": "Missing Authorization header"}), 401
+        try:
+            g.user_id = verify_token(request.headers.get("Authorization"))
+        except AuthError as e:
+            return jsonify({"error": e.message}), e.status
 
-        # Remote verification
+        return f(*args, **kwargs)
+    return decorated
+
+
+def _stream_serializer():
+    if not Config.STREAM_TOKEN_SECRET:
+        raise AuthError("Stream tokens are not configured", 503)
+    return URLSafeTimedSerializer(Config.STREAM_TOKEN_SECRET, salt=STREAM_TOKEN_SALT)
+
+
+def issue_stream_token(user_id, path):
+    """
+    A token for `path` only, valid for STREAM_TOKEN_TTL_SECONDS, that stands in
+    for the Authorization header where a browser cannot send one (EventSource).
+    """
+    return _stream_serializer().dumps({"user_id": str(user_id), "path": path})
+
+
+def verify_stream_token(token, path):
+    """Returns the user_id a stream token was issued to. Raises AuthError."""
+    try:
+        payload = _stream_serializer().loads(token, max_age=Config.STREAM_TOKEN_TTL_SECONDS)
+    except SignatureExpired:
+        raise AuthError("Stream token expired")
+    except BadSignature:
+        raise AuthError("Invalid stream token")
+    if payload.get("path") != path:
+        raise AuthError("Stream token not valid for this URL")
+    return payload["user_id"]
+
+
+def require_auth_or_stream_token(f):
+    """require_auth, or ?token= from issue_stream_token() for this exact path."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.args.get("token")
         try:
-            resp = requests.get(
-                f"{Config.AUTH_SERVICE_URL}/api/token/verify",
-                headers={"Authorization": auth_header},
-                timeout=5
-            )
-            
-            if resp.status_code != 200:
-                logger.warning(f"Auth failed: {resp.status_code} {resp.text}")
-                return jsonify({"error": "Unauthorized"}), 401
-            
-            # Parse user user_id from response
-            data = resp.json()
-            # TokenController returns: {"isValid": true, "user_id": 123}
-            user_id = data.get("user_id")
-            if not user_id:
-                 return jsonify({"error": "Invalid token payload"}), 401
-
-            g.user_id = str(user_id) # Convert to string for S3 prefixes
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Auth Service unreachable: {e}")
-            return jsonify({"error": "Authentication unavailable"}), 503
+            if token and not request.headers.get("Authorization"):
+                g.user_id = verify_stream_token(token, request.path)
+            else:
+                g.user_id = verify_token(request.headers.get("Authorization"))
+        except AuthError as e:
+            return jsonify({"error": e.message}), e.status
 
         return f(*args, **kwargs)
     return decorated
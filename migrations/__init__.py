@@ -0,0 +1,126 @@
+"""
+Versioned schema migrations.
+
+    python -m migrations            # apply pending migrations
+    python -m migrations status     # list applied / pending versions
+
+Each module in migrations/versions is named NNNN_description.py and defines
+upgrade(conn). Modules that set TRANSACTIONAL = False (e.g. CREATE INDEX
+CONCURRENTLY, which cannot run inside a transaction) are executed in
+autocommit mode and must be safe to re-run.
+"""
+import importlib
+import logging
+import pkgutil
+from datetime import datetime
+from sqlalchemy import text
+
+logger = logging.getLogger("seaweed-flask")
+
+VERSIONS_PACKAGE = "migrations.versions"
+ADVISORY_LOCK_ID = 7301001 # Serializes migration runs across pods
+
+
+def discover():
+    """Returns [(version, module)] sorted by version."""
+    package = importlib.import_module(VERSIONS_PACKAGE)
+    migrations = []
+    for info in pkgutil.iter_modules(package.__path__):
+        version = info.name.split("_", 1)[0]
+        if not version.isdigit():
+            continue
+        migrations.append((version, importlib.import_module(f"{VERSIONS_PACKAGE}.{info.name}")))
+    return sorted(migrations, key=lambda m: m[0])
+
+
+def ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version VARCHAR(32) PRIMARY KEY,"
+        " description VARCHAR(255),"
+        " applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(conn):
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def _record(conn, version, module):
+    description = (module.__doc__ or "").strip().split("\n")[0][:255]
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+        {"v": version, "d": description, "t": datetime.utcnow()}
+    )
+
+
+def upgrade(engine):
+    """Applies every pending migration in order. Returns the versions applied."""
+    is_postgres = engine.dialect.name == "postgresql"
+    applied = []
+
+    with engine.connect() as lock_conn:
+        if is_postgres:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+        try:
+            with engine.begin() as conn:
+                ensure_version_table(conn)
+                done = applied_versions(conn)
+
+            for version, module in discover():
+                if version in done:
+                    continue
+                logger.info(f"Applying migration {version} ({module.__name__})")
+
+                if getattr(module, "TRANSACTIONAL", True):
+                    with engine.begin() as conn:
+                        module.upgrade(conn)
+                        _record(conn, version, module)
+                else:
+                    with engine.connect() as conn:
+                        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+                        module.upgrade(conn)
+                        _record(conn, version, module)
+                applied.append(version)
+        finally:
+            if is_postgres:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+                lock_conn.commit()
+
+    return applied
+
+
+def status(engine):
+    """Returns [(version, module_name, applied)]."""
+    with engine.begin() as conn:
+        ensure_version_table(conn)
+        done = applied_versions(conn)
+    return [(version, module.__name__.rsplit(".", 1)[1], version in done) for version, module in discover()]
+
+
+def create_index_concurrently(conn, name, table, columns, where=None, unique=False, using=None):
+    """
+    CREATE INDEX CONCURRENTLY that survives a previous interrupted attempt.
+    A failed concurrent build leaves an INVALID index behind, which
+    IF NOT EXISTS would silently keep, so it is dropped and rebuilt.
+    """
+    if conn.dialect.name != "postgresql":
+        conn.execute(text(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+            + (f" WHERE {where}" if where else "")
+        ))
+        return
+
+    valid = conn.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name}).scalar()
+    if valid is False:
+        logger.warning(f"Dropping invalid index {name} left by an interrupted build")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table}"
+        + (f" USING {using}" if using else "")
+        + f" ({columns})"
+        + (f" WHERE {where}" if where else "")
+    ))
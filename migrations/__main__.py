@@ -0,0 +1,28 @@
+import sys
+import logging
+from sqlalchemy import create_engine
+from config import Config
+from migrations import upgrade, status
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "upgrade"
+    engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+
+    if command == "upgrade":
+        applied = upgrade(engine)
+        print(f"Applied {len(applied)} migration(s): {', '.join(applied) or 'none'}")
+    elif command == "status":
+        for version, name, applied in status(engine):
+            print(f"{'[x]' if applied else '[ ]'} {name}")
+    else:
+        print(f"Unknown command: {command} (expected upgrade or status)")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,87 @@
+"""Baseline schema: original tables plus the columns added by the old ad-hoc scripts."""
+from sqlalchemy import (MetaData, Table, Column, ForeignKey, UniqueConstraint, String, Integer, Boolean,
+                        DateTime, Text, JSON, text)
+
+# The schema as it stood before versioned migrations. Later changes belong in
+# later migrations, never here: this must keep creating the same tables.
+metadata = MetaData()
+
+Table(
+    "allowed_uploaders", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("email", String(255), nullable=False),
+    Column("added_by", Integer),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "artifacts", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("device_type", String(50), nullable=False, index=True),
+    Column("artifact_type", String(50), nullable=False),
+    Column("version", String(20), nullable=False),
+    Column("s3_key", String(255), nullable=False),
+    Column("checksum", String(64)),
+    Column("is_active", Boolean),
+    Column("created_at", DateTime),
+    Column("created_by", Integer, nullable=False),
+    UniqueConstraint("device_type", "artifact_type", "version", name="_artifact_version_uc"),
+)
+
+Table(
+    "devices", metadata,
+    Column("device_id", String(255), primary_key=True),
+    Column("device_type", String(50)),
+    Column("current_version", String(50)),
+    Column("last_seen", DateTime),
+    Column("status", String(50)),
+    Column("user_id", String(255), index=True),
+    Column("friendly_name", String(255)),
+    Column("stats", JSON),
+    Column("terminal_requested", Boolean),
+    Column("terminal_port", Integer),
+    Column("available_cameras", JSON),
+    Column("active_camera_command", String(255)),
+)
+
+Table(
+    "device_commands", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("device_id", String(255), ForeignKey("devices.device_id"), nullable=False),
+    Column("command", Text, nullable=False),
+    Column("status", String(20)),
+    Column("result", Text),
+    Column("created_at", DateTime),
+    Column("executed_at", DateTime),
+)
+
+Table(
+    "device_logs", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("device_id", String(255), ForeignKey("devices.device_id"), nullable=False),
+    Column("log_content", Text),
+    Column("log_type", String(50)),
+    Column("created_at", DateTime),
+)
+
+
+def upgrade(conn):
+    # Fresh databases get the tables; existing ones are left alone (checkfirst)
+    metadata.create_all(bind=conn)
+
+    if conn.dialect.name != "postgresql":
+        return
+
+    # Previously scripts/add_stats_column.py, migrate_devices_table.py,
+    # migrate_cameras.py and migrate_terminal.py
+    for column in (
+        "stats JSON",
+        "user_id VARCHAR(255)",
+        "friendly_name VARCHAR(255)",
+        "terminal_requested BOOLEAN DEFAULT FALSE",
+        "terminal_port INTEGER",
+        "available_cameras JSON",
+        "active_camera_command VARCHAR(255)",
+    ):
+        conn.execute(text(f"ALTER TABLE devices ADD COLUMN IF NOT EXISTS {column}"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_devices_user_id ON devices (user_id)"))
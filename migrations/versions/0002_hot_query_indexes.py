@@ -0,0 +1,27 @@
+"""Composite and partial indexes for heartbeat, device log and update-check queries."""
+from migrations import create_index_concurrently
+
+# Built concurrently so production tables stay writable during the build
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    # heartbeat: pending commands for one device, oldest first
+    create_index_concurrently(
+        conn, "ix_device_commands_pending", "device_commands", "device_id, created_at",
+        where="status = 'pending'"
+    )
+    # command lookups by device and status; also covers deletes by device_id
+    create_index_concurrently(
+        conn, "ix_device_commands_device_status", "device_commands", "device_id, status"
+    )
+    # upload_logs / get_device_logs: device + type, newest first
+    create_index_concurrently(
+        conn, "ix_device_logs_device_type_created", "device_logs", "device_id, log_type, created_at"
+    )
+    # check_update: latest active artifact for a device/artifact type
+    # (SQLite stores booleans as 0/1 and only matches the predicate literally)
+    create_index_concurrently(
+        conn, "ix_artifacts_active_lookup", "artifacts", "device_type, artifact_type, created_at",
+        where="is_active = true" if conn.dialect.name == "postgresql" else "is_active = 1"
+    )
@@ -0,0 +1,26 @@
+"""Append-only compressed device log segments."""
+from sqlalchemy import (MetaData, Table, Column, ForeignKey, UniqueConstraint, Index, String, Integer, BigInteger,
+                        DateTime, LargeBinary)
+
+metadata = MetaData()
+Table("devices", metadata, Column("device_id", String(255), primary_key=True)) # Referenced only
+
+Table(
+    "device_log_segments", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("device_id", String(255), ForeignKey("devices.device_id"), nullable=False),
+    Column("log_type", String(50), nullable=False),
+    Column("start_offset", BigInteger, nullable=False),
+    Column("length", Integer, nullable=False),
+    Column("encoding", String(10), nullable=False),
+    Column("stored_size", Integer, nullable=False),
+    Column("data", LargeBinary),
+    Column("s3_key", String(255)),
+    Column("created_at", DateTime),
+    UniqueConstraint("device_id", "log_type", "start_offset", name="_log_segment_offset_uc"),
+    Index("ix_device_log_segments_created_at", "created_at"),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn, tables=[metadata.tables["device_log_segments"]])
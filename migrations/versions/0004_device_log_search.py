@@ -0,0 +1,52 @@
+"""Full-text search documents for device logs (tsvector + GIN)."""
+from sqlalchemy import (MetaData, Table, Column, ForeignKey, Index, String, BigInteger, DateTime, Text,
+                        text)
+from config import Config
+from migrations import create_index_concurrently
+
+# The GIN index is built concurrently
+TRANSACTIONAL = False
+
+metadata = MetaData()
+Table("device_log_segments", metadata, Column("id", String(36), primary_key=True)) # Referenced only
+Table("device_logs", metadata, Column("id", String(36), primary_key=True)) # Referenced only
+
+Table(
+    "device_log_search_docs", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("segment_id", String(36), ForeignKey("device_log_segments.id", ondelete="CASCADE"), index=True),
+    Column("log_id", String(36), ForeignKey("device_logs.id", ondelete="CASCADE"), unique=True),
+    Column("device_id", String(255), nullable=False),
+    Column("device_type", String(50)),
+    Column("log_type", String(50)),
+    Column("start_offset", BigInteger),
+    Column("content", Text),
+    Column("created_at", DateTime),
+    Index("ix_device_log_search_docs_created", "created_at", "id"),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn, tables=[metadata.tables["device_log_search_docs"]])
+
+    if conn.dialect.name != "postgresql":
+        return
+
+    conn.execute(text(
+        "ALTER TABLE device_log_search_docs ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED"
+    ))
+    create_index_concurrently(
+        conn, "ix_device_log_search_docs_vector", "device_log_search_docs", "search_vector",
+        using="gin"
+    )
+
+    # Backfill legacy snapshot rows (append-only segments are indexed as they arrive)
+    conn.execute(text(
+        "INSERT INTO device_log_search_docs (id, log_id, device_id, device_type, log_type, content, created_at) "
+        "SELECT gen_random_uuid()::text, l.id, l.device_id, d.device_type, l.log_type, "
+        "       left(l.log_content, :max_chars), l.created_at "
+        "FROM device_logs l LEFT JOIN devices d ON d.device_id = l.device_id "
+        "WHERE l.log_content IS NOT NULL "
+        "ON CONFLICT (log_id) DO NOTHING"
+    ), {"max_chars": Config.LOG_SEARCH_MAX_CHARS})
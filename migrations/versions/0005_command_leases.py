@@ -0,0 +1,34 @@
+"""Command queue leases, retry counters and the expired-lease index."""
+from sqlalchemy import inspect, text
+from migrations import create_index_concurrently
+
+# The index is built concurrently; each ALTER commits on its own
+TRANSACTIONAL = False
+
+COLUMNS = {
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "max_attempts": "INTEGER NOT NULL DEFAULT 3",
+    "lease_expires_at": "TIMESTAMP",
+    "next_attempt_at": "TIMESTAMP",
+}
+
+
+def upgrade(conn):
+    # Constant defaults are metadata-only on PostgreSQL 11+, so no table rewrite
+    existing = {column["name"] for column in inspect(conn).get_columns("device_commands")}
+    for name, ddl in COLUMNS.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE device_commands ADD COLUMN {name} {ddl}"))
+
+    # Commands left 'sent' by the old heartbeat have no lease; re-sending them
+    # now could replay something long stale, so close them out instead
+    conn.execute(text(
+        "UPDATE device_commands SET status = 'timed_out'"
+        " WHERE status = 'sent' AND lease_expires_at IS NULL"
+    ))
+
+    # lease reaper: expired 'sent' commands across all devices
+    create_index_concurrently(
+        conn, "ix_device_commands_lease", "device_commands", "lease_expires_at",
+        where="status = 'sent'"
+    )
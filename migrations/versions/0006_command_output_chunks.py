@@ -0,0 +1,25 @@
+"""Streamed, sequenced command output chunks."""
+from sqlalchemy import (MetaData, Table, Column, ForeignKey, UniqueConstraint, String, Integer, DateTime,
+                        LargeBinary)
+
+metadata = MetaData()
+Table("device_commands", metadata, Column("id", String(36), primary_key=True)) # Referenced only
+
+Table(
+    "command_output_chunks", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("command_id", String(36), ForeignKey("device_commands.id", ondelete="CASCADE"), nullable=False),
+    Column("seq", Integer, nullable=False),
+    Column("stream", String(10), nullable=False),
+    Column("length", Integer, nullable=False),
+    Column("encoding", String(10), nullable=False),
+    Column("stored_size", Integer, nullable=False),
+    Column("data", LargeBinary),
+    Column("s3_key", String(255)),
+    Column("created_at", DateTime),
+    UniqueConstraint("command_id", "seq", name="_command_output_seq_uc"),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn, tables=[metadata.tables["command_output_chunks"]])
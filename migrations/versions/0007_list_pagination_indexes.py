@@ -0,0 +1,17 @@
+"""Indexes for keyset-paginated device and artifact lists."""
+from migrations import create_index_concurrently
+
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    # /devices?sort=-last_seen: ORDER BY last_seen DESC NULLS LAST, device_id DESC.
+    # SQLite already sorts NULLs lowest, so plain DESC gives the same order there.
+    nulls_last = " NULLS LAST" if conn.dialect.name == "postgresql" else ""
+    create_index_concurrently(
+        conn, "ix_devices_last_seen", "devices", f"last_seen DESC{nulls_last}, device_id DESC"
+    )
+    # /artifacts pages, newest first
+    create_index_concurrently(
+        conn, "ix_artifacts_created", "artifacts", "created_at, id"
+    )
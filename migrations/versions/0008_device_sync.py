@@ -0,0 +1,112 @@
+"""Device revision counter, tombstones and triggers for ?since= sync."""
+from sqlalchemy import MetaData, Table, Column, String, Integer, BigInteger, Boolean, DateTime, inspect, text
+from migrations import create_index_concurrently
+
+TRANSACTIONAL = False
+
+BACKFILL_BATCH = 5000
+
+metadata = MetaData()
+
+# Indexes are built concurrently below
+device_tombstones = Table(
+    "device_tombstones", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("device_id", String(255), nullable=False),
+    Column("user_id", String(255)),
+    Column("deleted", Boolean, nullable=False),
+    Column("revision", BigInteger, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+# The triggers as first shipped: every insert and update takes a new revision
+# (narrowed to list-visible columns by 0012)
+PG_TRIGGERS = (
+    "CREATE SEQUENCE IF NOT EXISTS device_revision_seq",
+    """
+    CREATE OR REPLACE FUNCTION devices_bump_revision() RETURNS trigger AS $$
+    BEGIN
+        NEW.revision := nextval('device_revision_seq');
+        NEW.updated_at := clock_timestamp() AT TIME ZONE 'utc';
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION devices_write_tombstone() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO device_tombstones (device_id, user_id, deleted, revision, created_at)
+            VALUES (OLD.device_id, OLD.user_id, true, nextval('device_revision_seq'), clock_timestamp() AT TIME ZONE 'utc');
+            RETURN OLD;
+        END IF;
+        IF OLD.user_id IS NOT NULL AND OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+            INSERT INTO device_tombstones (device_id, user_id, deleted, revision, created_at)
+            VALUES (OLD.device_id, OLD.user_id, false, nextval('device_revision_seq'), clock_timestamp() AT TIME ZONE 'utc');
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS devices_revision ON devices",
+    "CREATE TRIGGER devices_revision BEFORE INSERT OR UPDATE ON devices "
+    "FOR EACH ROW EXECUTE FUNCTION devices_bump_revision()",
+    "DROP TRIGGER IF EXISTS devices_tombstone ON devices",
+    "CREATE TRIGGER devices_tombstone AFTER UPDATE OF user_id OR DELETE ON devices "
+    "FOR EACH ROW EXECUTE FUNCTION devices_write_tombstone()",
+)
+
+# SQLite has no sequences: take max + 1 over both tables
+SQLITE_NEXT_REVISION = (
+    "(SELECT coalesce(max(r), 0) + 1 FROM ("
+    "SELECT max(revision) AS r FROM devices UNION ALL SELECT max(revision) FROM device_tombstones))"
+)
+SQLITE_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS devices_revision_insert AFTER INSERT ON devices BEGIN
+        UPDATE devices SET revision = {SQLITE_NEXT_REVISION}, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE device_id = NEW.device_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS devices_revision_update AFTER UPDATE ON devices
+    WHEN NEW.revision IS OLD.revision BEGIN
+        UPDATE devices SET revision = {SQLITE_NEXT_REVISION}, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE device_id = NEW.device_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS devices_tombstone_unbind AFTER UPDATE OF user_id ON devices
+    WHEN OLD.user_id IS NOT NULL AND OLD.user_id IS NOT NEW.user_id BEGIN
+        INSERT INTO device_tombstones (device_id, user_id, deleted, revision, created_at)
+        VALUES (OLD.device_id, OLD.user_id, 0, {SQLITE_NEXT_REVISION}, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS devices_tombstone_delete AFTER DELETE ON devices BEGIN
+        INSERT INTO device_tombstones (device_id, user_id, deleted, revision, created_at)
+        VALUES (OLD.device_id, OLD.user_id, 1, {SQLITE_NEXT_REVISION}, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+)
+
+
+def upgrade(conn):
+    existing = {column["name"] for column in inspect(conn).get_columns("devices")}
+    for name, ddl in (("revision", "BIGINT"), ("updated_at", "TIMESTAMP")):
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE devices ADD COLUMN {name} {ddl}"))
+
+    metadata.create_all(bind=conn)
+    for statement in PG_TRIGGERS if conn.dialect.name == "postgresql" else SQLITE_TRIGGERS:
+        conn.exec_driver_sql(statement)
+
+    # Touch existing rows in batches; the trigger assigns each a revision
+    while conn.execute(text(
+        "UPDATE devices SET revision = NULL WHERE device_id IN "
+        "(SELECT device_id FROM devices WHERE revision IS NULL LIMIT :n)"
+    ), {"n": BACKFILL_BATCH}).rowcount:
+        pass
+
+    create_index_concurrently(conn, "ix_devices_revision", "devices", "revision")
+    create_index_concurrently(conn, "ix_devices_user_revision", "devices", "user_id, revision")
+    create_index_concurrently(conn, "ix_device_tombstones_revision", "device_tombstones", "revision")
+    create_index_concurrently(conn, "ix_device_tombstones_user_revision", "device_tombstones", "user_id, revision")
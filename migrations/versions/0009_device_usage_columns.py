@@ -0,0 +1,10 @@
+"""Device CPU/memory/disk usage columns for the fleet summary."""
+from sqlalchemy import inspect, text
+
+
+def upgrade(conn):
+    # Filled in by the next heartbeat of each device
+    existing = {column["name"] for column in inspect(conn).get_columns("devices")}
+    for name in ("cpu_percent", "memory_percent", "disk_percent"):
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE devices ADD COLUMN {name} DOUBLE PRECISION"))
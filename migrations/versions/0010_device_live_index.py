@@ -0,0 +1,11 @@
+"""Partial index of live (not offline) devices by last heartbeat, for the offline sweeper."""
+from migrations import create_index_concurrently
+
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    create_index_concurrently(
+        conn, "ix_devices_live_last_seen", "devices", "last_seen",
+        where="status IS DISTINCT FROM 'offline'" if conn.dialect.name == "postgresql" else "status IS NOT 'offline'"
+    )
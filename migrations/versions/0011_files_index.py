@@ -0,0 +1,31 @@
+"""Per-user file metadata and storage totals (filled by the first reconciliation)."""
+from sqlalchemy import MetaData, Table, Column, Index, String, Integer, BigInteger, DateTime
+
+metadata = MetaData()
+
+Table(
+    "files", metadata,
+    Column("key", String(1024), primary_key=True),
+    Column("user_id", String(255), nullable=False),
+    Column("name", String(1024), nullable=False),
+    Column("size", BigInteger, nullable=False),
+    Column("content_type", String(255)),
+    Column("etag", String(128)),
+    Column("sha256", String(64)),
+    Column("created_at", DateTime, nullable=False),
+    Index("ix_files_user_name", "user_id", "name", "key"),
+    Index("ix_files_user_size", "user_id", "size", "key"),
+    Index("ix_files_user_created", "user_id", "created_at", "key"),
+)
+
+Table(
+    "user_storage", metadata,
+    Column("user_id", String(255), primary_key=True),
+    Column("bytes", BigInteger, nullable=False),
+    Column("objects", Integer, nullable=False),
+)
+
+
+def upgrade(conn):
+    # Existing objects are indexed by `python scripts/reconcile_files.py`
+    metadata.create_all(bind=conn)
@@ -0,0 +1,36 @@
+"""Bump device revisions only when a list-visible column changes, not on every heartbeat."""
+
+# List-visible columns: device_type, current_version, status, user_id, friendly_name.
+# NEW.revision IS NULL keeps the 0008 backfill (and any later one) working.
+PG_TRIGGERS = (
+    "DROP TRIGGER IF EXISTS devices_revision ON devices",
+    "CREATE TRIGGER devices_revision BEFORE INSERT ON devices "
+    "FOR EACH ROW EXECUTE FUNCTION devices_bump_revision()",
+    "DROP TRIGGER IF EXISTS devices_revision_update ON devices",
+    "CREATE TRIGGER devices_revision_update BEFORE UPDATE ON devices "
+    "FOR EACH ROW WHEN (NEW.revision IS NULL OR "
+    "ROW(OLD.device_type, OLD.current_version, OLD.status, OLD.user_id, OLD.friendly_name) IS DISTINCT FROM "
+    "ROW(NEW.device_type, NEW.current_version, NEW.status, NEW.user_id, NEW.friendly_name)) "
+    "EXECUTE FUNCTION devices_bump_revision()",
+)
+
+SQLITE_TRIGGERS = (
+    "DROP TRIGGER IF EXISTS devices_revision_update",
+    """
+    CREATE TRIGGER devices_revision_update AFTER UPDATE ON devices
+    WHEN NEW.revision IS NULL OR (NEW.revision IS OLD.revision AND (
+        OLD.device_type IS NOT NEW.device_type OR OLD.current_version IS NOT NEW.current_version
+        OR OLD.status IS NOT NEW.status OR OLD.user_id IS NOT NEW.user_id
+        OR OLD.friendly_name IS NOT NEW.friendly_name)) BEGIN
+        UPDATE devices SET revision = (SELECT coalesce(max(r), 0) + 1 FROM (
+            SELECT max(revision) AS r FROM devices UNION ALL SELECT max(revision) FROM device_tombstones)),
+            updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE device_id = NEW.device_id;
+    END
+    """,
+)
+
+
+def upgrade(conn):
+    for statement in PG_TRIGGERS if conn.dialect.name == "postgresql" else SQLITE_TRIGGERS:
+        conn.exec_driver_sql(statement)
@@ -0,0 +1,12 @@
+"""End offsets of log streams whose segments were all expired by retention."""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS device_log_streams ("
+        " device_id VARCHAR(255) NOT NULL REFERENCES devices (device_id),"
+        " log_type VARCHAR(50) NOT NULL,"
+        " end_offset BIGINT NOT NULL,"
+        " PRIMARY KEY (device_id, log_type))"
+    ))
@@ -0,0 +1,15 @@
+"""Quota reservations for presigned uploads, held until indexed or expired."""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS upload_reservations ("
+        " key VARCHAR(1024) NOT NULL PRIMARY KEY,"
+        " user_id VARCHAR(255) NOT NULL,"
+        " size BIGINT NOT NULL,"
+        " expires_at TIMESTAMP NOT NULL)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_upload_reservations_user_expires ON upload_reservations (user_id, expires_at)"
+    ))
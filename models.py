@@ -1,5 +1,6 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, FetchedValue
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 
@@ -28,6 +29,11 @@ class Artifact(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('device_type', 'artifact_type', 'version', name='_artifact_version_uc'),
+        # check_update: latest active artifact (migrations/versions/0002)
+        db.Index('ix_artifacts_active_lookup', 'device_type', 'artifact_type', 'created_at',
+                 postgresql_where=db.text('is_active = true'), sqlite_where=db.text('is_active = 1')),
+        # list_artifacts keyset pages, newest first (migrations/versions/0007)
+        db.Index('ix_artifacts_created', 'created_at', 'id'),
     )
 
 class Device(db.Model):
@@ -45,6 +51,144 @@ class Device(db.Model):
     terminal_port = db.Column(db.Integer, nullable=True) # Port for reverse SSH tunnel
     available_cameras = db.Column(db.JSON) # Available cameras from Camera App
     active_camera_command = db.Column(db.String(255), nullable=True) # Active camera requested by UI
+    # Usage extracted from `stats` at heartbeat time, so /devices/summary aggregates plain columns
+    cpu_percent = db.Column(db.Float)
+    memory_percent = db.Column(db.Float)
+    disk_percent = db.Column(db.Float)
+    # Bumped by a database trigger on insert and on list-visible changes (see install_device_sync_triggers)
+    revision = db.Column(db.BigInteger, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    updated_at = db.Column(db.DateTime, server_default=FetchedValue(), server_onupdate=FetchedValue())
+
+    # ix_devices_last_seen (sort=-last_seen pages) is created by migrations/versions/0007
+    # only: its NULLS LAST ordering cannot be declared portably here
+    __table_args__ = (
+        # ?since= change feeds (migrations/versions/0008)
+        db.Index('ix_devices_revision', 'revision'),
+        db.Index('ix_devices_user_revision', 'user_id', 'revision'),
+        # offline sweeper: live devices by last heartbeat (migrations/versions/0010)
+        db.Index('ix_devices_live_last_seen', 'last_seen',
+                 postgresql_where=db.text("status IS DISTINCT FROM 'offline'"),
+                 sqlite_where=db.text("status IS NOT 'offline'")),
+    )
+
+class DeviceTombstone(db.Model):
+    """
+    A device that left a list: deleted, or unbound from `user_id`. Written by
+    the device sync triggers and served to ?since= pollers until purged.
+    """
+    __tablename__ = 'device_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    device_id = db.Column(db.String(255), nullable=False)
+    user_id = db.Column(db.String(255)) # Owner the device was removed from
+    deleted = db.Column(db.Boolean, nullable=False, default=True) # False: only unbound
+    revision = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_device_tombstones_revision', 'revision'),
+        db.Index('ix_device_tombstones_user_revision', 'user_id', 'revision'),
+    )
+
+
+# Every insert, and every update to a column the device lists show, takes the
+# next value of one global revision counter, so "changed since N" is a single
+# index range scan. Heartbeat-only writes (last_seen, stats, usage) keep their
+# revision. Deletes and unbinds leave a tombstone carrying its own revision.
+_DEVICE_SYNC_COLUMNS = ("device_type", "current_version", "status", "user_id", "friendly_name")
+_PG_DEVICE_SYNC_CHANGED = (
+    f"ROW({', '.join('OLD.' + c for c in _DEVICE_SYNC_COLUMNS)}) IS DISTINCT FROM "
+    f"ROW({', '.join('NEW.' + c for c in _DEVICE_SYNC_COLUMNS)})"
+)
+_SQLITE_DEVICE_SYNC_CHANGED = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in _DEVICE_SYNC_COLUMNS)
+
+_PG_DEVICE_SYNC_DDL = (
+    "CREATE SEQUENCE IF NOT EXISTS device_revision_seq",
+    """
+    CREATE OR REPLACE FUNCTION devices_bump_revision() RETURNS trigger AS $$
+    BEGIN
+        NEW.revision := nextval('device_revision_seq');
+        NEW.updated_at := clock_timestamp() AT TIME ZONE 'utc';
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION devices_write_tombstone() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO device_tombstones (device_id, user_id, deleted, revision, created_at)
+            VALUES (OLD.device_id, OLD.user_id, true, nextval('device_revision_seq'), clock_timestamp() AT TIME ZONE 'utc');
+            RETURN OLD;
+        END IF;
+        IF OLD.user_id IS NOT NULL AND OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+            INSERT INTO device_tombstones (device_id, user_id, deleted, revision, created_at)
+            VALUES (OLD.device_id, OLD.user_id, false, nextval('device_revision_seq'), clock_timestamp() AT TIME ZONE 'utc');
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS devices_revision ON devices",
+    "CREATE TRIGGER devices_revision BEFORE INSERT ON devices "
+    "FOR EACH ROW EXECUTE FUNCTION devices_bump_revision()",
+    "DROP TRIGGER IF EXISTS devices_revision_update ON devices",
+    # NEW.revision IS NULL: the backfill in migrations/versions/0008
+    "CREATE TRIGGER devices_revision_update BEFORE UPDATE ON devices "
+    f"FOR EACH ROW WHEN (NEW.revision IS NULL OR {_PG_DEVICE_SYNC_CHANGED}) "
+    "EXECUTE FUNCTION devices_bump_revision()",
+    "DROP TRIGGER IF EXISTS devices_tombstone ON devices",
+    "CREATE TRIGGER devices_tombstone AFTER UPDATE OF user_id OR DELETE ON devices "
+    "FOR EACH ROW EXECUTE FUNCTION devices_write_tombstone()",
+)
+
+# SQLite (tests, local runs) has no sequences: take max + 1 over both tables
+_SQLITE_NEXT_REVISION = (
+    "(SELECT coalesce(max(r), 0) + 1 FROM ("
+    "SELECT max(revision) AS r FROM devices UNION ALL SELECT max(revision) FROM device_tombstones))"
+)
+_SQLITE_DEVICE_SYNC_DDL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS devices_revision_insert AFTER INSERT ON devices BEGIN
+        UPDATE devices SET revision = {_SQLITE_NEXT_REVISION}, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE device_id = NEW.device_id;
+    END
+    """,
+    "DROP TRIGGER IF EXISTS devices_revision_update",
+    f"""
+    CREATE TRIGGER devices_revision_update AFTER UPDATE ON devices
+    WHEN NEW.revision IS NULL OR (NEW.revision IS OLD.revision AND ({_SQLITE_DEVICE_SYNC_CHANGED})) BEGIN
+        UPDATE devices SET revision = {_SQLITE_NEXT_REVISION}, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE device_id = NEW.device_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS devices_tombstone_unbind AFTER UPDATE OF user_id ON devices
+    WHEN OLD.user_id IS NOT NULL AND OLD.user_id IS NOT NEW.user_id BEGIN
+        INSERT INTO device_tombstones (device_id, user_id, deleted, revision, created_at)
+        VALUES (OLD.device_id, OLD.user_id, 0, {_SQLITE_NEXT_REVISION}, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS devices_tombstone_delete AFTER DELETE ON devices BEGIN
+        INSERT INTO device_tombstones (device_id, user_id, deleted, revision, created_at)
+        VALUES (OLD.device_id, OLD.user_id, 1, {_SQLITE_NEXT_REVISION}, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+)
+
+
+def install_device_sync_triggers(conn):
+    """(Re)creates the revision/tombstone triggers once both tables exist. Idempotent."""
+    tables = set(inspect(conn).get_table_names())
+    if not {'devices', 'device_tombstones'} <= tables:
+        return
+    statements = _PG_DEVICE_SYNC_DDL if conn.dialect.name == 'postgresql' else _SQLITE_DEVICE_SYNC_DDL
+    for statement in statements:
+        conn.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _after_create(target, connection, **kw):
+    install_device_sync_triggers(connection)
 
 class DeviceCommand(db.Model):
     __tablename__ = 'device_commands'
@@ -52,10 +196,47 @@ class DeviceCommand(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     device_id = db.Column(db.String(255), db.ForeignKey('devices.device_id'), nullable=False)
     command = db.Column(db.Text, nullable=False)
-    status = db.Column(db.String(20), default='pending') # pending, sent, success, failed
+    status = db.Column(db.String(20), default='pending') # pending, sent, executed, failed, timed_out
     result = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     executed_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    max_attempts = db.Column(db.Integer, nullable=False, default=3, server_default='3')
+    lease_expires_at = db.Column(db.DateTime) # Set while 'sent'; re-queued once it passes
+    next_attempt_at = db.Column(db.DateTime) # Retry backoff; NULL means claimable now
+
+    __table_args__ = (
+        # heartbeat: pending commands per device (migrations/versions/0002)
+        db.Index('ix_device_commands_pending', 'device_id', 'created_at',
+                 postgresql_where=db.text("status = 'pending'"), sqlite_where=db.text("status = 'pending'")),
+        db.Index('ix_device_commands_device_status', 'device_id', 'status'),
+        # lease reaper: expired 'sent' commands across all devices (migrations/versions/0005)
+        db.Index('ix_device_commands_lease', 'lease_expires_at',
+                 postgresql_where=db.text("status = 'sent'"), sqlite_where=db.text("status = 'sent'")),
+    )
+
+class CommandOutputChunk(db.Model):
+    """
+    One sequenced piece of a command's stdout/stderr, streamed by the device
+    while the command runs. Compressed like DeviceLogSegment: small chunks
+    inline, large ones in S3.
+    """
+    __tablename__ = 'command_output_chunks'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    command_id = db.Column(db.String(36), db.ForeignKey('device_commands.id', ondelete='CASCADE'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False) # Device-assigned, starts at 0
+    stream = db.Column(db.String(10), nullable=False) # stdout, stderr, result
+    length = db.Column(db.Integer, nullable=False) # Uncompressed bytes
+    encoding = db.Column(db.String(10), nullable=False)
+    stored_size = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary)
+    s3_key = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('command_id', 'seq', name='_command_output_seq_uc'),
+    )
 
 class DeviceLog(db.Model):
     __tablename__ = 'device_logs'
@@ -65,3 +246,113 @@ class DeviceLog(db.Model):
     log_content = db.Column(db.Text)
     log_type = db.Column(db.String(50)) # e.g. run_sh, error, startup
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_device_logs_device_type_created', 'device_id', 'log_type', 'created_at'),
+    )
+
+class DeviceLogSegment(db.Model):
+    """
+    One compressed, append-only chunk of a device log stream (device_id, log_type).
+    Offsets are byte positions in the uncompressed stream. Small segments are
+    stored inline; large ones live in S3 and only the index row is kept here.
+    """
+    __tablename__ = 'device_log_segments'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    device_id = db.Column(db.String(255), db.ForeignKey('devices.device_id'), nullable=False)
+    log_type = db.Column(db.String(50), nullable=False)
+    start_offset = db.Column(db.BigInteger, nullable=False)
+    length = db.Column(db.Integer, nullable=False) # Uncompressed bytes
+    encoding = db.Column(db.String(10), nullable=False) # gzip, zstd
+    stored_size = db.Column(db.Integer, nullable=False) # Compressed bytes
+    data = db.Column(db.LargeBinary) # Inline compressed bytes
+    s3_key = db.Column(db.String(255)) # Set instead of data for large segments
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('device_id', 'log_type', 'start_offset', name='_log_segment_offset_uc'),
+        db.Index('ix_device_log_segments_created_at', 'created_at'),
+    )
+
+class DeviceLogStream(db.Model):
+    """
+    End offset of a log stream whose segments were expired by retention, so a
+    stream with no segments left still resumes where it stopped, not at 0.
+    """
+    __tablename__ = 'device_log_streams'
+
+    device_id = db.Column(db.String(255), db.ForeignKey('devices.device_id'), primary_key=True)
+    log_type = db.Column(db.String(50), primary_key=True)
+    end_offset = db.Column(db.BigInteger, nullable=False)
+
+class DeviceLogSearchDoc(db.Model):
+    """
+    Searchable text of a log segment (segment_id) or legacy snapshot (log_id).
+    On PostgreSQL migration 0004 adds a generated `search_vector` tsvector
+    column with a GIN index over `content`.
+    """
+    __tablename__ = 'device_log_search_docs'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    segment_id = db.Column(db.String(36), db.ForeignKey('device_log_segments.id', ondelete='CASCADE'), index=True)
+    log_id = db.Column(db.String(36), db.ForeignKey('device_logs.id', ondelete='CASCADE'), unique=True)
+    device_id = db.Column(db.String(255), nullable=False)
+    device_type = db.Column(db.String(50))
+    log_type = db.Column(db.String(50))
+    start_offset = db.Column(db.BigInteger) # Stream offset of `content` (segments only)
+    content = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_device_log_search_docs_created', 'created_at', 'id'),
+    )
+
+class StoredFile(db.Model):
+    """
+    Metadata of a user's object in S3 (keys under `<user_id>/`), so listings,
+    sorting and search don't need an S3 listing. Written when an upload
+    completes, removed on delete, and corrected by services/file_index.reconcile.
+    """
+    __tablename__ = 'files'
+
+    key = db.Column(db.String(1024), primary_key=True)
+    user_id = db.Column(db.String(255), nullable=False)
+    name = db.Column(db.String(1024), nullable=False) # Original filename, without the uuid prefix
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(255))
+    etag = db.Column(db.String(128))
+    sha256 = db.Column(db.String(64)) # Known for POST /upload only
+    created_at = db.Column(db.DateTime, nullable=False) # Object last-modified (UTC)
+
+    __table_args__ = (
+        # Keyset pages per user for each sort of GET /files
+        db.Index('ix_files_user_name', 'user_id', 'name', 'key'),
+        db.Index('ix_files_user_size', 'user_id', 'size', 'key'),
+        db.Index('ix_files_user_created', 'user_id', 'created_at', 'key'),
+    )
+
+class UserStorage(db.Model):
+    """Running byte/object totals per user, kept in step with `files` (quota checks read one row)."""
+    __tablename__ = 'user_storage'
+
+    user_id = db.Column(db.String(255), primary_key=True)
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    objects = db.Column(db.Integer, nullable=False, default=0)
+
+class UploadReservation(db.Model):
+    """
+    Quota held for a presigned upload from the moment the URL is issued until
+    the upload is indexed or the URL expires, so several presigns can't each
+    pass the quota check on their own.
+    """
+    __tablename__ = 'upload_reservations'
+
+    key = db.Column(db.String(1024), primary_key=True)
+    user_id = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_upload_reservations_user_expires', 'user_id', 'expires_at'),
+    )
@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify, g
+from werkzeug.exceptions import HTTPException
+from models import db, StoredFile
 from services.s3_service import s3_service
+from services.streaming_upload import StreamingUpload, UploadError, iter_stream, iter_multipart_file
+from services.file_index import file_index, QuotaExceeded
+from services.pagination import page_args, keyset_page, page_headers
 from middleware.auth import require_auth
+from config import Config
 import logging
 
 api_bp = Blueprint("api", __name__)
@@ -33,26 +39,172 @@ def presign_upload():
                 version=version
             )
         else:
-            # Raw file upload (backward compatibility)
-            result = s3_service.generate_presigned_upload(g.user_id, filename, content_type)
+            # Raw file upload (backward compatibility). With a quota the size is
+            # required: it is reserved here until the upload is indexed or the
+            # URL expires, and signed into the URL.
+            size = data.get("size")
+            if size is None and Config.USER_QUOTA_BYTES:
+                return {"error": "size required"}, 400
+            if size is not None:
+                if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+                    return {"error": "size must be a non-negative integer"}, 400
+                file_index.check_quota(g.user_id, size)
+            result = s3_service.generate_presigned_upload(g.user_id, filename, content_type, content_length=size)
+            if size is not None:
+                file_index.reserve(g.user_id, result["key"], size)
+                db.session.commit()
             
         return result
+    except QuotaExceeded as e:
+        db.session.rollback()
+        return {"error": str(e)}, 413
     except Exception as e:
+        db.session.rollback()
         return {"error": str(e)}, 500
 
-@api_bp.route("/files")
+@api_bp.route("/upload/complete", methods=["POST"])
 @require_auth
-def list_files():
-    # Ignore query param, use auth user
+def complete_upload():
+    """Called after the PUT to a presigned URL: indexes the new object for /files and usage."""
+    key = (request.get_json(silent=True) or {}).get("key")
+    if not key:
+        return {"error": "key required"}, 400
+
+    # Ownership check
+    if not key.startswith(f"{g.user_id}/"):
+        return {"error": "Forbidden"}, 403
+
+    try:
+        meta = s3_service.head(key)
+    except Exception as e:
+        logger.warning(f"Upload completion for missing object {key}: {e}")
+        return {"error": "Object not found"}, 404
+
+    try:
+        row = file_index.record(g.user_id, key, meta["size"], content_type=meta["content_type"],
+                                etag=meta["etag"], last_modified=meta["last_modified"])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return {"error": str(e)}, 500
+    return _file_json(row)
+
+@api_bp.route("/upload", methods=["POST"])
+@require_auth
+def upload():
+    """
+    Server-side upload for clients that cannot PUT to a presigned URL.
+
+    multipart/form-data with a `file` part (curl -F "file=@name"), or a raw
+    body with ?filename=. The body is read in chunks and streamed into S3,
+    so memory use does not grow with the file. An optional X-Content-SHA256
+    header is checked before the object is committed.
+    """
+    mimetype = request.mimetype
+    if mimetype == "multipart/form-data":
+        boundary = request.mimetype_params.get("boundary")
+        if not boundary:
+            return {"error": "multipart boundary missing"}, 400
+        chunks = iter_multipart_file(request.stream, boundary)
+    else:
+        chunks = iter_stream(request.stream)
+
+    try:
+        if mimetype == "multipart/form-data":
+            filename, content_type = next(chunks)
+        else:
+            filename, content_type = request.args.get("filename"), mimetype
+    except UploadError as e:
+        return {"error": str(e)}, 400
+
+    # Keep only the last path component of whatever the client sent
+    filename = (filename or "").replace("\\", "/").rsplit("/", 1)[-1]
+    if not filename:
+        return {"error": "filename required"}, 400
+
+    # Refuse early when the declared length is already over quota; chunked bodies are checked as they arrive
+    remaining = file_index.remaining(g.user_id)
+    if remaining is not None and (request.content_length or 0) > remaining:
+        return {"error": f"Storage quota exceeded: {remaining} bytes left"}, 413
+
+    key = s3_service.build_key(g.user_id, filename)
+    upload = StreamingUpload(key, content_type or "application/octet-stream")
     try:
-        files = s3_service.list_files(g.user_id)
-        return {
-            "count": len(files),
-            "files": files
-        }
+        for chunk in chunks:
+            upload.write(chunk)
+            if remaining is not None and upload.size > remaining:
+                raise QuotaExceeded(f"Storage quota exceeded: {remaining} bytes left")
+        sha256 = upload.complete(request.headers.get("X-Content-SHA256"))
+    except UploadError as e:
+        upload.abort()
+        return {"error": str(e)}, 400
+    except QuotaExceeded as e:
+        upload.abort()
+        return {"error": str(e)}, 413
+    except HTTPException:
+        # Client disconnected mid-body, oversized form field, ...
+        upload.abort()
+        raise
     except Exception as e:
+        upload.abort()
+        logger.error(f"Streaming upload of {key} failed: {e}")
         return {"error": str(e)}, 500
 
+    logger.info(f"Uploaded {key} ({upload.size} bytes) for user {g.user_id}")
+    try:
+        file_index.record(g.user_id, key, upload.size, content_type=content_type, sha256=sha256)
+        db.session.commit()
+    except Exception as e:
+        # The object is stored; the next reconciliation indexes it
+        db.session.rollback()
+        logger.error(f"Failed to index {key}: {e}")
+    return {
+        "key": key,
+        "fileUrl": s3_service.public_url(key),
+        "size": upload.size,
+        "sha256": sha256
+    }
+
+FILE_SORTS = {"name": StoredFile.name, "size": StoredFile.size, "created_at": StoredFile.created_at}
+
+def _file_json(f):
+    return {
+        "key": f.key,
+        "name": f.name,
+        "fileUrl": s3_service.public_url(f.key),
+        "size": f.size,
+        "content_type": f.content_type,
+        "last_modified": f.created_at.isoformat()
+    }
+
+@api_bp.route("/files")
+@require_auth
+def list_files():
+    """
+    The user's files from the metadata index, one page at a time:
+    ?sort=name|size|created_at (prefix '-' for descending), ?q= to search
+    names, ?limit= and ?cursor= as elsewhere. `count` is the user's total.
+    """
+    # Ignore query param, use auth user
+    limit, sort_column, descending, cursor = page_args(FILE_SORTS, "-created_at")
+    query = StoredFile.query.filter_by(user_id=g.user_id)
+    q = request.args.get("q")
+    if q:
+        query = query.filter(StoredFile.name.icontains(q, autoescape=True))
+
+    files, next_cursor = keyset_page(query, sort_column, StoredFile.key, descending, limit, cursor)
+    usage = file_index.usage(g.user_id)
+    return {
+        "count": usage["objects"],
+        "files": [_file_json(f) for f in files],
+        "usage": usage
+    }, page_headers(next_cursor)
+
+@api_bp.route("/files/usage")
+@require_auth
+def files_usage():
+    return file_index.usage(g.user_id)
+
 @api_bp.route("/download", methods=["POST"])
 @require_auth
 def download():
@@ -83,6 +235,59 @@ def delete_file():
 
     try:
         s3_service.delete_file(key)
+        file_index.remove([key])
+        db.session.commit()
         return {"message": "Deleted"}
     except Exception as e:
+        db.session.rollback()
         return {"error": str(e)}, 500
+
+@api_bp.route("/delete/bulk", methods=["POST"])
+@require_auth
+def delete_files():
+    """
+    {"keys": [...]} and/or {"prefix": "<user_id>/..."} (the whole folder when
+    the prefix is just "<user_id>/"). Keys are removed with batched
+    DeleteObjects calls; the result is reported per key.
+    """
+    data = request.get_json(silent=True) or {}
+    keys = data.get("keys") or []
+    prefix = data.get("prefix")
+    if not isinstance(keys, list) or (not keys and not prefix):
+        return {"error": "keys (list) or prefix required"}, 400
+
+    owned = f"{g.user_id}/"
+    if prefix is not None and not str(prefix).startswith(owned):
+        return {"error": "Forbidden"}, 403
+
+    results = {}
+    to_delete = []
+    for key in keys:
+        # Ownership check, per key
+        if isinstance(key, str) and key.startswith(owned):
+            to_delete.append(key)
+        else:
+            results[str(key)] = "Forbidden"
+
+    try:
+        if prefix:
+            to_delete.extend(s3_service.iter_keys(prefix))
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+    deleted = s3_service.delete_files(to_delete)
+    results.update(deleted)
+    try:
+        file_index.remove([key for key, error in deleted.items() if not error])
+        db.session.commit()
+    except Exception as e:
+        # Objects are gone either way; the next reconciliation drops the rows
+        db.session.rollback()
+        logger.error(f"Failed to unindex deleted files: {e}")
+    failed = {key: error for key, error in results.items() if error}
+    return {
+        "deleted": len(results) - len(failed),
+        "failed": len(failed),
+        "results": {key: {"deleted": True} if not error else {"deleted": False, "error": error}
+                    for key, error in results.items()}
+    }
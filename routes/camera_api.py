@@ -2,6 +2,7 @@ import logging
 from flask import Blueprint, request, jsonify, g
 from models import db, Device
 from middleware.auth import require_auth
+from services.device_payload import device_json
 
 logger = logging.getLogger("seaweed-flask")
 camera_api_bp = Blueprint("camera_api", __name__)
@@ -13,7 +14,7 @@ def camera_poll():
     Called periodically by the standalone Camera App on the device
     to report available cameras and retrieve any active user requests.
     """
-    data = request.json
+    data = device_json()
     device_id = data.get("device_id")
     cameras = data.get("cameras", [])
     
@@ -2,28 +2,37 @@ import logging
 from flask import request
 from flask_socketio import emit, join_room, leave_room
 from models import db, Device
+from services.socket_registry import socket_registry
+from services.socket_auth import socket_sessions, authenticate_connect
 
 logger = logging.getLogger("seaweed-flask")
 
-# Track the authoritative camera streamer device SID for each device_id
-active_camera_devices = {}
+NAMESPACE = '/camera'
 
 def register_camera_socket_events(socketio):
+
+    def revoke(sid, device_id):
+        # The device changed owner: stop relaying its frames to this socket
+        for room in (f"camera_{device_id}_browsers", f"camera_{device_id}_devices"):
+            socketio.server.leave_room(sid, room, namespace=NAMESPACE)
+
+    socket_sessions.on_revoke(NAMESPACE, revoke)
     
-    @socketio.on('connect', namespace='/camera')
+    @socketio.on('connect', namespace=NAMESPACE)
     def handle_camera_connect(auth=None):
-        logger.info(f"==> [DEBUG] Camera Socket CONNECT: SID={request.sid}, Auth={auth}")
+        session = authenticate_connect(NAMESPACE, request.sid, auth, request.headers)
+        socket_registry.connect(NAMESPACE, request.sid)
+        logger.info(f"Camera Socket CONNECT: SID={request.sid}, user={session.user_id}")
 
-    @socketio.on('disconnect', namespace='/camera')
+    @socketio.on('disconnect', namespace=NAMESPACE)
     def handle_camera_disconnect():
         logger.info(f"Camera Socket Client disconnected: {request.sid}")
-        # Cleanup active_devices if it was the authoritative one
-        for dev_id, sid in list(active_camera_devices.items()):
-            if sid == request.sid:
-                del active_camera_devices[dev_id]
-                logger.info(f"Authoritative camera device {dev_id} disconnected")
+        socket_sessions.drop(NAMESPACE, request.sid)
+        # Drop authority for any camera device this SID was streaming
+        for dev_id in socket_registry.disconnect(NAMESPACE, request.sid):
+            logger.info(f"Authoritative camera device {dev_id} disconnected")
 
-    @socketio.on('join', namespace='/camera')
+    @socketio.on('join', namespace=NAMESPACE)
     def handle_join(data):
         logger.info(f"==> [DEBUG] Camera Socket JOIN: SID={request.sid}, Data={data}")
         device_id = data.get('device_id')
@@ -32,6 +41,9 @@ def register_camera_socket_events(socketio):
         if not device_id:
             logger.error("==> [DEBUG] JOIN Failed: No device_id provided")
             return
+        if not socket_sessions.authorize_join(NAMESPACE, request.sid, device_id):
+            logger.warning(f"Client {request.sid} refused camera access to {device_id}")
+            return
             
         if client_type == 'browser':
             room = f"camera_{device_id}_browsers"
@@ -40,10 +52,11 @@ def register_camera_socket_events(socketio):
         elif client_type == 'device':
             room = f"camera_{device_id}_devices"
             join_room(room)
-            active_camera_devices[device_id] = request.sid
+            # Track the authoritative camera streamer device SID for each device_id
+            socket_registry.bind(NAMESPACE, device_id, request.sid)
             logger.info(f"Device {request.sid} joined camera {room} as AUTHORITATIVE")
 
-    @socketio.on('frame', namespace='/camera')
+    @socketio.on('frame', namespace=NAMESPACE)
     def handle_frame(data):
         # Device -> Browser
         device_id = data.get('device_id')
@@ -57,8 +70,8 @@ def register_camera_socket_events(socketio):
             return
             
         
-        if device_id:
-            expected_sid = active_camera_devices.get(device_id)
+        if device_id and socket_sessions.allows(NAMESPACE, request.sid, device_id):
+            expected_sid = socket_registry.get_sid(NAMESPACE, device_id)
             if expected_sid == request.sid:
                 emit('frame', payload, room=f"camera_{device_id}_browsers", include_self=False)
             else:
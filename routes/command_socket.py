@@ -0,0 +1,67 @@
+import logging
+from flask import request, current_app
+from flask_socketio import emit, join_room, leave_room
+from models import db, DeviceCommand
+from services.permissions import permissions
+from services.socket_auth import socket_sessions, authenticate_connect
+
+logger = logging.getLogger("seaweed-flask")
+
+NAMESPACE = '/commands'
+
+
+def command_room(command_id):
+    return f"command_{command_id}"
+
+
+def _emit(event, payload, command_id):
+    # Works from HTTP handlers too; with a message queue the emit reaches every worker
+    socketio = current_app.extensions.get('socketio')
+    if socketio is not None:
+        socketio.emit(event, payload, to=command_room(command_id), namespace=NAMESPACE)
+
+
+def emit_output(command_id, seq, stream, text):
+    _emit('command_output', {"command_id": command_id, "seq": seq, "stream": stream, "data": text}, command_id)
+
+
+def emit_status(cmd):
+    _emit('command_status', {"command_id": cmd.id, "status": cmd.status, "attempts": cmd.attempts}, cmd.id)
+
+
+def register_command_socket_events(socketio):
+
+    @socketio.on('connect', namespace=NAMESPACE)
+    def handle_commands_connect(auth=None):
+        session = authenticate_connect(NAMESPACE, request.sid, auth, request.headers)
+        logger.debug(f"Command output client connected: {request.sid} (user {session.user_id})")
+
+    @socketio.on('disconnect', namespace=NAMESPACE)
+    def handle_commands_disconnect():
+        socket_sessions.drop(NAMESPACE, request.sid)
+
+    @socketio.on('subscribe', namespace=NAMESPACE)
+    def handle_subscribe(data):
+        # Browsers fetch earlier chunks from GET /commands/<id>/output?after=<seq>
+        command_id = (data or {}).get('command_id')
+        if not command_id:
+            return
+        session = socket_sessions.get(NAMESPACE, request.sid)
+        cmd = db.session.get(DeviceCommand, command_id)
+        # Uploaders see every command (as on GET /commands/<id>/output); owners see their devices' commands
+        allowed = cmd is not None and session is not None and (
+            permissions.is_uploader(session.user_id)
+            or socket_sessions.authorize_join(NAMESPACE, request.sid, cmd.device_id)
+        )
+        if not allowed:
+            logger.warning(f"Client {request.sid} refused output of command {command_id}")
+            emit('command_error', {"command_id": command_id, "error": "Access denied"}, room=request.sid)
+            return
+        join_room(command_room(command_id))
+        logger.debug(f"Browser {request.sid} subscribed to command {command_id}")
+
+    @socketio.on('unsubscribe', namespace=NAMESPACE)
+    def handle_unsubscribe(data):
+        command_id = (data or {}).get('command_id')
+        if command_id:
+            leave_room(command_room(command_id))
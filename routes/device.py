@@ -1,7 +1,16 @@
 import logging
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file, redirect, url_for
 from models import db, Device, DeviceCommand, Artifact, DeviceLog
 from services.s3_service import s3_service
+from services.artifact_cache import artifact_cache, ArtifactTooLarge
+from services.log_store import log_store, LogOffsetError
+from services.log_search import index_snapshot
+from services.command_queue import command_queue, RESULT_STATUSES, FINISHED_STATUSES, SENT
+from services.command_output import command_output, STREAMS, RESULT_SEQ
+from services.device_summary import usage_from_stats
+from services.device_payload import device_json
+from routes.command_socket import emit_output, emit_status
+from routes.device_socket import emit_status_change
 from datetime import datetime
 from middleware.auth import require_auth
 from config import Config
@@ -16,7 +25,7 @@ device_bp = Blueprint("device", __name__)
 @device_bp.route("/device/heartbeat", methods=["POST"])
 @require_auth
 def heartbeat():
-    data = request.json
+    data = device_json()
     logger.info(f"Received heartbeat from {request.remote_addr}: {data}")
     device_id = data.get("device_id")
     if not device_id:
@@ -27,17 +36,16 @@ def heartbeat():
         device = Device(device_id=device_id)
         db.session.add(device)
     
+    previous_status = device.status
     device.status = data.get("status", "online")
     device.current_version = data.get("version")
     device.device_type = data.get("device_type", "unknown")
     device.stats = data.get("stats")
+    device.cpu_percent, device.memory_percent, device.disk_percent = usage_from_stats(device.stats)
     device.last_seen = datetime.utcnow()
     
-    # Fetch pending commands
-    pending_cmds = DeviceCommand.query.filter_by(
-        device_id=device_id, 
-        status='pending'
-    ).all()
+    # Lease pending commands (locked until the commit below)
+    pending_cmds = command_queue.claim(device_id)
     
     commands_data = []
     
@@ -54,14 +62,18 @@ def heartbeat():
         device.terminal_requested = False
 
     for cmd in pending_cmds:
-        cmd.status = 'sent'
         commands_data.append({
             "id": cmd.id,
-            "command": cmd.command
+            "command": cmd.command,
+            "attempt": cmd.attempts
         })
     
     db.session.commit()
     
+    if previous_status in (None, "offline") and device.status != "offline":
+        # Back from the offline sweeper (or first contact)
+        emit_status_change(device_id, device.status, previous_status, device.last_seen)
+    
     return jsonify({
         "status": "ok", 
         "commands": commands_data
@@ -70,16 +82,65 @@ def heartbeat():
 @device_bp.route("/device/command/<command_id>/result", methods=["POST"])
 @require_auth
 def command_result(command_id):
-    data = request.json
-    cmd = DeviceCommand.query.get_or_404(command_id)
+    data = device_json()
+    status = data.get("status", "failed")
+    if status not in RESULT_STATUSES:
+        return jsonify({"error": f"status must be one of {', '.join(RESULT_STATUSES)}"}), 400
+    cmd = DeviceCommand.query.with_for_update().filter_by(id=command_id).first_or_404()
     
-    cmd.status = data.get("status", "failed") # executed, failed
-    cmd.result = data.get("result", "")
-    cmd.executed_at = datetime.utcnow()
+    result = data.get("result", "")
+    overflow = None
+    if len(result) > Config.COMMAND_RESULT_INLINE_MAX_CHARS:
+        # Keep the row small; the full text is stored like streamed output
+        result, overflow = result[:Config.COMMAND_RESULT_INLINE_MAX_CHARS], result
+    
+    if not command_queue.complete(cmd, status, result):
+        db.session.rollback()
+        return jsonify({"message": "Result already recorded"})
     
     db.session.commit()
+    if overflow is not None:
+        command_output.append(cmd, RESULT_SEQ, "result", overflow.encode("utf-8"))
+    emit_status(cmd)
     return jsonify({"message": "Result recorded"})
 
+@device_bp.route("/device/command/<command_id>/output", methods=["POST"])
+@require_auth
+def command_output_chunk(command_id):
+    """
+    Partial stdout/stderr of a running command: {"seq": 0, "stream": "stdout", "data": "..."}.
+    Chunks are stored in seq order of arrival and relayed to subscribed browsers.
+    """
+    data = device_json()
+    try:
+        seq = int(data.get("seq"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seq must be an integer"}), 400
+    if not 0 <= seq < RESULT_SEQ:
+        return jsonify({"error": f"seq must be between 0 and {RESULT_SEQ - 1}"}), 400
+    stream = data.get("stream", "stdout")
+    if stream not in STREAMS:
+        return jsonify({"error": f"stream must be one of {', '.join(STREAMS)}"}), 400
+
+    text = data.get("data") or ""
+    content = text.encode("utf-8")
+    if len(content) > Config.COMMAND_OUTPUT_MAX_CHUNK_BYTES:
+        return jsonify({"error": "Output chunk too large"}), 413
+
+    cmd = DeviceCommand.query.get_or_404(command_id)
+    if cmd.status in FINISHED_STATUSES:
+        return jsonify({"error": f"Command already {cmd.status}"}), 409
+    if cmd.status == SENT:
+        # Output is proof of life: keep the lease from expiring under a long command
+        command_queue.extend_lease(cmd)
+        db.session.commit()
+
+    if command_output.append(cmd, seq, stream, content) is None:
+        return jsonify({"message": "Chunk already stored", "seq": seq})
+
+    emit_output(cmd.id, seq, stream, text)
+    return jsonify({"message": "Chunk stored", "seq": seq})
+
 @device_bp.route("/update/check", methods=["GET"])
 def check_update():
     device_type = request.args.get("device_type")
@@ -104,7 +165,10 @@ def check_update():
         
     # Generate download URL
     try:
-        url = s3_service.generate_presigned_download(latest.s3_key)
+        if Config.ARTIFACT_PROXY_ENABLED:
+            url = artifact_proxy_url(latest.id)
+        else:
+            url = s3_service.generate_presigned_download(latest.s3_key)
         return jsonify({
             "update_available": True,
             "latest_version": latest.version,
@@ -115,23 +179,91 @@ def check_update():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def artifact_proxy_url(artifact_id):
+    if Config.ARTIFACT_PROXY_BASE_URL:
+        return f"{Config.ARTIFACT_PROXY_BASE_URL.rstrip('/')}/update/artifacts/{artifact_id}/download"
+    return url_for("device.download_artifact", artifact_id=artifact_id, _external=True)
+
+@device_bp.route("/update/artifacts/<artifact_id>/download", methods=["GET"])
+def download_artifact(artifact_id):
+    # Same audience as /update/check, which hands out presigned URLs without auth
+    if not Config.ARTIFACT_PROXY_ENABLED:
+        return jsonify({"error": "Not found"}), 404
+
+    artifact = Artifact.query.get_or_404(artifact_id)
+    s3_key, checksum = artifact.s3_key, artifact.checksum
+    # A cache miss can take a while; don't hold a pooled connection across it
+    db.session.close()
+
+    try:
+        # On a miss, HEAD first so an object too large to cache is redirected before any download
+        size = None if artifact_cache.contains(s3_key) else s3_service.head(s3_key)["size"]
+        cached, hit = artifact_cache.open(s3_key, size=size)
+    except ArtifactTooLarge:
+        return redirect(s3_service.generate_presigned_download(s3_key))
+    except Exception as e:
+        logger.error(f"Artifact proxy failed to fetch {s3_key}: {e}")
+        return jsonify({"error": "Artifact unavailable"}), 502
+
+    # conditional=True answers Range / If-Range (206) for resumed downloads;
+    # the file goes out via wsgi.file_wrapper (sendfile where the server supports it)
+    try:
+        response = send_file(
+            cached.name,
+            mimetype="application/octet-stream",
+            as_attachment=True,
+            download_name=s3_key.rsplit("/", 1)[-1],
+            conditional=True,
+            etag=checksum or True,
+            max_age=3600
+        )
+    except BaseException:
+        cached.close()
+        raise
+    # Holding `cached` open keeps the file from being evicted until the response is done
+    response.call_on_close(cached.close)
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return response
+
 @device_bp.route("/device/logs", methods=["POST"])
 @require_auth
 def upload_logs():
-    data = request.json
+    data = device_json()
     device_id = data.get("device_id")
     content = data.get("logs")
     log_type = data.get("type", "generic") # e.g. run_sh, error
 
     if not device_id or not content:
         return jsonify({"error": "Missing device_id or logs"}), 400
-    
+
+    # Incremental upload: append the chunk at its byte offset
+    if "offset" in data:
+        try:
+            offset = int(data["offset"])
+        except (TypeError, ValueError):
+            return jsonify({"error": "offset must be an integer"}), 400
+        if offset < 0:
+            return jsonify({"error": "offset must be non-negative"}), 400
+
+        chunk = content.encode("utf-8")
+        if len(chunk) > Config.LOG_MAX_CHUNK_BYTES:
+            return jsonify({"error": "Log chunk too large"}), 413
+
+        try:
+            next_offset = log_store.append(device_id, log_type, offset, chunk)
+        except LogOffsetError as e:
+            return jsonify({"error": "Offset gap, resend from next_offset", "next_offset": e.expected_offset}), 409
+
+        return jsonify({"message": "Logs appended", "next_offset": next_offset})
+
+    # Legacy full upload: keep a single snapshot row per log type
     # Optional: Verify device exists?
     # device = Device.query.get(device_id)
     # if not device: return ...
 
     # Check for existing log of this type for this device
     log_entry = DeviceLog.query.filter_by(device_id=device_id, log_type=log_type).first()
+    previous = log_entry.log_content if log_entry else None
     
     if log_entry:
         log_entry.log_content = content
@@ -143,7 +275,21 @@ def upload_logs():
             log_type=log_type
         )
         db.session.add(log_entry)
-        
+
+    db.session.flush()
+    index_snapshot(log_entry)
     db.session.commit()
+
+    # Also feed the stream (which notifies open /logs/stream tails): only the text
+    # added since the last snapshot, or all of it if the log was rotated. The
+    # snapshot's search document already covers it.
+    added = content[len(previous):] if previous and content.startswith(previous) else content
+    if added:
+        try:
+            log_store.append(device_id, log_type, log_store.end_offset(device_id, log_type),
+                             added.encode("utf-8"), index=False)
+        except LogOffsetError:
+            # A concurrent snapshot of the same log got there first; this text stays in the snapshot row
+            logger.warning(f"Skipped streaming a {log_type} snapshot of {device_id}: concurrent upload")
     
     return jsonify({"message": "Logs updated", "id": log_entry.id})
@@ -0,0 +1,67 @@
+import logging
+from flask import request, current_app
+from flask_socketio import emit, join_room, leave_room
+from services.permissions import permissions
+from services.socket_auth import socket_sessions, authenticate_connect
+
+logger = logging.getLogger("seaweed-flask")
+
+NAMESPACE = '/devices'
+FLEET_ROOM = 'fleet'
+
+
+def device_room(device_id):
+    return f"device_{device_id}"
+
+
+def emit_status_change(device_id, status, previous, last_seen=None):
+    """Online/offline transition, to fleet-wide and per-device subscribers."""
+    socketio = current_app.extensions.get('socketio')
+    if socketio is None:
+        return
+    payload = {
+        "device_id": device_id,
+        "status": status,
+        "previous": previous,
+        "last_seen": last_seen.isoformat() + 'Z' if last_seen else None
+    }
+    socketio.emit('device_status', payload, to=FLEET_ROOM, namespace=NAMESPACE)
+    socketio.emit('device_status', payload, to=device_room(device_id), namespace=NAMESPACE)
+
+
+def register_device_socket_events(socketio):
+
+    def revoke(sid, device_id):
+        socketio.server.leave_room(sid, device_room(device_id), namespace=NAMESPACE)
+
+    socket_sessions.on_revoke(NAMESPACE, revoke)
+
+    @socketio.on('connect', namespace=NAMESPACE)
+    def handle_devices_connect(auth=None):
+        session = authenticate_connect(NAMESPACE, request.sid, auth, request.headers)
+        logger.debug(f"Device status client connected: {request.sid} (user {session.user_id})")
+
+    @socketio.on('disconnect', namespace=NAMESPACE)
+    def handle_devices_disconnect():
+        socket_sessions.drop(NAMESPACE, request.sid)
+
+    @socketio.on('subscribe', namespace=NAMESPACE)
+    def handle_subscribe(data):
+        # {"device_id": ...} for one device (its owner), {} for the whole fleet (uploaders, as GET /devices)
+        device_id = (data or {}).get('device_id')
+        session = socket_sessions.get(NAMESPACE, request.sid)
+        if device_id:
+            allowed = socket_sessions.authorize_join(NAMESPACE, request.sid, device_id)
+        else:
+            allowed = session is not None and permissions.is_uploader(session.user_id)
+        if not allowed:
+            logger.warning(f"Client {request.sid} refused status of {device_id or 'fleet'}")
+            emit('subscribe_error', {"device_id": device_id, "error": "Access denied"}, room=request.sid)
+            return
+        join_room(device_room(device_id) if device_id else FLEET_ROOM)
+        logger.debug(f"Client {request.sid} subscribed to {device_id or 'fleet'} status")
+
+    @socketio.on('unsubscribe', namespace=NAMESPACE)
+    def handle_unsubscribe(data):
+        device_id = (data or {}).get('device_id')
+        leave_room(device_room(device_id) if device_id else FLEET_ROOM)
@@ -0,0 +1,46 @@
+import time
+import logging
+from flask import Blueprint, jsonify
+from sqlalchemy import text
+from models import db
+from services.s3_service import s3_service
+
+logger = logging.getLogger("seaweed-flask")
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.route("/healthz", methods=["GET"])
+def healthz():
+    # Liveness: the process is serving requests. No I/O, so a slow dependency
+    # never gets a healthy worker restarted.
+    return jsonify({"status": "ok"})
+
+
+def _probe(check):
+    start = time.perf_counter()
+    try:
+        check()
+        result = {"ok": True}
+    except Exception as e:
+        logger.warning(f"Readiness probe {check.__name__} failed: {e}")
+        # Only the exception type: the probe is unauthenticated
+        result = {"ok": False, "error": type(e).__name__}
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def _check_database():
+    try:
+        db.session.execute(text("SELECT 1"))
+    finally:
+        db.session.rollback()
+
+
+@health_bp.route("/readyz", methods=["GET"])
+def readyz():
+    # Readiness: each dependency is reported on its own, so an S3 outage and a
+    # database outage are told apart by the load balancer and by whoever is paged.
+    checks = {"database": _probe(_check_database), "s3": _probe(s3_service.check)}
+    ready = all(c["ok"] for c in checks.values())
+    return jsonify({"status": "ready" if ready else "unavailable", "checks": checks}), 200 if ready else 503
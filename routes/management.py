@@ -1,9 +1,27 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, Response, stream_with_context, url_for
 from models import db, Artifact, AllowedUploader, Device, DeviceCommand, DeviceLog
-from middleware.auth import require_auth
+from middleware.auth import require_auth, require_auth_or_stream_token, issue_stream_token, AuthError
 from middleware.rbac import require_uploader, require_super_admin
 from services.s3_service import s3_service
+from services.artifact_cache import artifact_cache
+from services.socket_registry import socket_registry
+from services.db_pool import pool_metrics
+from services.log_store import log_store
+from services.log_events import log_notifier
+from services import log_search
+from services.command_queue import command_queue
+from services.command_output import command_output
+from services.pagination import page_args, keyset_page, page_headers
+from services.device_listing import DEVICE_SORTS, DEVICE_LIST_COLUMNS, filter_devices
+from services import device_sync
+from services.device_summary import device_summary
+from services.permissions import permissions
+from sqlalchemy.orm import load_only
+from config import Config
 import uuid
+import json
+import time
+import codecs
 from datetime import datetime
 
 management_bp = Blueprint("management", __name__)
@@ -23,6 +41,7 @@ def add_uploader():
         )
         db.session.add(new_uploader)
         db.session.commit()
+        permissions.invalidate()
         return jsonify({"message": "Uploader added"}), 201
     except Exception as e:
         db.session.rollback()
@@ -32,12 +51,14 @@ def add_uploader():
 @require_auth
 @require_super_admin
 def list_uploaders():
-    uploaders = AllowedUploader.query.all()
+    limit, sort_column, descending, cursor = page_args({"user_id": AllowedUploader.user_id}, "user_id")
+    query = AllowedUploader.query.options(load_only(AllowedUploader.user_id, AllowedUploader.email, AllowedUploader.added_by))
+    uploaders, next_cursor = keyset_page(query, sort_column, AllowedUploader.user_id, descending, limit, cursor)
     return jsonify([{
         "user_id": u.user_id,
         "email": u.email,
         "added_by": u.added_by
-    } for u in uploaders])
+    } for u in uploaders]), page_headers(next_cursor)
 
 @management_bp.route("/admin/uploaders/<int:user_id>", methods=["DELETE"])
 @require_auth
@@ -45,8 +66,30 @@ def list_uploaders():
 def remove_uploader(user_id):
     AllowedUploader.query.filter_by(user_id=user_id).delete()
     db.session.commit()
+    permissions.invalidate()
     return jsonify({"message": "Uploader removed"})
 
+@management_bp.route("/admin/sockets", methods=["GET"])
+@require_auth
+@require_super_admin
+def socket_stats():
+    # Per-namespace connection and authoritative device counts
+    return jsonify(socket_registry.stats())
+
+@management_bp.route("/admin/db/pool", methods=["GET"])
+@require_auth
+@require_super_admin
+def db_pool_stats():
+    # Checkout wait times, exhaustion events and connections in use
+    return jsonify(pool_metrics.snapshot(db.engine.pool))
+
+@management_bp.route("/admin/artifact-cache", methods=["GET"])
+@require_auth
+@require_super_admin
+def artifact_cache_stats():
+    # Objects and bytes held by this worker's download proxy cache
+    return jsonify(artifact_cache.stats())
+
 # --- Artifact Management ---
 
 @management_bp.route("/artifacts", methods=["POST"])
@@ -93,16 +136,28 @@ def create_artifact():
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+ARTIFACT_SORTS = {"created_at": Artifact.created_at, "version": Artifact.version}
+
 @management_bp.route("/artifacts", methods=["GET"])
 @require_auth
 def list_artifacts():
+    limit, sort_column, descending, cursor = page_args(ARTIFACT_SORTS, "-created_at")
+
     # Optional filters
     device_type = request.args.get('device_type')
-    query = Artifact.query
+    artifact_type = request.args.get('artifact_type')
+    is_active = request.args.get('is_active')
+    query = Artifact.query.options(load_only(
+        Artifact.id, Artifact.device_type, Artifact.artifact_type, Artifact.version, Artifact.is_active, Artifact.created_at
+    ))
     if device_type:
         query = query.filter_by(device_type=device_type)
-        
-    artifacts = query.order_by(Artifact.created_at.desc()).all()
+    if artifact_type:
+        query = query.filter_by(artifact_type=artifact_type)
+    if is_active is not None:
+        query = query.filter_by(is_active=is_active.lower() in ("1", "true", "yes"))
+
+    artifacts, next_cursor = keyset_page(query, sort_column, Artifact.id, descending, limit, cursor)
     return jsonify([{
         "id": a.id,
         "device_type": a.device_type,
@@ -110,7 +165,7 @@ def list_artifacts():
         "version": a.version,
         "is_active": a.is_active,
         "created_at": a.created_at.isoformat()
-    } for a in artifacts])
+    } for a in artifacts]), page_headers(next_cursor)
 
 @management_bp.route("/artifacts/<artifact_id>/download", methods=["GET"])
 @require_auth
@@ -158,6 +213,7 @@ def delete_artifact(artifact_id):
                 # User said "delete everything", implying strong consistency or cleanup.
                 # If S3 fails, we probably shouldn't delete DB record to avoid stranding files.
                 return jsonify({"error": f"Failed to delete from S3: {str(e)}"}), 500
+            artifact_cache.discard(artifact.s3_key)
         
         # 2. Delete from DB
         db.session.delete(artifact)
@@ -167,31 +223,83 @@ def delete_artifact(artifact_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+@management_bp.route("/artifacts/bulk-delete", methods=["POST"])
+@require_auth
+@require_uploader
+def bulk_delete_artifacts():
+    # {"ids": [...]}: objects go in batched DeleteObjects calls, then the rows whose
+    # object was removed are deleted in one transaction. Failed ones are kept, as in
+    # delete_artifact, so no row is left pointing at nothing (or a file orphaned).
+    ids = (request.get_json(silent=True) or {}).get("ids")
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "ids (list) required"}), 400
+
+    artifacts = Artifact.query.filter(Artifact.id.in_([str(i) for i in ids])).all()
+    results = {str(i): {"deleted": False, "error": "Not found"} for i in ids}
+
+    s3_results = s3_service.delete_files(a.s3_key for a in artifacts)
+    removed = [] # (id, s3_key); the instances expire on commit
+    for artifact in artifacts:
+        error = s3_results.get(artifact.s3_key) if artifact.s3_key else None
+        if error:
+            results[artifact.id] = {"deleted": False, "error": f"Failed to delete from S3: {error}"}
+        else:
+            removed.append((artifact.id, artifact.s3_key))
+
+    try:
+        if removed:
+            Artifact.query.filter(Artifact.id.in_([artifact_id for artifact_id, _ in removed])).delete(synchronize_session=False)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    for artifact_id, s3_key in removed:
+        artifact_cache.discard(s3_key)
+        results[artifact_id] = {"deleted": True}
+    return jsonify({
+        "deleted": len(removed),
+        "failed": len(results) - len(removed),
+        "results": results
+    })
+
 # --- Device Management (Commands) ---
 
 @management_bp.route("/devices", methods=["GET"])
 @require_auth
 @require_uploader
 def list_devices():
-    devices = Device.query.all()
-    return jsonify([{
+    if "since" in request.args:
+        # Incremental sync: only devices changed (and ids removed) since the cursor
+        return jsonify(device_sync.sync_response(request.args["since"], _device_json, limit=request.args.get("limit", type=int)))
+
+    limit, sort_column, descending, cursor = page_args(DEVICE_SORTS, "device_id")
+    query = filter_devices(Device.query.options(load_only(*DEVICE_LIST_COLUMNS)), request.args)
+    devices, next_cursor = keyset_page(query, sort_column, Device.device_id, descending, limit, cursor)
+    return jsonify([_device_json(d) for d in devices]), page_headers(next_cursor)
+
+def _device_json(d):
+    return {
         "device_id": d.device_id,
         "device_type": d.device_type,
         "current_version": d.current_version,
         "last_seen": d.last_seen.isoformat() + 'Z' if d.last_seen else None,
         "status": d.status
-    } for d in devices])
+    }
+
+@management_bp.route("/devices/summary", methods=["GET"])
+@require_auth
+@require_uploader
+def devices_summary():
+    # Counts by status/type/version, online/offline and usage percentiles (cached, see DEVICE_SUMMARY_TTL_SECONDS)
+    return jsonify(device_summary.get())
 
 @management_bp.route("/devices/<device_id>/command", methods=["POST"])
 @require_auth
 @require_uploader
 def queue_command(device_id):
     data = request.json
-    cmd = DeviceCommand(
-        device_id=device_id,
-        command=data['command']
-    )
-    db.session.add(cmd)
+    cmd = command_queue.enqueue(device_id, data['command'], max_attempts=data.get('max_attempts'))
     db.session.commit()
     return jsonify({"message": "Command queued", "command_id": cmd.id})
 
@@ -204,10 +312,43 @@ def get_command_status(command_id):
         "id": cmd.id,
         "status": cmd.status,
         "result": cmd.result,
+        "attempts": cmd.attempts,
+        "max_attempts": cmd.max_attempts,
+        "lease_expires_at": cmd.lease_expires_at.isoformat() if cmd.lease_expires_at else None,
+        "next_attempt_at": cmd.next_attempt_at.isoformat() if cmd.next_attempt_at else None,
+        "output": command_output.summary(cmd.id),
         "created_at": cmd.created_at.isoformat(),
         "executed_at": cmd.executed_at.isoformat() if cmd.executed_at else None
     })
 
+@management_bp.route("/commands/<command_id>/output", methods=["GET"])
+@require_auth
+@require_uploader
+def get_command_output(command_id):
+    """
+    Streamed output chunks after ?after=<seq> (default: from the start).
+    Live chunks are pushed on the /commands Socket.IO namespace.
+    """
+    cmd = DeviceCommand.query.get_or_404(command_id)
+    try:
+        after = int(request.args.get("after", -1))
+        limit = min(max(int(request.args.get("limit", 100)), 1), 500)
+    except ValueError:
+        return jsonify({"error": "after and limit must be integers"}), 400
+
+    chunks = command_output.read(cmd.id, after_seq=after, limit=limit)
+    return jsonify({
+        "command_id": cmd.id,
+        "status": cmd.status,
+        "chunks": [{
+            "seq": chunk.seq,
+            "stream": chunk.stream,
+            "data": command_output.load(chunk).decode("utf-8", errors="replace"),
+            "created_at": chunk.created_at.isoformat()
+        } for chunk in chunks],
+        "next_after": chunks[-1].seq if chunks else after
+    })
+
 import random
 
 @management_bp.route("/devices/<device_id>/terminal/start", methods=["POST"])
@@ -223,13 +364,70 @@ def start_terminal(device_id):
         "message": "Terminal requested",
     })
 
+@management_bp.route("/devices/logs/search", methods=["GET"])
+@require_auth
+@require_uploader
+def search_device_logs():
+    """
+    Fleet-wide log search: ?q=&device_type=&type=&since=&until=&limit=&cursor=
+    (since/until are ISO timestamps; pass next_cursor back as cursor for the next page).
+    """
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({"error": "q required"}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+    try:
+        since = datetime.fromisoformat(request.args['since'].rstrip('Z')) if request.args.get('since') else None
+        until = datetime.fromisoformat(request.args['until'].rstrip('Z')) if request.args.get('until') else None
+        results, next_cursor = log_search.search(
+            q,
+            device_type=request.args.get('device_type'),
+            log_type=request.args.get('type'),
+            since=since,
+            until=until,
+            limit=limit,
+            cursor=request.args.get('cursor')
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid since, until or cursor"}), 400
+
+    return jsonify({"results": results, "next_cursor": next_cursor})
+
 @management_bp.route("/devices/<device_id>/logs", methods=["GET"])
 @require_auth
 @require_uploader
 def get_device_logs(device_id):
     limit = request.args.get('limit', 50, type=int)
     log_type = request.args.get('type')
-    
+
+    # Byte range of an append-only log stream (?offset=&length= or a Range header),
+    # streamed segment by segment
+    if 'offset' in request.args or request.range:
+        if not log_type:
+            return jsonify({"error": "type required for offset reads"}), 400
+        end = log_store.end_offset(device_id, log_type)
+        headers = {"X-Log-End-Offset": str(end), "Accept-Ranges": "bytes"}
+        status = 200
+
+        if request.range:
+            bounds = request.range.range_for_length(end)
+            if bounds is None:
+                return Response(status=416, headers={"Content-Range": f"bytes */{end}"})
+            offset, length = bounds[0], bounds[1] - bounds[0]
+            headers["Content-Range"] = f"bytes {bounds[0]}-{bounds[1] - 1}/{end}"
+            status = 206
+        else:
+            offset = max(request.args.get('offset', 0, type=int), 0)
+            length = request.args.get('length', type=int)
+
+        return Response(
+            stream_with_context(log_store.read_range(device_id, log_type, offset, length)),
+            status=status,
+            mimetype="text/plain; charset=utf-8",
+            headers=headers
+        )
+
     query = DeviceLog.query.filter_by(device_id=device_id)
     if log_type:
         query = query.filter_by(log_type=log_type)
@@ -242,3 +440,78 @@ def get_device_logs(device_id):
         "type": l.log_type,
         "content": l.log_content
     } for l in logs])
+
+@management_bp.route("/devices/<device_id>/logs/stream/token", methods=["POST"])
+@require_auth
+@require_uploader
+def stream_device_logs_token(device_id):
+    """
+    Short-lived ?token= for the log stream, for browsers: EventSource cannot
+    send an Authorization header. The token only opens that device's stream.
+    """
+    path = url_for("management.stream_device_logs", device_id=device_id)
+    try:
+        token = issue_stream_token(g.user_id, path)
+    except AuthError as e:
+        return jsonify({"error": e.message}), e.status
+    return jsonify({"token": token, "url": f"{path}?token={token}", "expires_in": Config.STREAM_TOKEN_TTL_SECONDS})
+
+@management_bp.route("/devices/<device_id>/logs/stream", methods=["GET"])
+@require_auth_or_stream_token
+@require_uploader
+def stream_device_logs(device_id):
+    """
+    Server-Sent Events tail of one log stream. Each event carries the new text
+    and its id is the byte offset to resume from, so a reconnecting client
+    (Last-Event-ID) or ?offset= only receives bytes it has not seen.
+
+    Browsers authenticate with ?token= from POST .../logs/stream/token. The
+    token only has to be valid when the stream is opened; once it has expired,
+    a reconnect is refused (401) and the client fetches a new token and
+    reopens with ?offset= set to the last event id.
+    """
+    log_type = request.args.get('type')
+    if not log_type:
+        return jsonify({"error": "type required"}), 400
+
+    end = log_store.end_offset(device_id, log_type)
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    if last_event_id.isdigit():
+        position = int(last_event_id)
+    elif 'offset' in request.args:
+        position = request.args.get('offset', 0, type=int)
+    else:
+        position = end - request.args.get('tail', Config.LOG_STREAM_DEFAULT_TAIL, type=int)
+    position = min(max(position, log_store.start_offset(device_id, log_type)), end)
+
+    def events():
+        current = position
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        deadline = time.monotonic() + Config.LOG_STREAM_MAX_SECONDS
+        last_sent = time.monotonic()
+        yield "retry: 2000\n\n"
+
+        while time.monotonic() < deadline:
+            end = log_store.end_offset(device_id, log_type)
+            for piece in (log_store.read_range(device_id, log_type, current, end - current) if end > current else ()):
+                current += len(piece)
+                text = decoder.decode(piece)
+                if text:
+                    # Bytes of a split UTF-8 character are not acknowledged yet
+                    event_id = current - len(decoder.getstate()[0])
+                    yield f"id: {event_id}\nevent: log\ndata: {json.dumps({'text': text, 'offset': event_id})}\n\n"
+                    last_sent = time.monotonic()
+
+            # Don't hold a pooled connection while idle
+            db.session.close()
+            if not log_notifier.wait(device_id, log_type, current, Config.LOG_STREAM_POLL_SECONDS):
+                if time.monotonic() - last_sent >= 15:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+
+    db.session.close()
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
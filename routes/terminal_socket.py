@@ -2,36 +2,130 @@ import logging
 from flask import request
 from flask_socketio import emit, disconnect, join_room, leave_room
 import threading
+from config import Config
+from services.socket_registry import socket_registry
+from services.socket_auth import socket_sessions, authenticate_connect
 
 logger = logging.getLogger("seaweed-flask")
 
-# Track the authoritative device SID for each device_id
-# This prevents multiple "cloned" device connections from causing double-echo
-active_devices = {}
+NAMESPACE = '/terminal'
+
+
+def legacy_group(device_id):
+    # Legacy (untyped) clients per device. The legacy `device_<id>` room is only
+    # emitted to while someone has opted into it, so modern sessions pay for one emit.
+    return f"legacy:{device_id}"
+
+
+class SampledCounter:
+    """Counts relay events and logs a DEBUG summary every `every` events."""
+
+    def __init__(self, every):
+        self.every = max(int(every), 1)
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, nbytes=0):
+        with self._lock:
+            count, total = self.counts.get(name, (0, 0))
+            count += 1
+            total += nbytes
+            self.counts[name] = (count, total)
+        if count % self.every == 0 and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Terminal relay: {count} {name} events, {total} bytes")
+
+
+class OutputCoalescer:
+    """
+    Batches terminal output chunks per device for a short window before emitting,
+    so a burst of small writes (e.g. `cat` of a large log) becomes one emit.
+    """
+
+    def __init__(self, socketio, window_ms):
+        self.socketio = socketio
+        self.window = window_ms / 1000.0
+        self._pending = {} # device_id -> list of chunks
+        self._lock = threading.Lock()
+
+    def push(self, device_id, payload):
+        if self.window <= 0:
+            self._emit(device_id, [payload])
+            return
+
+        with self._lock:
+            chunks = self._pending.get(device_id)
+            if chunks is not None:
+                chunks.append(payload)
+                return
+            self._pending[device_id] = [payload]
+
+        # First chunk of a window schedules the flush
+        self.socketio.start_background_task(self._flush_later, device_id)
+
+    def _flush_later(self, device_id):
+        self.socketio.sleep(self.window)
+        with self._lock:
+            chunks = self._pending.pop(device_id, [])
+        if chunks:
+            self._emit(device_id, chunks)
+
+    def _emit(self, device_id, chunks):
+        for payload in merge_chunks(chunks):
+            self.socketio.emit('output', payload, to=f"device_{device_id}_browsers", namespace=NAMESPACE)
+            if socket_registry.has_members(NAMESPACE, legacy_group(device_id)):
+                self.socketio.emit('output', payload, to=f"device_{device_id}", namespace=NAMESPACE)
+
+
+def merge_chunks(chunks):
+    """Joins consecutive str (or bytes) chunks, keeping order for anything else."""
+    merged = []
+    for chunk in chunks:
+        if merged and isinstance(chunk, (str, bytes)) and type(chunk) is type(merged[-1]):
+            merged[-1] = merged[-1] + chunk
+        else:
+            merged.append(chunk)
+    return merged
+
 
 def register_socket_events(socketio):
-    
-    @socketio.on('connect', namespace='/terminal')
-    def handle_terminal_connect():
-        logger.info(f"Terminal Client connected: {request.sid}")
+    coalescer = OutputCoalescer(socketio, Config.TERMINAL_COALESCE_MS)
+    counter = SampledCounter(Config.TERMINAL_LOG_SAMPLE_EVERY)
+
+    def revoke(sid, device_id):
+        # The device changed owner: stop relaying its terminal to this socket
+        for room in (f"device_{device_id}_browsers", f"device_{device_id}_devices", f"device_{device_id}"):
+            socketio.server.leave_room(sid, room, namespace=NAMESPACE)
+        socket_registry.remove_member(NAMESPACE, legacy_group(device_id), sid)
 
-    @socketio.on('disconnect', namespace='/terminal')
+    socket_sessions.on_revoke(NAMESPACE, revoke)
+
+    @socketio.on('connect', namespace=NAMESPACE)
+    def handle_terminal_connect(auth=None):
+        # Token is verified here only; later events are checked against the session
+        session = authenticate_connect(NAMESPACE, request.sid, auth, request.headers)
+        socket_registry.connect(NAMESPACE, request.sid)
+        logger.info(f"Terminal Client connected: {request.sid} (user {session.user_id})")
+
+    @socketio.on('disconnect', namespace=NAMESPACE)
     def handle_terminal_disconnect():
         logger.info(f"Terminal Client disconnected: {request.sid}")
-        # Cleanup active_devices if it was the authoritative one
-        for dev_id, sid in list(active_devices.items()):
-            if sid == request.sid:
-                del active_devices[dev_id]
-                logger.info(f"Authoritative device {dev_id} disconnected")
+        socket_sessions.drop(NAMESPACE, request.sid)
+        # Drop authority (and legacy room opt-ins) for this SID
+        for dev_id in socket_registry.disconnect(NAMESPACE, request.sid):
+            logger.info(f"Authoritative device {dev_id} disconnected")
 
-    @socketio.on('join', namespace='/terminal')
+    @socketio.on('join', namespace=NAMESPACE)
     def handle_join(data):
         device_id = data.get('device_id')
         client_type = data.get('type') # 'browser' or 'device'
-        
+
         if not device_id:
             return
-            
+        if not socket_sessions.authorize_join(NAMESPACE, request.sid, device_id):
+            logger.warning(f"Client {request.sid} refused terminal access to {device_id}")
+            emit('server_message', {'data': f'Access denied to {device_id}'}, room=request.sid)
+            return
+
         # Separate rooms for browsers and devices to prevent any cross-echo
         if client_type == 'browser':
             room = f"device_{device_id}_browsers"
@@ -41,13 +135,18 @@ def register_socket_events(socketio):
         elif client_type == 'device':
             room = f"device_{device_id}_devices"
             join_room(room)
-            active_devices[device_id] = request.sid
+            # Track the authoritative device SID for each device_id
+            # This prevents multiple "cloned" device connections from causing double-echo
+            socket_registry.bind(NAMESPACE, device_id, request.sid)
             logger.info(f"Device {request.sid} joined {room} as AUTHORITATIVE")
-        else:
-            # Fallback for old clients
+
+        # Old clients (no type) and clients that ask for it explicitly get the legacy room
+        if client_type not in ('browser', 'device') or data.get('legacy'):
             join_room(f"device_{device_id}")
+            socket_registry.add_member(NAMESPACE, legacy_group(device_id), request.sid)
+            logger.info(f"Client {request.sid} opted into legacy room device_{device_id}")
 
-    @socketio.on('leave', namespace='/terminal')
+    @socketio.on('leave', namespace=NAMESPACE)
     def handle_leave(data):
         device_id = data.get('device_id')
         if device_id:
@@ -55,41 +154,41 @@ def register_socket_events(socketio):
             leave_room(f"device_{device_id}_browsers")
             leave_room(f"device_{device_id}_devices")
             leave_room(f"device_{device_id}")
+            socket_registry.remove_member(NAMESPACE, legacy_group(device_id), request.sid)
             logger.info(f"Client {request.sid} left terminal rooms for {device_id}")
 
-    @socketio.on('input', namespace='/terminal')
+    @socketio.on('input', namespace=NAMESPACE)
     def handle_input(data):
         # Browser -> Device
         device_id = data.get('device_id')
         payload = data.get('data')
-        
-        if device_id:
+
+        if device_id and socket_sessions.allows(NAMESPACE, request.sid, device_id):
              # Relay ONLY to devices interested in this ID
-             logger.info(f"Input from browser {request.sid} -> device_{device_id}_devices")
+             counter.incr('input', len(payload) if payload else 0)
              emit('input', payload, room=f"device_{device_id}_devices", include_self=False)
-             # Fallback for old clients
-             emit('input', payload, room=f"device_{device_id}", include_self=False)
+             if socket_registry.has_members(NAMESPACE, legacy_group(device_id)):
+                 emit('input', payload, room=f"device_{device_id}", include_self=False)
 
-    @socketio.on('output', namespace='/terminal')
+    @socketio.on('output', namespace=NAMESPACE)
     def handle_output(data):
         # Device -> Browser
         device_id = data.get('device_id')
         payload = data.get('data')
-        
-        if device_id:
+
+        if device_id and socket_sessions.allows(NAMESPACE, request.sid, device_id):
             # AUTHORITATIVE CHECK: Only relay if this is the active device SID
-            if active_devices.get(device_id) == request.sid:
-                logger.info(f"Output from authoritative device {request.sid} -> device_{device_id}_browsers")
-                emit('output', payload, room=f"device_{device_id}_browsers", include_self=False)
-                # Fallback for old clients
-                emit('output', payload, room=f"device_{device_id}", include_self=False)
+            if socket_registry.get_sid(NAMESPACE, device_id) == request.sid:
+                counter.incr('output', len(payload) if payload else 0)
+                coalescer.push(device_id, payload)
             else:
                 # Ignore output from "ghost" or legacy connections
-                logger.warning(f"Ignored output from non-authoritative SID {request.sid} for {device_id}")
+                counter.incr('ignored_output')
 
-    @socketio.on('resize', namespace='/terminal')
+    @socketio.on('resize', namespace=NAMESPACE)
     def handle_resize(data):
         device_id = data.get('device_id')
-        if device_id:
+        if device_id and socket_sessions.allows(NAMESPACE, request.sid, device_id):
              emit('resize', data, room=f"device_{device_id}_devices", include_self=False)
-             emit('resize', data, room=f"device_{device_id}", include_self=False)
+             if socket_registry.has_members(NAMESPACE, legacy_group(device_id)):
+                 emit('resize', data, room=f"device_{device_id}", include_self=False)
@@ -1,6 +1,13 @@
 from flask import Blueprint, request, jsonify, g
-from models import db, Device, DeviceCommand
+from models import db, Device, DeviceCommand, DeviceLog
 from middleware.auth import require_auth
+from services.command_output import command_output
+from services.log_store import log_store
+from services.pagination import page_args, keyset_page, page_headers
+from services.device_listing import DEVICE_SORTS, DEVICE_LIST_COLUMNS, filter_devices
+from services import device_sync
+from services.permissions import permissions
+from sqlalchemy.orm import load_only
 from datetime import datetime
 
 user_devices_bp = Blueprint("user_devices", __name__)
@@ -30,6 +37,7 @@ def register_device():
         return jsonify({"error": "Device is already bound to another user"}), 409
     
     # Bind device to user
+    owner_changed = device.user_id != g.user_id
     device.user_id = g.user_id
     if friendly_name:
         device.friendly_name = friendly_name
@@ -40,6 +48,8 @@ def register_device():
 
     try:
         db.session.commit()
+        if owner_changed:
+            permissions.device_owner_changed(device_id) # Clears cached socket join refusals
         return jsonify({
             "message": "Device registered successfully",
             "device": {
@@ -58,16 +68,26 @@ def list_user_devices():
     """
     List all devices bound to the authenticated user.
     """
-    devices = Device.query.filter_by(user_id=g.user_id).all()
+    if "since" in request.args:
+        # Incremental sync: devices changed since the cursor, plus ids deleted or unbound
+        return jsonify(device_sync.sync_response(
+            request.args["since"], _user_device_json, user_id=str(g.user_id), limit=request.args.get("limit", type=int)))
+
+    limit, sort_column, descending, cursor = page_args(DEVICE_SORTS, "device_id")
+    query = filter_devices(Device.query.options(load_only(*DEVICE_LIST_COLUMNS)).filter_by(user_id=g.user_id), request.args)
+    devices, next_cursor = keyset_page(query, sort_column, Device.device_id, descending, limit, cursor)
     
-    return jsonify([{
+    return jsonify([_user_device_json(d) for d in devices]), page_headers(next_cursor)
+
+def _user_device_json(d):
+    return {
         "device_id": d.device_id,
         "friendly_name": d.friendly_name,
         "type": d.device_type,
         "version": d.current_version,
         "status": d.status,
         "last_seen": d.last_seen.isoformat() + 'Z' if d.last_seen else None
-    } for d in devices])
+    }
 
 @user_devices_bp.route("/api/user/devices/<device_id>", methods=["DELETE"])
 @require_auth
@@ -75,7 +95,7 @@ def unbind_device(device_id):
     """
     Unbind a device from the user. Admin can delete it entirely.
     """
-    is_admin = (str(g.user_id) == '41')
+    is_admin = permissions.is_super_admin(g.user_id)
     
     if is_admin: # Admin override
         device = Device.query.filter_by(device_id=device_id).first()
@@ -85,9 +105,13 @@ def unbind_device(device_id):
     if not device:
         return jsonify({"error": "Device not found or not bound to user"}), 404
     
+    log_keys, output_keys = [], []
     try:
         if is_admin:
-            # Full Delete
+            # Full Delete, with everything that references the device
+            log_keys = log_store.delete_for_device(device_id)
+            DeviceLog.query.filter_by(device_id=device_id).delete()
+            output_keys = command_output.delete_for_device(device_id)
             DeviceCommand.query.filter_by(device_id=device_id).delete()
             db.session.delete(device)
             msg = "Device deleted successfully"
@@ -98,6 +122,11 @@ def unbind_device(device_id):
             msg = "Device unbound successfully"
             
         db.session.commit()
+        # S3 objects go only once the rows referencing them are gone
+        log_store.delete_objects(log_keys)
+        command_output.delete_objects(output_keys)
+        # Open sockets of the former owner lose the device in every worker
+        permissions.device_owner_changed(device_id)
         return jsonify({"message": msg}), 200
     except Exception as e:
         db.session.rollback()
@@ -115,7 +144,7 @@ def get_user_device(device_id):
         return jsonify({"error": "Device not found"}), 404
         
     # Check ownership (unless admin, but for now strict user binding)
-    if device.user_id != g.user_id and str(g.user_id) != '41':
+    if device.user_id != g.user_id and not permissions.is_super_admin(g.user_id):
         return jsonify({"error": "Unauthorized"}), 403
     
     return jsonify({
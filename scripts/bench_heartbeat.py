@@ -0,0 +1,100 @@
+import sys
+import os
+import json
+import time
+import argparse
+import importlib.util
+
+# Add parent dir to path so we can import the services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from services.device_payload import decode
+from services.json_codec import ORJSONProvider, dumps_compact
+from device_simulator import encode_body, get_stats
+
+# Compares the heartbeat path before this change (json= body parsed with the
+# stdlib, stats stored as json.dumps text) with each encoding/compression the
+# device endpoints accept. Encodings whose library is missing are skipped.
+
+ENCODINGS = [("json", None), ("msgpack", "msgpack"), ("cbor", "cbor2")]
+COMPRESSIONS = [(None, None), ("gzip", None), ("zstd", "zstandard")]
+
+
+def available(module):
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def heartbeat(i):
+    return {"device_id": f"bench-{i}", "status": "online", "version": "1.0.2",
+            "device_type": "compute_node", "stats": get_stats()}
+
+
+def timed(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) / (repeat * len(items)) * 1e6
+
+
+def run(samples, repeat):
+    payloads = [heartbeat(i) for i in range(samples)]
+    results = []
+
+    # Baseline: what requests' json= sends and what request.json / db.JSON did with it
+    bodies = [json.dumps(p).encode() for p in payloads]
+    results.append({
+        "variant": "baseline (json, stdlib)",
+        "wire_bytes": sum(map(len, bodies)) / samples,
+        "decode_us": timed(json.loads, bodies, repeat),
+        "stored_bytes": sum(len(json.dumps(p["stats"])) for p in payloads) / samples
+    })
+
+    stored = sum(len(dumps_compact(p["stats"])) for p in payloads) / samples
+    for encoding, module in ENCODINGS:
+        for compression, cmodule in COMPRESSIONS:
+            if not (available(module) and available(cmodule)):
+                continue
+            encoded = [encode_body(p, encoding, compression) for p in payloads]
+            requests = [(body, headers["Content-Type"], headers.get("Content-Encoding")) for body, headers in encoded]
+            results.append({
+                "variant": f"{encoding}+{compression}" if compression else encoding,
+                "wire_bytes": sum(len(body) for body, _, _ in requests) / samples,
+                "decode_us": timed(lambda r: decode(*r, max_bytes=1 << 24), requests, repeat),
+                "stored_bytes": stored
+            })
+
+    # Responses: jsonify() with the default provider vs orjson
+    app = Flask(__name__)
+    response = {"status": "ok", "commands": [{"id": f"cmd-{i}", "command": "uptime", "attempt": 1} for i in range(3)]}
+    stdlib, fast = app.json, ORJSONProvider(app)
+    response_us = {
+        "stdlib": timed(lambda r: stdlib.dumps(r, separators=(",", ":")), [response], repeat * samples),
+        "orjson": timed(lambda r: fast.dumps(r, separators=(",", ":")), [response], repeat * samples)
+    }
+    return {"samples": samples, "heartbeat": results, "response_encode_us": response_us}
+
+
+def print_table(report):
+    base = report["heartbeat"][0]
+    print(f"{'variant':<26}{'wire B':>10}{'vs base':>9}{'decode us':>11}{'stored B':>10}")
+    for row in report["heartbeat"]:
+        print(f"{row['variant']:<26}{row['wire_bytes']:>10.0f}{row['wire_bytes'] / base['wire_bytes']:>8.0%} "
+              f"{row['decode_us']:>10.1f}{row['stored_bytes']:>10.0f}")
+    print(f"\nresponse encode us: " + ", ".join(f"{k} {v:.2f}" for k, v in report["response_encode_us"].items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark heartbeat body size, parse CPU and stored size per encoding")
+    parser.add_argument("--samples", type=int, default=200, help="Distinct heartbeats generated")
+    parser.add_argument("--repeat", type=int, default=20, help="Decode passes over the samples")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    report = run(args.samples, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
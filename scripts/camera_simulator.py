@@ -25,10 +25,10 @@ def connect():
 def disconnect():
     print("Disconnected from camera socket")
 
-def stream_camera(device_id, camera_id):
+def stream_camera(device_id, camera_id, auth_token):
     global streaming
     print(f"Starting stream for camera {camera_id}...")
-    sio.connect(SOCKET_URL, namespaces=['/camera'], socketio_path='/socket.io')
+    sio.connect(SOCKET_URL, namespaces=['/camera'], socketio_path='/socket.io', auth={'token': auth_token})
     
     # Needs a slight delay to ensure connect event completes
     time.sleep(0.5)
@@ -74,7 +74,7 @@ def start_polling(device_id, auth_token):
                 if cmd and not streaming:
                     print(f"Received command to start camera: {cmd}")
                     streaming = True
-                    streaming_thread = threading.Thread(target=stream_camera, args=(device_id, cmd))
+                    streaming_thread = threading.Thread(target=stream_camera, args=(device_id, cmd, auth_token))
                     streaming_thread.daemon = True
                     streaming_thread.start()
                 elif not cmd and streaming:
@@ -1,5 +1,6 @@
 import requests
 import json
+import gzip
 import time
 import random
 import datetime
@@ -8,6 +9,10 @@ import datetime
 API_URL = "https://api.robogenic.site/blob/device/heartbeat" 
 TOKEN = "YOUR_JWT_TOKEN_HERE" 
 DEVICE_ID = "simulated-device-001"
+ENCODING = "json" # json, msgpack (pip install msgpack) or cbor (pip install cbor2)
+COMPRESSION = None # None, "gzip" or "zstd" (pip install zstandard)
+
+CONTENT_TYPES = {"json": "application/json", "msgpack": "application/msgpack", "cbor": "application/cbor"}
 
 # Global state for network counters to simulate accumulation
 net_state = {
@@ -81,6 +86,27 @@ def get_stats():
         }
     }
 
+def encode_body(payload, encoding=ENCODING, compression=COMPRESSION):
+    """Serializes and optionally compresses a request body. Returns (body, headers)."""
+    if encoding == "msgpack":
+        import msgpack
+        body = msgpack.packb(payload)
+    elif encoding == "cbor":
+        import cbor2
+        body = cbor2.dumps(payload)
+    else:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+    headers = {"Content-Type": CONTENT_TYPES[encoding]}
+
+    if compression == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+    elif compression == "zstd":
+        import zstandard
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    if compression:
+        headers["Content-Encoding"] = compression
+    return body, headers
+
 def send_heartbeat():
     payload = {
         "device_id": DEVICE_ID,
@@ -90,14 +116,12 @@ def send_heartbeat():
         "stats": get_stats()
     }
     
-    headers = {
-        "Authorization": f"Bearer {TOKEN}",
-        "Content-Type": "application/json"
-    }
+    body, headers = encode_body(payload)
+    headers["Authorization"] = f"Bearer {TOKEN}"
     
     try:
-        print(f"Sending heartbeat to {API_URL}...")
-        response = requests.post(API_URL, json=payload, headers=headers)
+        print(f"Sending heartbeat to {API_URL} ({len(body)} bytes)...")
+        response = requests.post(API_URL, data=body, headers=headers)
         
         if response.status_code == 200:
             print(f"[{response.status_code}] Success")
@@ -0,0 +1,157 @@
+"""
+Local server for load tests (scripts/load_test.py), with stand-ins for the
+external services so only this app is measured:
+
+- auth: any "Bearer loadtest-<user_id>" token is valid for <user_id>, without a
+  call to the auth service. That user is the super admin, so it may join
+  every device's terminal and camera rooms.
+- S3: an in-memory bucket. Presigned URLs are still signed by boto3 locally.
+- database: a throwaway SQLite file unless --database-url is given. SQLite runs
+  on one pooled connection, since writers would otherwise block the whole event
+  loop on its file lock. Use PostgreSQL for numbers that mean anything.
+
+    python scripts/load_server.py --port 5055
+    python scripts/load_server.py --database-url postgresql://bench@localhost/bench
+
+Serves like wsgi.py (eventlet, one worker). The device sweeper is off.
+"""
+import os
+import sys
+
+# Monkey-patching has to happen before anything imports sockets or threading (see wsgi.py)
+import eventlet
+eventlet.monkey_patch()
+
+import io
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TOKEN_PREFIX = "Bearer loadtest-"
+DEVICE_TYPE = "loadtest"
+ARTIFACT_VERSION = "2.0"
+
+
+class MemoryS3:
+    """The subset of the boto3 S3 client the app calls, over a dict."""
+
+    def __init__(self):
+        self.objects = {} # key -> (body, content_type, last_modified)
+        self._lock = threading.Lock()
+
+    def head_bucket(self, Bucket):
+        return {}
+
+    def put_object(self, Bucket, Key, Body=b"", ContentType="binary/octet-stream", **kwargs):
+        body = Body.read() if hasattr(Body, "read") else bytes(Body)
+        with self._lock:
+            self.objects[Key] = (body, ContentType, datetime.utcnow())
+        return {"ETag": f'"{len(body):x}"'}
+
+    def _get(self, Key):
+        try:
+            return self.objects[Key]
+        except KeyError:
+            from botocore.exceptions import ClientError
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not Found"}}, "GetObject")
+
+    def get_object(self, Bucket, Key, **kwargs):
+        body, content_type, _ = self._get(Key)
+        return {"Body": io.BytesIO(body), "ContentLength": len(body), "ContentType": content_type}
+
+    def head_object(self, Bucket, Key):
+        body, content_type, last_modified = self._get(Key)
+        return {"ContentLength": len(body), "ContentType": content_type, "ETag": f'"{len(body):x}"',
+                "LastModified": last_modified}
+
+    def download_fileobj(self, Bucket, Key, Fileobj):
+        Fileobj.write(self._get(Key)[0])
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self.objects.pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete):
+        with self._lock:
+            for obj in Delete["Objects"]:
+                self.objects.pop(obj["Key"], None)
+        return {"Errors": []}
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket, Prefix="", **kwargs):
+        with self._lock:
+            items = sorted((k, v) for k, v in self.objects.items() if k.startswith(Prefix))
+        yield {"Contents": [{"Key": k, "Size": len(body), "LastModified": modified, "ETag": f'"{len(body):x}"'}
+                            for k, (body, _, modified) in items]}
+
+
+def stand_in_verify(url, headers=None, timeout=None):
+    """Replaces the auth service call in middleware.auth."""
+    from unittest.mock import Mock
+    auth = (headers or {}).get("Authorization", "")
+    if not auth.startswith(TOKEN_PREFIX):
+        return Mock(status_code=401, text="invalid token")
+    return Mock(status_code=200, json=Mock(return_value={"isValid": True, "user_id": auth[len(TOKEN_PREFIX):]}))
+
+
+def build_app(database_url, user_id):
+    from config import Config
+    Config.SQLALCHEMY_DATABASE_URI = database_url
+    Config.SUPER_ADMIN_ID = user_id
+    Config.ASYNC_MODE = "eventlet"
+    # Only used to sign URLs; nothing connects to them
+    Config.PUBLIC_S3_URL = Config.PUBLIC_S3_URL or "http://127.0.0.1:8333"
+    Config.AWS_ACCESS_KEY = Config.AWS_ACCESS_KEY or "loadtest"
+    Config.AWS_SECRET_KEY = Config.AWS_SECRET_KEY or "loadtest"
+
+    from app import create_app, socketio
+    from models import db, Artifact
+    from services.s3_service import s3_service
+    from migrations import upgrade
+    from sqlalchemy import create_engine
+
+    if database_url.startswith("sqlite"):
+        from sqlalchemy.pool import QueuePool
+        Config.SQLALCHEMY_ENGINE_OPTIONS = {"poolclass": QueuePool, "pool_size": 1, "max_overflow": 0, "pool_timeout": 60}
+
+    # Own engine, as `python -m migrations` does: the runner holds one connection while applying on another
+    engine = create_engine(database_url)
+    upgrade(engine)
+    engine.dispose()
+
+    app = create_app()
+    s3_service._s3, s3_service._bucket_checked = MemoryS3(), True
+
+    with app.app_context():
+        # One active artifact, so /update/check takes the update-available path
+        if not db.session.get(Artifact, "loadtest-firmware"):
+            key = f"artifacts/{DEVICE_TYPE}/{ARTIFACT_VERSION}/firmware.bin"
+            s3_service.put_bytes(key, os.urandom(64 * 1024))
+            db.session.add(Artifact(id="loadtest-firmware", device_type=DEVICE_TYPE, artifact_type="firmware",
+                                    version=ARTIFACT_VERSION, s3_key=key, checksum="loadtest", is_active=True,
+                                    created_by=user_id))
+            db.session.commit()
+    return app, socketio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the app with stand-in auth and S3 for load testing")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--database-url", default=None, help="Default: a new SQLite file in the temp dir")
+    parser.add_argument("--user-id", default="1", help="User the stand-in tokens resolve to")
+    parser.add_argument("--log-level", default="WARNING", help="INFO logs every heartbeat body, as in production")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='loadtest-')}/load.db"
+    with patch("middleware.auth.requests.get", side_effect=stand_in_verify):
+        app, socketio = build_app(database_url, args.user_id)
+        print(f"Load test server on port {args.port} ({database_url})", flush=True)
+        logging.getLogger().setLevel(args.log_level)
+        socketio.run(app, host="127.0.0.1", port=args.port, log_output=False)
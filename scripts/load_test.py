@@ -0,0 +1,363 @@
+"""
+Load generator: N simulated devices against one server, over asyncio.
+
+Each device sends heartbeats (device_simulator.get_stats, in any encoding
+the server accepts), checks for updates and appends log chunks on its own
+interval, with starts spread over --ramp seconds. The first --camera-devices
+also stream frames over /camera to a subscribed browser. The first
+--terminal-devices echo terminal input back over /terminal. Socket flows are
+timed end to end (device -> server -> browser), and frames or echoes that
+never arrive count as errors.
+
+    python scripts/load_test.py --serve --devices 2000 --duration 60 --out loadtest.jsonl
+    python scripts/load_test.py --url http://127.0.0.1:5055 --token loadtest-1 --devices 500
+
+--serve starts scripts/load_server.py (stand-in auth and S3) on a free port.
+Against any other server, --token must belong to a user who may join the
+simulated devices' rooms. Results are printed per endpoint: throughput,
+p50/p90/p99 latency and error rate. --out appends them as one JSON line per
+run, tagged with the git commit, so runs can be compared across commits.
+client_lag_ms is the generator's own event loop delay. If it grows, the
+generator is CPU bound and the numbers understate the server. Each device
+waits for a response before scheduling its next call, as the simulators do,
+so a slow server also lowers the offered load.
+
+Needs aiohttp (pip install aiohttp), which python-socketio's AsyncClient uses too.
+"""
+import os
+import re
+import sys
+import json
+import time
+import base64
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import aiohttp
+import socketio
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(SCRIPTS_DIR)
+
+from device_simulator import encode_body, get_stats
+from camera_simulator import BLANK_JPEG
+
+DEVICE_TYPE = "loadtest" # Matches the artifact load_server.py seeds
+ECHO_TOKEN = re.compile(r"<(\d+\.\d+)>")
+FRAME = base64.b64encode(BLANK_JPEG).decode()
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Metrics:
+    """Latency samples and outcomes per endpoint, collected inside the measurement window."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list) # name -> seconds, successful calls only
+        self.statuses = defaultdict(Counter) # name -> status -> count
+        self.expected = Counter() # name -> messages sent, for flows where the reply is the sample
+        self.lag = []
+        self.recording = False
+
+    def record(self, name, seconds, status=200, always=False):
+        if not (self.recording or always):
+            return
+        self.statuses[name][str(status)] += 1
+        if isinstance(status, int) and status < 400:
+            self.latencies[name].append(seconds)
+
+    def expect(self, name):
+        if self.recording:
+            self.expected[name] += 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        for name in sorted(set(self.statuses) | set(self.expected)):
+            statuses = self.statuses[name]
+            ok = len(self.latencies[name])
+            total = sum(statuses.values())
+            if name in self.expected:
+                # Socket flows: anything sent and never delivered is an error
+                statuses["lost"] = max(self.expected[name] - total, 0)
+                total = max(self.expected[name], total)
+            ordered = sorted(self.latencies[name])
+            ms = lambda p: round(percentile(ordered, p) * 1000, 2) if ordered else None
+            endpoints[name] = {
+                "requests": total,
+                "errors": total - ok,
+                "error_rate": round((total - ok) / total, 4) if total else 0.0,
+                "rps": round(ok / elapsed, 1),
+                "p50_ms": ms(50),
+                "p90_ms": ms(90),
+                "p99_ms": ms(99),
+                "max_ms": round(ordered[-1] * 1000, 2) if ordered else None,
+                "statuses": dict(statuses)
+            }
+        lag = sorted(self.lag)
+        return endpoints, {"p50": round((percentile(lag, 50) or 0) * 1000, 2),
+                           "p99": round((percentile(lag, 99) or 0) * 1000, 2)}
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.url = args.url.rstrip("/")
+        self.auth = f"Bearer {args.token}"
+        self.metrics = Metrics()
+        self.deadline = None
+
+    def running(self):
+        return time.monotonic() < self.deadline
+
+    async def every(self, interval, action, *args):
+        """Runs `action` every `interval` seconds (first run after a random offset) until the deadline."""
+        next_run = time.monotonic() + random.uniform(0, interval)
+        while True:
+            delay = next_run - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not self.running():
+                return
+            await action(*args)
+            next_run += interval
+
+    async def monitor_lag(self, tick=0.1):
+        """Event loop delay: how much later than asked a sleep returns. Grows when the generator is CPU bound."""
+        while self.running():
+            start = time.monotonic()
+            await asyncio.sleep(tick)
+            if self.metrics.recording:
+                self.metrics.lag.append(max(time.monotonic() - start - tick, 0))
+
+    async def request(self, name, method, path, **kwargs):
+        headers = {"Authorization": self.auth, **kwargs.pop("headers", {})}
+        start = time.perf_counter()
+        body = None
+        try:
+            async with self.http.request(method, self.url + path, headers=headers, **kwargs) as resp:
+                status = resp.status
+                body = await resp.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        self.metrics.record(name, time.perf_counter() - start, status)
+        return status, body
+
+    # HTTP device traffic
+
+    async def heartbeat(self, device):
+        payload = {"device_id": device["id"], "status": "online", "version": "1.0",
+                   "device_type": DEVICE_TYPE, "stats": get_stats()}
+        body, headers = encode_body(payload, self.args.encoding, self.args.compression)
+        await self.request("POST /device/heartbeat", "POST", "/device/heartbeat", data=body, headers=headers)
+
+    async def check_update(self, device):
+        params = {"device_type": DEVICE_TYPE, "artifact_type": "firmware", "current_version": "1.0"}
+        await self.request("GET /update/check", "GET", "/update/check", params=params)
+
+    async def upload_log(self, device):
+        lines = "".join(f"{datetime.now(timezone.utc).isoformat()} run.sh: step {i} ok\n" for i in range(20))
+        payload = {"device_id": device["id"], "type": "run_sh", "logs": lines, "offset": device["log_offset"]}
+        status, body = await self.request("POST /device/logs", "POST", "/device/logs", json=payload)
+        if status in (200, 409) and body:
+            device["log_offset"] = json.loads(body).get("next_offset", device["log_offset"])
+
+    # Socket.IO traffic (one device client and one browser client per simulated device)
+
+    async def connect(self, namespace):
+        client = socketio.AsyncClient(reconnection=False)
+        start = time.perf_counter()
+        try:
+            await client.connect(self.url, namespaces=[namespace], transports=["websocket"],
+                                 auth={"token": self.args.token}, wait_timeout=10)
+        except Exception as e:
+            self.metrics.record(f"socket {namespace} connect", time.perf_counter() - start, type(e).__name__, always=True)
+            return None
+        # Connects happen during the ramp, so they are always recorded
+        self.metrics.record(f"socket {namespace} connect", time.perf_counter() - start, always=True)
+        return client
+
+    async def camera(self, device):
+        device_client, browser = await self.connect("/camera"), await self.connect("/camera")
+        if device_client and browser:
+            @browser.on("frame", namespace="/camera")
+            def on_frame(data):
+                sent = float(data.split(":", 1)[0])
+                self.metrics.record("socket /camera frame", time.perf_counter() - sent)
+
+            await device_client.emit("join", {"device_id": device["id"], "type": "device"}, namespace="/camera")
+            await browser.emit("join", {"device_id": device["id"], "type": "browser"}, namespace="/camera")
+            await asyncio.sleep(0.5) # Joins are processed before the first frame
+
+            async def send_frame():
+                self.metrics.expect("socket /camera frame")
+                await device_client.emit("frame", {"device_id": device["id"], "data": f"{time.perf_counter()}:{FRAME}"},
+                                         namespace="/camera")
+            await self.every(1 / self.args.camera_fps, send_frame)
+            await asyncio.sleep(1) # Let the last frames arrive
+        for client in (device_client, browser):
+            if client:
+                await client.disconnect()
+
+    async def terminal(self, device):
+        device_client, browser = await self.connect("/terminal"), await self.connect("/terminal")
+        if device_client and browser:
+            @device_client.on("input", namespace="/terminal")
+            async def on_input(data):
+                await device_client.emit("output", {"device_id": device["id"], "data": data}, namespace="/terminal")
+
+            @browser.on("output", namespace="/terminal")
+            def on_output(data):
+                now = time.perf_counter()
+                for sent in ECHO_TOKEN.findall(data if isinstance(data, str) else ""):
+                    self.metrics.record("socket /terminal echo", now - float(sent))
+
+            await device_client.emit("join", {"device_id": device["id"], "type": "device"}, namespace="/terminal")
+            await browser.emit("join", {"device_id": device["id"], "type": "browser"}, namespace="/terminal")
+            await asyncio.sleep(0.5)
+
+            async def send_keystroke():
+                self.metrics.expect("socket /terminal echo")
+                await browser.emit("input", {"device_id": device["id"], "data": f"<{time.perf_counter()}>"},
+                                   namespace="/terminal")
+            await self.every(self.args.terminal_interval, send_keystroke)
+            await asyncio.sleep(1)
+        for client in (device_client, browser):
+            if client:
+                await client.disconnect()
+
+    async def device(self, index):
+        device = {"id": f"load-{index:05d}", "log_offset": 0}
+        await asyncio.sleep(random.uniform(0, self.args.ramp))
+        # The first heartbeat registers the device; socket joins need it to exist
+        await self.heartbeat(device)
+        tasks = [
+            self.every(self.args.heartbeat_interval, self.heartbeat, device),
+            self.every(self.args.update_interval, self.check_update, device),
+            self.every(self.args.log_interval, self.upload_log, device)
+        ]
+        if index < self.args.camera_devices:
+            tasks.append(self.camera(device))
+        if index < self.args.terminal_devices:
+            tasks.append(self.terminal(device))
+        await asyncio.gather(*tasks)
+
+    async def run(self):
+        args = self.args
+        connector = aiohttp.TCPConnector(limit=args.connections)
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as self.http:
+            self.deadline = time.monotonic() + args.ramp + args.duration
+            devices = asyncio.gather(self.monitor_lag(), *(self.device(i) for i in range(args.devices)))
+            # Everything is started by the end of the ramp; measure only the steady state after it
+            await asyncio.sleep(args.ramp)
+            self.metrics.recording = True
+            started = time.monotonic()
+            await devices
+            # Stop at the deadline: socket flows wait a little for in-flight messages before closing
+            elapsed = min(time.monotonic(), self.deadline) - started
+        return self.metrics.report(elapsed), elapsed
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    port = free_port()
+    command = [sys.executable, os.path.join(SCRIPTS_DIR, "load_server.py"), "--port", str(port)]
+    if args.database_url:
+        command += ["--database-url", args.database_url]
+    server = subprocess.Popen(command)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if server.poll() is not None:
+            raise SystemExit("load_server.py exited during startup")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return server, url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit("load_server.py did not start listening within 30s")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(result):
+    print(f"\n{result['devices']} devices, {result['duration_s']}s measured, commit {result['commit']}")
+    print(f"{'endpoint':<28}{'requests':>9}{'rps':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    fmt = lambda v: "-" if v is None else v
+    for name, row in result["endpoints"].items():
+        print(f"{name:<28}{row['requests']:>9}{row['rps']:>9}{fmt(row['p50_ms']):>9}{fmt(row['p90_ms']):>9}"
+              f"{fmt(row['p99_ms']):>9}{row['error_rate']:>8.2%}")
+    print(f"client lag: p50 {result['client_lag_ms']['p50']} ms, p99 {result['client_lag_ms']['p99']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive many simulated devices against a server and report per-endpoint latency")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--token", default="loadtest-1", help="Bearer token (load_server.py accepts loadtest-<user_id>)")
+    parser.add_argument("--serve", action="store_true", help="Start scripts/load_server.py and test against it")
+    parser.add_argument("--database-url", default=None, help="With --serve: database for the server (default SQLite)")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds, after the ramp")
+    parser.add_argument("--ramp", type=float, default=10, help="Seconds over which devices start")
+    parser.add_argument("--heartbeat-interval", type=float, default=5)
+    parser.add_argument("--update-interval", type=float, default=60)
+    parser.add_argument("--log-interval", type=float, default=30)
+    parser.add_argument("--camera-devices", type=int, default=10, help="Devices that also stream camera frames")
+    parser.add_argument("--camera-fps", type=float, default=10)
+    parser.add_argument("--terminal-devices", type=int, default=10, help="Devices with an open terminal session")
+    parser.add_argument("--terminal-interval", type=float, default=0.2, help="Seconds between keystrokes")
+    parser.add_argument("--encoding", default="json", choices=["json", "msgpack", "cbor"])
+    parser.add_argument("--compression", default=None, choices=["gzip", "zstd"])
+    parser.add_argument("--connections", type=int, default=200, help="HTTP connection pool size shared by all devices")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout, seconds")
+    parser.add_argument("--out", default=None, help="Append the results as one JSON line to this file")
+    args = parser.parse_args()
+
+    server = None
+    if args.serve:
+        server, args.url = start_server(args)
+    try:
+        (endpoints, lag), elapsed = asyncio.run(LoadTest(args).run())
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    config = {k: v for k, v in vars(args).items() if k not in ("token", "out", "database_url")}
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "devices": args.devices,
+        "duration_s": round(elapsed, 1),
+        "config": config,
+        "client_lag_ms": lag,
+        "endpoints": endpoints
+    }
+    print_table(result)
+    if args.out:
+        with open(args.out, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import sys
+import os
+
+# Add parent dir to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.log_store import log_store
+from services.device_sync import purge_tombstones
+
+# Run periodically (e.g. daily cron): drop expired log segments, then merge small ones
+def maintain():
+    with app.app_context():
+        removed = log_store.apply_retention()
+        print(f"Retention removed {removed} segment(s)")
+        merged = log_store.compact_all()
+        print(f"Compaction merged away {merged} segment(s)")
+        purged = purge_tombstones()
+        print(f"Purged {purged} device tombstone(s)")
+
+if __name__ == "__main__":
+    maintain()
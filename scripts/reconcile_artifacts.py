@@ -0,0 +1,24 @@
+import sys
+import os
+import json
+import argparse
+
+# Add parent dir to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.artifact_gc import ArtifactReconciler
+
+# Run periodically (e.g. weekly cron). Reports only, unless --delete is given.
+def reconcile(delete, grace_hours):
+    with app.app_context():
+        report = ArtifactReconciler(grace_hours).run(delete=delete)
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile artifacts/ objects in S3 with the artifacts table")
+    parser.add_argument("--delete", action="store_true", help="Delete orphaned objects past the grace period")
+    parser.add_argument("--grace-hours", type=int, default=None, help="Override ARTIFACT_ORPHAN_GRACE_HOURS")
+    args = parser.parse_args()
+
+    reconcile(args.delete, args.grace_hours)
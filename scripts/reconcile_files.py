@@ -0,0 +1,18 @@
+import sys
+import os
+import json
+
+# Add parent dir to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.file_index import file_index
+
+# Run periodically (e.g. nightly cron), and once after migration 0011 to index existing files.
+def reconcile():
+    with app.app_context():
+        counts = file_index.reconcile()
+        print(json.dumps(counts, indent=2))
+
+if __name__ == "__main__":
+    reconcile()
@@ -0,0 +1,147 @@
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import Config
+from models import db, Artifact
+from routes.device import device_bp
+from services.artifact_cache import ArtifactCache, ArtifactTooLarge, LOCK_NAME
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = objects
+        self.downloads = 0
+
+    def download_to(self, key, fileobj):
+        self.downloads += 1
+        time.sleep(0.05) # long enough for concurrent misses to overlap
+        fileobj.write(self.objects[key])
+
+    def head(self, key):
+        return {"size": len(self.objects[key])}
+
+    def generate_presigned_download(self, key):
+        return f"http://s3/{key}"
+
+def fetch(cache, key):
+    """(path, hit) of one read of `key`, with the file closed again."""
+    f, hit = cache.open(key)
+    f.close()
+    return f.name, hit
+
+class TestArtifactCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.s3 = FakeS3({"a": b"a" * 40, "b": b"b" * 40, "c": b"c" * 40, "huge": b"h" * 200})
+        for target in ('services.artifact_cache.s3_service', 'routes.device.s3_service'):
+            patcher = patch(target, self.s3)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_concurrent_misses_fetch_once(self):
+        cache = ArtifactCache(self.dir, max_bytes=100)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(fetch(cache, "a"))) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.s3.downloads, 1)
+        self.assertEqual(sorted(hit for _, hit in results), [False] + [True] * 9)
+
+    def test_lru_is_bounded_by_bytes(self):
+        cache = ArtifactCache(self.dir, max_bytes=100)
+        fetch(cache, "a")
+        fetch(cache, "b")
+        fetch(cache, "a") # b is now least recently used
+        fetch(cache, "c")
+        self.assertEqual(cache.stats()["bytes"], 80)
+        self.assertTrue(fetch(cache, "a")[1])
+        self.assertFalse(fetch(cache, "b")[1])
+        with self.assertRaises(ArtifactTooLarge):
+            fetch(cache, "huge")
+        self.assertEqual(len(set(os.listdir(self.dir)) - {LOCK_NAME}), 2)
+
+        # A new process picks the files back up
+        self.assertEqual(ArtifactCache(self.dir, max_bytes=100).stats()["objects"], 2)
+
+    def test_workers_sharing_the_directory(self):
+        one, two = ArtifactCache(self.dir, max_bytes=100), ArtifactCache(self.dir, max_bytes=100)
+        self.assertEqual(one.stats()["objects"], 0)
+        # Another worker's fill in progress, and one abandoned long ago
+        writing, abandoned = os.path.join(self.dir, "x.1"), os.path.join(self.dir, "y.2")
+        for tmp in (writing, abandoned):
+            open(tmp, "wb").close()
+        os.utime(abandoned, (0, 0))
+
+        self.assertFalse(fetch(two, "a")[1])
+        self.assertTrue(fetch(one, "a")[1]) # filled by the other worker: a hit, not fetched
+        self.assertEqual(self.s3.downloads, 1)
+
+        two.discard("a")
+        path, hit = fetch(one, "a") # gone: fetched again
+        self.assertEqual((hit, os.path.exists(path), one.stats()["bytes"]), (False, True, 40))
+
+        # Together the workers stay within max_bytes
+        fetch(one, "b")
+        fetch(two, "c")
+        self.assertEqual(one.stats()["bytes"], 80)
+        self.assertEqual(two.stats(), one.stats())
+
+        ArtifactCache(self.dir, max_bytes=100).stats()
+        self.assertTrue(os.path.exists(writing))
+        self.assertFalse(os.path.exists(abandoned))
+
+    def test_open_files_are_not_evicted(self):
+        one, two = ArtifactCache(self.dir, max_bytes=100), ArtifactCache(self.dir, max_bytes=100)
+        serving, _ = one.open("a") # a response still streaming it
+        fetch(two, "b")
+        fetch(two, "c") # over budget, but "a" is in use: "b" goes instead
+        self.assertEqual(serving.read(), b"a" * 40)
+        serving.close()
+        self.assertTrue(one.contains("a"))
+        self.assertFalse(one.contains("b"))
+
+    def test_proxy_route_serves_ranges(self):
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(app)
+        app.register_blueprint(device_bp)
+        with app.app_context():
+            db.create_all()
+            db.session.add(Artifact(id="art-1", device_type="cam", artifact_type="firmware", version="1.0",
+                                    s3_key="a", checksum="abc", created_by=1))
+            db.session.add(Artifact(id="art-2", device_type="cam", artifact_type="model", version="1.0",
+                                    s3_key="huge", created_by=1))
+            db.session.commit()
+
+        with patch('routes.device.artifact_cache', ArtifactCache(self.dir, max_bytes=100)), \
+             patch.object(Config, 'ARTIFACT_PROXY_ENABLED', True):
+            client = app.test_client()
+            resp = client.get("/update/artifacts/art-1/download")
+            self.assertEqual((resp.status_code, resp.headers["X-Cache"], len(resp.data)), (200, "MISS", 40))
+            resp.close()
+
+            resp = client.get("/update/artifacts/art-1/download", headers={"Range": "bytes=30-"})
+            self.assertEqual((resp.status_code, resp.headers["X-Cache"]), (206, "HIT"))
+            self.assertEqual(resp.headers["Content-Range"], "bytes 30-39/40")
+            self.assertEqual(resp.data, b"a" * 10)
+            resp.close()
+
+            # Too large to cache: redirected to S3 without downloading it first
+            resp = client.get("/update/artifacts/art-2/download")
+            self.assertEqual((resp.status_code, resp.headers["Location"]), (302, "http://s3/huge"))
+        self.assertEqual(self.s3.downloads, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from models import db, Artifact
+from services.artifact_gc import ArtifactReconciler, merge_join
+
+NOW = datetime(2026, 1, 10, tzinfo=timezone.utc)
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = objects # key -> (size, last_modified)
+        self.s3 = self
+        self.deleted = []
+
+    def get_paginator(self, name):
+        # Two keys per page, in S3's byte order
+        keys = sorted(self.objects)
+        pages = [{"Contents": [{"Key": k, "Size": self.objects[k][0], "LastModified": self.objects[k][1]}
+                               for k in keys[i:i + 2]]} for i in range(0, len(keys), 2)]
+        paginator = MagicMock()
+        paginator.paginate = lambda Bucket, Prefix: pages
+        return paginator
+
+    def delete_files(self, keys):
+        self.deleted.extend(keys)
+        return dict.fromkeys(keys)
+
+class TestArtifactGC(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        old, new = NOW - timedelta(days=3), NOW - timedelta(hours=1)
+        self.s3 = FakeS3({
+            "artifacts/cam/1.0/fw.bin": (100, old),
+            "artifacts/cam/1.1/fw.bin": (0, old),       # referenced but empty
+            "artifacts/cam/1.2/abandoned.bin": (50, old), # orphan
+            "artifacts/cam/1.3/uploading.bin": (70, new), # orphan, still in grace
+        })
+        patcher = patch('services.artifact_gc.s3_service', self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for version, key in (("1.0", "artifacts/cam/1.0/fw.bin"), ("1.1", "artifacts/cam/1.1/fw.bin"),
+                             ("0.9", "artifacts/cam/0.9/gone.bin")):
+            db.session.add(Artifact(id=f"art-{version}", device_type="cam", artifact_type="firmware",
+                                    version=version, s3_key=key, created_by=1))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_merge_join(self):
+        joined = list(merge_join([("a", 1), ("c", 3)], [("b", "id-b"), ("c", "id-c1"), ("c", "id-c2")]))
+        self.assertEqual(joined, [("a", (1,), []), ("b", None, ["id-b"]), ("c", (3,), ["id-c1", "id-c2"])])
+
+    def test_report(self):
+        report = ArtifactReconciler(grace_hours=24).run(now=NOW)
+        self.assertEqual((report["objects"], report["referenced"], report["orphans"], report["recent_orphans"]), (4, 2, 1, 1))
+        self.assertEqual(report["samples"]["missing"], [{"key": "artifacts/cam/0.9/gone.bin", "artifact_ids": ["art-0.9"]}])
+        self.assertEqual(report["samples"]["empty"][0]["artifact_ids"], ["art-1.1"])
+        self.assertEqual(self.s3.deleted, [])
+
+    def test_delete_only_old_orphans(self):
+        report = ArtifactReconciler(grace_hours=24).run(delete=True, now=NOW)
+        self.assertEqual(report["deleted"], 1)
+        self.assertEqual(self.s3.deleted, ["artifacts/cam/1.2/abandoned.bin"])
+        self.assertEqual(Artifact.query.count(), 3) # rows are never removed
+
+if __name__ == '__main__':
+    unittest.main()
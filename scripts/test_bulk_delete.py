@@ -0,0 +1,100 @@
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, Artifact, AllowedUploader
+from routes.api import api_bp
+from routes.management import management_bp
+from services.s3_service import S3Service
+from services.permissions import permissions
+from testing import mock_auth
+
+class FakeClient:
+    """boto3 client: DeleteObjects with a key that always fails, plus listing."""
+
+    def __init__(self, keys, failing=()):
+        self.keys = set(keys)
+        self.failing = set(failing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [o["Key"] for o in Delete["Objects"]]
+        with self._lock:
+            self.calls.append(len(keys))
+            self.keys -= set(keys) - self.failing
+        return {"Errors": [{"Key": k, "Code": "AccessDenied", "Message": "Access Denied"}
+                           for k in keys if k in self.failing]}
+
+    def get_paginator(self, name):
+        paginator = MagicMock()
+        paginator.paginate = lambda Bucket, Prefix: [{"Contents": [{"Key": k} for k in sorted(self.keys) if k.startswith(Prefix)]}]
+        return paginator
+
+class TestBulkDelete(unittest.TestCase):
+    def setUp(self):
+        keys = [f"7/file-{i}" for i in range(2500)] + ["8/other", "artifacts/cam/1.0/fw.bin", "artifacts/cam/2.0/fw.bin"]
+        self.client_s3 = FakeClient(keys, failing={"7/file-42", "artifacts/cam/2.0/fw.bin"})
+        self.s3 = S3Service()
+        self.s3._s3, self.s3._bucket_checked = self.client_s3, True
+        for target in ('routes.api.s3_service', 'routes.management.s3_service'):
+            patcher = patch(target, self.s3)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        mock_auth(self)
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app.register_blueprint(api_bp)
+        self.app.register_blueprint(management_bp)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+        self.headers = {"Authorization": "Bearer token"}
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_batches_of_1000(self):
+        results = self.s3.delete_files([f"7/file-{i}" for i in range(2500)])
+        self.assertEqual(sorted(self.client_s3.calls), [500, 1000, 1000])
+        self.assertEqual([k for k, error in results.items() if error], ["7/file-42"])
+
+    def test_folder_delete_reports_per_key(self):
+        resp = self.client.post("/delete/bulk", headers=self.headers, json={"prefix": "7/", "keys": ["8/other"]})
+        body = resp.json
+        self.assertEqual((body["deleted"], body["failed"]), (2499, 2))
+        self.assertEqual(body["results"]["8/other"], {"deleted": False, "error": "Forbidden"})
+        self.assertEqual(body["results"]["7/file-42"]["error"], "Access Denied")
+        self.assertIn("8/other", self.client_s3.keys)
+
+        self.assertEqual(self.client.post("/delete/bulk", headers=self.headers, json={"prefix": "8/"}).status_code, 403)
+
+    def test_artifact_rows_follow_their_objects(self):
+        db.session.add(AllowedUploader(user_id=7, email="ops@example.com"))
+        for version in ("1.0", "2.0"):
+            db.session.add(Artifact(id=f"art-{version}", device_type="cam", artifact_type="firmware", version=version,
+                                    s3_key=f"artifacts/cam/{version}/fw.bin", created_by=7))
+        db.session.commit()
+        permissions.invalidate(publish=False)
+        self.addCleanup(permissions.invalidate, publish=False) # the uploader set is cached process-wide
+
+        resp = self.client.post("/artifacts/bulk-delete", headers=self.headers, json={"ids": ["art-1.0", "art-2.0", "nope"]})
+        body = resp.json
+        self.assertEqual((body["deleted"], body["failed"]), (1, 2))
+        self.assertEqual(body["results"]["art-1.0"], {"deleted": True})
+        self.assertEqual(body["results"]["nope"]["error"], "Not found")
+        self.assertEqual([a.id for a in Artifact.query.all()], ["art-2.0"]) # S3 delete failed: row kept
+
+if __name__ == '__main__':
+    unittest.main()
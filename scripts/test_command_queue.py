@@ -0,0 +1,150 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from flask import Flask
+from models import db, Device
+from services.command_queue import CommandQueue
+from services.command_output import CommandOutputStore, RESULT_SEQ
+from routes.device import device_bp
+from testing import auth_service
+
+class TestCommandQueue(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(Device(device_id="dev-1"))
+        db.session.commit()
+
+        self.queue = CommandQueue(lease_seconds=60, backoff_seconds=10, backoff_max_seconds=25)
+        self.now = datetime(2024, 1, 1, 12, 0, 0)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_claim_leases_once(self):
+        cmd = self.queue.enqueue("dev-1", "uptime")
+        db.session.commit()
+
+        claimed = self.queue.claim("dev-1", now=self.now)
+        db.session.commit()
+        self.assertEqual([c.id for c in claimed], [cmd.id])
+        self.assertEqual(cmd.status, "sent")
+        self.assertEqual(cmd.attempts, 1)
+        self.assertEqual(cmd.lease_expires_at, self.now + timedelta(seconds=60))
+
+        # Still leased: a second heartbeat gets nothing
+        self.assertEqual(self.queue.claim("dev-1", now=self.now + timedelta(seconds=30)), [])
+
+    def test_expired_lease_retries_with_backoff_then_times_out(self):
+        cmd = self.queue.enqueue("dev-1", "reboot", max_attempts=2)
+        db.session.commit()
+
+        self.queue.claim("dev-1", now=self.now)
+        db.session.commit()
+
+        # Lease expired: re-queued, but not claimable until the backoff passes
+        t = self.now + timedelta(seconds=61)
+        self.assertEqual(self.queue.claim("dev-1", now=t), [])
+        self.assertEqual(cmd.status, "pending")
+        self.assertEqual(cmd.next_attempt_at, t + timedelta(seconds=10))
+
+        t += timedelta(seconds=10)
+        self.assertEqual(len(self.queue.claim("dev-1", now=t)), 1)
+        self.assertEqual(cmd.attempts, 2)
+
+        # Out of attempts
+        self.assertEqual(self.queue.requeue_expired(now=t + timedelta(seconds=61)), 1)
+        self.assertEqual(cmd.status, "timed_out")
+
+    def test_backoff_is_capped(self):
+        self.assertEqual([self.queue.backoff(n) for n in (1, 2, 3, 4)], [10, 20, 25, 25])
+
+    def test_late_result_is_accepted_once(self):
+        cmd = self.queue.enqueue("dev-1", "ls")
+        cmd.status = "timed_out"
+        db.session.commit()
+
+        self.assertTrue(self.queue.complete(cmd, "executed", "ok"))
+        self.assertEqual(cmd.status, "executed")
+        self.assertFalse(self.queue.complete(cmd, "failed", "again"))
+        self.assertEqual(cmd.result, "ok")
+
+    def test_only_terminal_result_statuses_are_accepted(self):
+        cmd = self.queue.enqueue("dev-1", "ls")
+        db.session.commit()
+        for status in ("pending", "sent", "timed_out", "bogus"):
+            with self.assertRaises(ValueError):
+                self.queue.complete(cmd, status, "")
+        self.assertEqual(cmd.status, "pending")
+
+        self.app.register_blueprint(device_bp)
+        with patch('middleware.auth.requests.get', side_effect=auth_service()):
+            response = self.app.test_client().post(f"/device/command/{cmd.id}/result",
+                                              json={"status": "pending", "result": ""},
+                                              headers={"Authorization": "Bearer device-token"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(cmd.status, "pending")
+
+    def test_output_after_the_result_is_refused(self):
+        cmd = self.queue.enqueue("dev-1", "du -a /")
+        self.queue.claim("dev-1", now=datetime.utcnow())
+        db.session.commit()
+
+        self.app.register_blueprint(device_bp)
+        client = self.app.test_client()
+        headers = {"Authorization": "Bearer device-token"}
+        post = lambda path, body: client.post(f"/device/command/{cmd.id}/{path}", json=body, headers=headers)
+        with patch('middleware.auth.requests.get', side_effect=auth_service()), \
+                patch('routes.device.Config.COMMAND_RESULT_INLINE_MAX_CHARS', 2), \
+                patch('routes.device.emit_output'), patch('routes.device.emit_status'):
+            self.assertEqual(post("output", {"seq": RESULT_SEQ, "data": "x"}).status_code, 400)
+            self.assertEqual(post("output", {"seq": 0, "data": "a\n"}).status_code, 200)
+            # Too long for the row: the full text goes to the result slot, not the next seq
+            self.assertEqual(post("result", {"status": "executed", "result": "a\nb\n"}).status_code, 200)
+            self.assertEqual(post("output", {"seq": 1, "data": "b\n"}).status_code, 409)
+
+        chunks = CommandOutputStore().read(cmd.id)
+        self.assertEqual([(c.seq, c.stream) for c in chunks], [(0, "stdout"), (RESULT_SEQ, "result")])
+
+    def test_output_chunks_are_idempotent_and_spill_to_s3(self):
+        objects = {}
+        class FakeS3:
+            def put_bytes(self, key, data, content_type=None):
+                objects[key] = data
+            def get_bytes(self, key):
+                return objects[key]
+        patcher = patch('services.command_output.s3_service', FakeS3())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        cmd = self.queue.enqueue("dev-1", "apt-get install -y foo")
+        db.session.commit()
+        store = CommandOutputStore("gzip")
+
+        self.assertIsNotNone(store.append(cmd, 0, "stdout", b"Reading package lists\n"))
+        self.assertIsNone(store.append(cmd, 0, "stdout", b"Reading package lists\n")) # retried
+        big = os.urandom(64 * 1024) # incompressible, so it goes to S3
+        self.assertIsNotNone(store.append(cmd, 1, "stderr", big))
+
+        chunks = store.read(cmd.id)
+        self.assertEqual([(c.seq, c.stream) for c in chunks], [(0, "stdout"), (1, "stderr")])
+        self.assertIsNone(chunks[0].s3_key)
+        self.assertEqual(list(objects), [chunks[1].s3_key])
+        self.assertEqual(store.load(chunks[1]), big)
+        self.assertEqual([c.seq for c in store.read(cmd.id, after_seq=0)], [1])
+        self.assertEqual(store.summary(cmd.id), {"chunks": 2, "bytes": 22 + len(big)})
+
+if __name__ == '__main__':
+    unittest.main()
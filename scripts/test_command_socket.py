@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_socketio import SocketIO
+from models import db, Device, DeviceCommand
+from routes.command_socket import register_command_socket_events, emit_output, NAMESPACE
+from services.permissions import permissions
+from testing import mock_auth
+
+class TestCommandSocket(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.socketio = SocketIO(self.app, async_mode='threading')
+        register_command_socket_events(self.socketio)
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Device(device_id="mine", user_id="7"))
+            db.session.add(Device(device_id="theirs", user_id="8"))
+            db.session.add(DeviceCommand(id="cmd-mine", device_id="mine", command="uptime"))
+            db.session.add(DeviceCommand(id="cmd-theirs", device_id="theirs", command="uptime"))
+            db.session.commit()
+        mock_auth(self, token="good")
+        permissions.invalidate(publish=False)
+        self.addCleanup(permissions.invalidate, publish=False)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_subscribe_requires_auth_and_ownership(self):
+        anonymous = self.socketio.test_client(self.app, namespace=NAMESPACE)
+        self.assertFalse(anonymous.is_connected(NAMESPACE))
+
+        client = self.socketio.test_client(self.app, namespace=NAMESPACE, auth={"token": "good"})
+        client.emit('subscribe', {"command_id": "cmd-mine"}, namespace=NAMESPACE)
+        client.emit('subscribe', {"command_id": "cmd-theirs"}, namespace=NAMESPACE)
+        errors = [m["args"][0]["command_id"] for m in client.get_received(NAMESPACE) if m["name"] == "command_error"]
+        self.assertEqual(errors, ["cmd-theirs"])
+
+        with self.app.app_context():
+            emit_output("cmd-mine", 0, "stdout", "ok")
+            emit_output("cmd-theirs", 0, "stdout", "secret")
+        received = [m["args"][0]["data"] for m in client.get_received(NAMESPACE) if m["name"] == "command_output"]
+        self.assertEqual(received, ["ok"])
+
+if __name__ == '__main__':
+    unittest.main()
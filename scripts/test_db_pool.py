@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, exc as sa_exc
+from services.db_pool import InstrumentedQueuePool, pool_metrics, engine_options
+from config import Config
+
+class TestDbPool(unittest.TestCase):
+    def setUp(self):
+        pool_metrics.reset()
+
+    def test_exhaustion_is_recorded(self):
+        engine = create_engine(
+            "sqlite:///:memory:",
+            poolclass=InstrumentedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05
+        )
+        conn = engine.connect()
+        snapshot = pool_metrics.snapshot(engine.pool)
+        self.assertEqual(snapshot["in_use"], 1)
+        self.assertEqual(snapshot["checkouts"], 1)
+
+        with self.assertRaises(sa_exc.TimeoutError):
+            engine.connect()
+
+        snapshot = pool_metrics.snapshot(engine.pool)
+        self.assertEqual(snapshot["exhausted"], 1)
+        # The timed-out attempt is neither a checkout nor part of the wait stats
+        self.assertEqual(snapshot["checkouts"], 1)
+        self.assertLess(snapshot["max_wait_ms"], 50)
+        conn.close()
+
+    def test_engine_options(self):
+        config = {k: getattr(Config, k) for k in dir(Config) if k.isupper()}
+        options = engine_options(config)
+        self.assertIs(options["poolclass"], InstrumentedQueuePool)
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertIn("statement_timeout", options["connect_args"]["options"])
+
+        config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        self.assertEqual(engine_options(config), {})
+
+if __name__ == '__main__':
+    unittest.main()
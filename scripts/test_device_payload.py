@@ -0,0 +1,59 @@
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from models import db, Device
+from services.device_payload import decode, PayloadError
+from testing import auth_service
+
+class TestConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+class TestDevicePayload(unittest.TestCase):
+    def test_decode(self):
+        body = json.dumps({"device_id": "d1", "stats": {"cpu": {"cores": [1.5, 2.0]}}}).encode()
+        self.assertEqual(decode(gzip.compress(body), "application/json", "gzip")["stats"]["cpu"]["cores"], [1.5, 2.0])
+        self.assertEqual(decode(body, "application/json")["device_id"], "d1")
+
+        with self.assertRaises(PayloadError) as ctx:
+            decode(gzip.compress(b" " * 10000), "application/json", "gzip", max_bytes=1000) # decompression bomb
+        self.assertEqual(ctx.exception.status, 413)
+        with self.assertRaises(PayloadError) as ctx:
+            decode(gzip.compress(body)[:-8], "application/json", "gzip")
+        self.assertEqual(ctx.exception.status, 400)
+        with self.assertRaises(PayloadError) as ctx:
+            decode(body, "application/json", "br")
+        self.assertEqual(ctx.exception.status, 415)
+        with self.assertRaises(PayloadError) as ctx:
+            decode(body, "text/plain")
+        self.assertEqual(ctx.exception.status, 415)
+
+    def test_compressed_heartbeat(self):
+        from app import create_app
+        app = create_app(TestConfig)
+        with app.app_context():
+            db.create_all()
+
+        client = app.test_client()
+        payload = {"device_id": "d1", "version": "1.0.2", "stats": {"cpu": {"total": 12.5}, "memory": {"percent": 40.0}}}
+        headers = {"Authorization": "Bearer token", "Content-Type": "application/json", "Content-Encoding": "gzip"}
+        with patch('middleware.auth.requests.get', side_effect=auth_service()):
+            resp = client.post("/device/heartbeat", data=gzip.compress(json.dumps(payload).encode()), headers=headers)
+            self.assertEqual((resp.status_code, resp.json["status"]), (200, "ok"))
+            resp = client.post("/device/heartbeat", data=b"not gzip", headers=headers)
+            self.assertEqual(resp.status_code, 400)
+            self.assertIn("gzip", resp.json["error"])
+
+        with app.app_context():
+            device = db.session.get(Device, "d1")
+            self.assertEqual((device.stats, device.cpu_percent), (payload["stats"], 12.5))
+
+if __name__ == '__main__':
+    unittest.main()
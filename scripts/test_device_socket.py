@@ -0,0 +1,73 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_socketio import SocketIO
+from models import db, Device, AllowedUploader
+from routes.device_socket import register_device_socket_events, emit_status_change, NAMESPACE
+from services.permissions import permissions
+from testing import mock_auth
+
+class TestDeviceSocket(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.socketio = SocketIO(self.app, async_mode='threading')
+        register_device_socket_events(self.socketio)
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Device(device_id="mine", user_id="7"))
+            db.session.add(Device(device_id="theirs", user_id="8"))
+            db.session.commit()
+        mock_auth(self, token="good")
+        permissions.invalidate(publish=False)
+        self.addCleanup(permissions.invalidate, publish=False) # the uploader set is cached process-wide
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def statuses(self, client):
+        return [(m["name"], m["args"][0]["device_id"]) for m in client.get_received(NAMESPACE)]
+
+    def test_subscriptions_are_limited_to_owned_devices(self):
+        self.assertFalse(self.socketio.test_client(self.app, namespace=NAMESPACE).is_connected(NAMESPACE))
+
+        client = self.socketio.test_client(self.app, namespace=NAMESPACE, auth={"token": "good"})
+        for device_id in ("mine", "theirs", None):
+            client.emit('subscribe', {"device_id": device_id} if device_id else {}, namespace=NAMESPACE)
+        self.assertEqual(self.statuses(client), [("subscribe_error", "theirs"), ("subscribe_error", None)])
+
+        with self.app.app_context():
+            emit_status_change("mine", "online", "offline")
+            emit_status_change("theirs", "online", "offline")
+        self.assertEqual(self.statuses(client), [("device_status", "mine")])
+
+    def test_fleet_room_is_for_super_admins(self):
+        with patch.object(permissions, 'super_admin_id', "7"):
+            client = self.socketio.test_client(self.app, namespace=NAMESPACE, auth={"token": "good"})
+            client.emit('subscribe', {}, namespace=NAMESPACE)
+        with self.app.app_context():
+            emit_status_change("theirs", "online", "offline")
+        self.assertEqual(self.statuses(client), [("device_status", "theirs")])
+
+    def test_fleet_room_is_open_to_uploaders(self):
+        # Same check as GET /devices and /devices/summary (require_uploader)
+        with self.app.app_context():
+            db.session.add(AllowedUploader(user_id=7, email="ops@example.com"))
+            db.session.commit()
+        permissions.invalidate(publish=False)
+        client = self.socketio.test_client(self.app, namespace=NAMESPACE, auth={"token": "good"})
+        client.emit('subscribe', {}, namespace=NAMESPACE)
+        with self.app.app_context():
+            emit_status_change("theirs", "online", "offline")
+        self.assertEqual(self.statuses(client), [("device_status", "theirs")])
+
+if __name__ == '__main__':
+    unittest.main()
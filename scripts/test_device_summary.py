@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from flask import Flask
+from models import db, Device
+from services.device_summary import DeviceSummary, usage_from_stats
+
+class TestDeviceSummary(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        now = datetime.utcnow()
+        for i in range(5):
+            db.session.add(Device(
+                device_id=f"dev-{i}", device_type="cam" if i < 3 else "gateway", current_version="1.0",
+                status="online", last_seen=now, cpu_percent=float(i * 10), memory_percent=50.0
+            ))
+        # Stale device: counted as offline and left out of the usage percentiles
+        db.session.add(Device(device_id="dev-old", device_type="cam", status="online",
+                              last_seen=now - timedelta(hours=2), cpu_percent=100.0))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_usage_from_stats(self):
+        self.assertEqual(usage_from_stats({"cpu": 67.7, "memory": {"percent": 26.6}}), (67.7, 26.6, None))
+        self.assertEqual(
+            usage_from_stats({"cpu": {"total": 12.0}, "disks": [{"percent": 40}, {"used": 90, "total": 100}]}),
+            (12.0, None, 90.0))
+        self.assertEqual(usage_from_stats(None), (None, None, None))
+
+    def test_summary(self):
+        summary = DeviceSummary(ttl_seconds=60).compute()
+        self.assertEqual((summary["total"], summary["online"], summary["offline"]), (6, 5, 1))
+        self.assertEqual(summary["seen_within"], {"5m": 5, "1h": 5, "24h": 6})
+        self.assertEqual(summary["by_device_type"], {"cam": 4, "gateway": 2})
+        self.assertEqual(summary["by_version"], {"1.0": 5, "unknown": 1})
+        self.assertEqual(summary["usage"]["cpu"], {"p50": 20.0, "p90": 36.0, "p99": 39.6})
+        self.assertEqual(summary["usage"]["disk"], {"p50": None, "p90": None, "p99": None})
+
+    def test_cached_until_ttl(self):
+        cache = DeviceSummary(ttl_seconds=60)
+        first = cache.get()
+        db.session.add(Device(device_id="dev-new", last_seen=datetime.utcnow()))
+        db.session.commit()
+        self.assertIs(cache.get(), first)
+        cache.invalidate()
+        self.assertEqual(cache.get()["total"], 7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from flask import Flask
+from models import db, Device, DeviceCommand
+from services.device_sweeper import OfflineSweeper
+
+class TestOfflineSweeper(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.now = datetime(2024, 1, 1, 12, 0, 0)
+        db.session.add_all([
+            Device(device_id="fresh", status="online", last_seen=self.now - timedelta(seconds=10)),
+            Device(device_id="stale", status="online", last_seen=self.now - timedelta(minutes=5)),
+            Device(device_id="stale-error", status="error", last_seen=self.now - timedelta(minutes=6)),
+            Device(device_id="gone", status="offline", last_seen=self.now - timedelta(days=3)),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_flips_only_overdue_live_devices(self):
+        sweeper = OfflineSweeper(offline_after=90, interval=1, batch_size=1)
+        flipped = sweeper.sweep(now=self.now)
+        self.assertEqual([(d, prev) for d, prev, _ in flipped], [("stale-error", "error"), ("stale", "online")])
+        statuses = dict(db.session.query(Device.device_id, Device.status))
+        self.assertEqual(statuses, {"fresh": "online", "stale": "offline", "stale-error": "offline", "gone": "offline"})
+
+        # Nothing left to expire
+        self.assertEqual(sweeper.sweep(now=self.now), [])
+
+    def test_requeues_expired_command_leases(self):
+        db.session.add(DeviceCommand(device_id="stale", command="ls", status="sent", attempts=1, max_attempts=3,
+                                     lease_expires_at=self.now - timedelta(seconds=1)))
+        db.session.commit()
+        OfflineSweeper(offline_after=90).sweep(now=self.now)
+        self.assertEqual(DeviceCommand.query.one().status, "pending")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import create_engine, text
+from migrations import upgrade
+from models import db, Device
+from services.device_sync import changes_since, parse_since, CursorExpired
+from services.device_sweeper import OfflineSweeper
+from services.pagination import encode_cursor
+
+class TestDeviceSync(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all() # also installs the revision/tombstone triggers
+
+        for i in range(3):
+            db.session.add(Device(device_id=f"dev-{i}", user_id="7" if i < 2 else None))
+        db.session.commit()
+        self.later = datetime.utcnow() + timedelta(minutes=1) # everything so far has settled
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_only_changes_are_returned(self):
+        devices, removed, cursor, more = changes_since(0, now=self.later)
+        self.assertEqual([d.device_id for d in devices], ["dev-0", "dev-1", "dev-2"])
+        self.assertEqual(removed, [])
+        self.assertFalse(more)
+
+        db.session.get(Device, "dev-1").status = "online"
+        db.session.commit()
+        devices, removed, cursor, _ = changes_since(cursor, now=self.later)
+        self.assertEqual([d.device_id for d in devices], ["dev-1"])
+
+        self.assertEqual(changes_since(cursor, now=self.later)[:2], ([], []))
+
+    def test_heartbeat_only_update_is_not_a_change(self):
+        _, _, cursor, _ = changes_since(0, now=self.later)
+
+        device = db.session.get(Device, "dev-0")
+        device.last_seen = datetime.utcnow()
+        device.stats = {"cpu": 12.5}
+        device.cpu_percent = 12.5
+        device.status = device.status # written, but unchanged
+        db.session.commit()
+        self.assertEqual(changes_since(cursor, now=self.later)[:2], ([], []))
+
+        device.friendly_name = "Lobby"
+        db.session.commit()
+        self.assertEqual([d.device_id for d in changes_since(cursor, now=self.later)[0]], ["dev-0"])
+
+    def test_migrated_triggers_skip_heartbeat_only_updates(self):
+        # 0008's original triggers, replaced by 0012's, without going through models.py
+        engine = create_engine("sqlite://")
+        upgrade(engine)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO devices (device_id) VALUES ('dev-9')"))
+            revision = lambda: conn.execute(text("SELECT revision FROM devices")).scalar()
+            created = revision()
+            conn.execute(text("UPDATE devices SET last_seen = '2024-01-01 00:00:00'"))
+            self.assertEqual(revision(), created)
+            conn.execute(text("UPDATE devices SET status = 'online'"))
+            self.assertGreater(revision(), created)
+
+    def test_heartbeating_device_stays_online_past_the_window(self):
+        # devices.html renders the badge from the synced `status`, not from `last_seen`
+        start = datetime.utcnow()
+        for device in Device.query.all():
+            device.status = "online" if device.device_id == "dev-0" else "offline"
+            device.last_seen = start
+        db.session.commit()
+        devices, _, cursor, _ = changes_since(0, now=self.later)
+        self.assertEqual({d.device_id: d.status for d in devices}["dev-0"], "online")
+
+        sweeper = OfflineSweeper(offline_after=30)
+        for seconds in (20, 40, 60, 80):
+            now = start + timedelta(seconds=seconds)
+            device = db.session.get(Device, "dev-0")
+            device.status, device.last_seen = "online", now
+            db.session.commit()
+            self.assertEqual(sweeper.sweep(now=now), [])
+            self.assertEqual(changes_since(cursor, now=self.later)[:2], ([], [])) # page keeps "online"
+
+        # Heartbeats stop: the sweeper's flip is what reaches the page
+        self.assertEqual([row[0] for row in sweeper.sweep(now=start + timedelta(seconds=120))], ["dev-0"])
+        devices, _, _, _ = changes_since(cursor, now=start + timedelta(minutes=5))
+        self.assertEqual([(d.device_id, d.status) for d in devices], [("dev-0", "offline")])
+
+    def test_delete_and_unbind_leave_tombstones(self):
+        _, _, fleet_cursor, _ = changes_since(0, now=self.later)
+        _, _, user_cursor, _ = changes_since(0, user_id="7", now=self.later)
+
+        db.session.get(Device, "dev-0").user_id = None # unbind
+        db.session.delete(db.session.get(Device, "dev-2"))
+        db.session.commit()
+
+        devices, removed, _, _ = changes_since(user_cursor, user_id="7", now=self.later)
+        self.assertEqual((devices, [t.device_id for t in removed]), ([], ["dev-0"]))
+
+        # The fleet list still has dev-0 (changed) and only loses the deleted device
+        devices, removed, _, _ = changes_since(fleet_cursor, now=self.later)
+        self.assertEqual([d.device_id for d in devices], ["dev-0"])
+        self.assertEqual([t.device_id for t in removed], ["dev-2"])
+
+    def test_recent_writes_are_resent_until_settled(self):
+        devices, _, cursor, _ = changes_since(0, now=datetime.utcnow())
+        self.assertEqual(len(devices), 3)
+        self.assertEqual(cursor, 0) # nothing has settled yet
+        self.assertGreater(changes_since(0, now=self.later)[2], 0)
+
+    def test_paging(self):
+        devices, _, cursor, more = changes_since(0, limit=2, now=self.later)
+        self.assertEqual((len(devices), more), (2, True))
+        devices, _, _, more = changes_since(cursor, limit=2, now=self.later)
+        self.assertEqual(([d.device_id for d in devices], more), (["dev-2"], False))
+
+    def test_old_cursor_expires(self):
+        self.assertEqual(parse_since("0"), 0)
+        self.assertEqual(parse_since(encode_cursor([5, datetime.utcnow()])), 5)
+        with self.assertRaises(CursorExpired):
+            parse_since(encode_cursor([5, datetime.utcnow() - timedelta(days=30)]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import Config
+from models import db, StoredFile, UploadReservation
+from routes.api import api_bp
+from services.s3_service import S3Service, UPLOAD_URL_EXPIRES_SECONDS
+from services.file_index import file_index
+from testing import mock_auth
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+# Keys as build_key makes them: <user_id>/<uuid hex>_<filename>
+REPORT, NOTES = "7/" + "a" * 32 + "_report.pdf", "7/" + "b" * 32 + "_notes.txt"
+PHOTO, GONE = "8/" + "c" * 32 + "_photo.jpg", "7/" + "f" * 32 + "_gone.bin"
+
+class FakeClient:
+    """boto3 client: listing (with Delimiter), HEAD and DELETE over an in-memory bucket."""
+
+    def __init__(self, objects):
+        self.objects = objects # key -> size
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": self.objects[Key], "ETag": '"etag"', "ContentType": "text/plain",
+                "LastModified": NOW - timedelta(hours=1)}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def get_paginator(self, name):
+        paginator = MagicMock()
+        paginator.paginate = self._paginate
+        return paginator
+
+    def _paginate(self, Bucket, Prefix="", Delimiter=None):
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        if Delimiter:
+            return [{"CommonPrefixes": [{"Prefix": p} for p in sorted({k.split("/")[0] + "/" for k in keys})]}]
+        return [{"Contents": [{"Key": k, "Size": self.objects[k], "LastModified": NOW - timedelta(hours=1)}
+                              for k in keys]}]
+
+class TestFileIndex(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeClient({REPORT: 300, NOTES: 100, PHOTO: 50,
+                                "artifacts/cam/1.0/fw.bin": 999})
+        self.s3 = S3Service()
+        self.s3._s3, self.s3._bucket_checked = self.fake, True
+        self.s3.generate_presigned_upload = MagicMock(side_effect=lambda user_id, filename, *args, **kwargs: {
+            "uploadUrl": "http://s3/put", "key": self.s3.build_key(user_id, filename)})
+        for target in ('routes.api.s3_service', 'services.file_index.s3_service'):
+            patcher = patch(target, self.s3)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        mock_auth(self)
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app.register_blueprint(api_bp)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+        self.headers = {"Authorization": "Bearer token"}
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_complete_and_delete_keep_totals(self):
+        for key in (REPORT, NOTES):
+            resp = self.client.post("/upload/complete", headers=self.headers, json={"key": key})
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json["name"], "notes.txt")
+        self.client.post("/upload/complete", headers=self.headers, json={"key": NOTES}) # repeated: no double count
+        self.assertEqual(self.client.post("/upload/complete", headers=self.headers, json={"key": PHOTO}).status_code, 403)
+        self.assertEqual(file_index.usage("7")["bytes"], 400)
+
+        self.client.delete("/delete", headers=self.headers, json={"key": REPORT})
+        usage = self.client.get("/files/usage", headers=self.headers).json
+        self.assertEqual((usage["bytes"], usage["objects"]), (100, 1))
+
+    def test_presign_enforces_quota(self):
+        file_index.record("7", REPORT, 300)
+        db.session.commit()
+        with patch.object(Config, 'USER_QUOTA_BYTES', 1000):
+            resp = self.client.post("/presign-upload", headers=self.headers, json={"filename": "a.bin", "size": 800})
+            self.assertEqual(resp.status_code, 413)
+            resp = self.client.post("/presign-upload", headers=self.headers, json={"filename": "a.bin"})
+            self.assertEqual(resp.status_code, 400)
+            resp = self.client.post("/presign-upload", headers=self.headers, json={"filename": "a.bin", "size": 700})
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.s3.generate_presigned_upload.call_args.kwargs["content_length"], 700)
+
+    def test_presigns_reserve_quota_until_indexed_or_expired(self):
+        with patch.object(Config, 'USER_QUOTA_BYTES', 1000):
+            first = self.client.post("/presign-upload", headers=self.headers, json={"filename": "a.bin", "size": 600})
+            self.assertEqual(first.status_code, 200)
+            # Together the two would exceed the quota, though each fits on its own
+            resp = self.client.post("/presign-upload", headers=self.headers, json={"filename": "b.bin", "size": 600})
+            self.assertEqual(resp.status_code, 413)
+            self.assertEqual(file_index.usage("7")["reserved_bytes"], 600)
+
+            # Completing the upload turns the reservation into usage
+            self.fake.objects[first.json["key"]] = 600
+            self.client.post("/upload/complete", headers=self.headers, json={"key": first.json["key"]})
+            self.assertEqual((file_index.usage("7")["bytes"], file_index.usage("7")["reserved_bytes"]), (600, 0))
+
+            # An abandoned presign stops counting once its URL has expired, and reconciliation drops it
+            resp = self.client.post("/presign-upload", headers=self.headers, json={"filename": "c.bin", "size": 400})
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(file_index.remaining("7"), 0)
+            later = datetime.utcnow() + timedelta(seconds=UPLOAD_URL_EXPIRES_SECONDS + 1)
+            self.assertEqual(file_index.reserved("7", now=later), 0)
+            file_index.reconcile(now=later.replace(tzinfo=timezone.utc))
+            self.assertEqual(UploadReservation.query.count(), 0)
+
+    def test_reconcile_then_list(self):
+        # A stale row whose object is gone, and a size that changed behind our back
+        file_index.record("7", GONE, 5000, last_modified=NOW - timedelta(days=1))
+        file_index.record("7", NOTES, 1)
+        db.session.commit()
+
+        counts = file_index.reconcile(now=NOW)
+        self.assertEqual((counts["added"], counts["updated"], counts["removed"]), (2, 1, 1))
+        self.assertEqual(file_index.usage("7")["bytes"], 400)
+        self.assertEqual(file_index.usage("8")["objects"], 1)
+        self.assertIsNone(db.session.get(StoredFile, "artifacts/cam/1.0/fw.bin"))
+
+        resp = self.client.get("/files?sort=-size&limit=1", headers=self.headers)
+        self.assertEqual(resp.json["count"], 2)
+        self.assertEqual([f["name"] for f in resp.json["files"]], ["report.pdf"])
+        resp = self.client.get(f"/files?sort=-size&limit=1&cursor={resp.headers['X-Next-Cursor']}", headers=self.headers)
+        self.assertEqual([f["name"] for f in resp.json["files"]], ["notes.txt"])
+        resp = self.client.get("/files?q=NOTE", headers=self.headers)
+        self.assertEqual([f["key"] for f in resp.json["files"]], [NOTES])
+
+if __name__ == '__main__':
+    unittest.main()
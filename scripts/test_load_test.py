@@ -0,0 +1,41 @@
+import unittest
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import aiohttp
+    from load_test import Metrics
+except ImportError:
+    aiohttp = None
+
+@unittest.skipIf(aiohttp is None, "aiohttp not installed")
+class TestLoadTestMetrics(unittest.TestCase):
+    def test_report(self):
+        metrics = Metrics()
+        metrics.record("POST /device/heartbeat", 1.0) # during the ramp: ignored
+        metrics.recording = True
+        for ms in range(1, 101):
+            metrics.record("POST /device/heartbeat", ms / 1000)
+        metrics.record("POST /device/heartbeat", 0.5, 503)
+        metrics.record("POST /device/heartbeat", 5.0, "ClientConnectorError")
+        for _ in range(10):
+            metrics.expect("socket /camera frame")
+        for _ in range(8):
+            metrics.record("socket /camera frame", 0.002)
+
+        endpoints, _ = metrics.report(elapsed=10)
+        heartbeat = endpoints["POST /device/heartbeat"]
+        self.assertEqual((heartbeat["requests"], heartbeat["errors"], heartbeat["rps"]), (102, 2, 10.0))
+        self.assertEqual((heartbeat["p50_ms"], heartbeat["p99_ms"], heartbeat["max_ms"]), (51.0, 100.0, 100.0))
+        self.assertEqual(heartbeat["statuses"], {"200": 100, "503": 1, "ClientConnectorError": 1})
+
+        frames = endpoints["socket /camera frame"]
+        self.assertEqual((frames["requests"], frames["errors"], frames["error_rate"]), (10, 2, 0.2))
+        self.assertEqual(frames["statuses"]["lost"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
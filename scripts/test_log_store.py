@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from flask import Flask
+from models import db, Device, DeviceLogSegment, DeviceLogSearchDoc, DeviceLogStream
+from services.log_store import LogStore, LogOffsetError
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_bytes(self, key, data, content_type=None):
+        self.objects[key] = data
+
+    def get_bytes(self, key):
+        return self.objects[key]
+
+    def delete_files(self, keys):
+        keys = [key for key in keys if key]
+        for key in keys:
+            del self.objects[key]
+        return dict.fromkeys(keys)
+
+class TestLogStore(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(Device(device_id="dev-1"))
+        db.session.commit()
+
+        self.s3 = FakeS3()
+        patcher = patch('services.log_store.s3_service', self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = LogStore("gzip")
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def read(self, offset=0, length=None):
+        return b"".join(self.store.read_range("dev-1", "run_sh", offset, length))
+
+    def test_append_is_idempotent_and_rejects_gaps(self):
+        self.assertEqual(self.store.append("dev-1", "run_sh", 0, b"hello "), 6)
+        # Retry overlapping what is stored only appends the new tail
+        self.assertEqual(self.store.append("dev-1", "run_sh", 3, b"lo world"), 11)
+        self.assertEqual(self.store.append("dev-1", "run_sh", 0, b"hello"), 11)
+
+        with self.assertRaises(LogOffsetError) as ctx:
+            self.store.append("dev-1", "run_sh", 20, b"gap")
+        self.assertEqual(ctx.exception.expected_offset, 11)
+
+        self.assertEqual(self.read(), b"hello world")
+        self.assertEqual(self.read(4, 5), b"o wor")
+        self.assertEqual(self.read(11), b"")
+
+    @patch('services.log_store.Config.LOG_INLINE_MAX_BYTES', 16)
+    def test_large_segments_spill_to_s3(self):
+        content = os.urandom(256)
+        self.store.append("dev-1", "run_sh", 0, content)
+        segment = DeviceLogSegment.query.one()
+        self.assertIsNone(segment.data)
+        self.assertIn(segment.s3_key, self.s3.objects)
+        self.assertEqual(self.read(10, 20), content[10:30])
+
+    def test_compaction_and_retention(self):
+        for i in range(10):
+            self.store.append("dev-1", "run_sh", i * 4, b"%04d" % i)
+        self.assertEqual(self.store.compact("dev-1", "run_sh", target_bytes=16), 7)
+        self.assertEqual(DeviceLogSegment.query.count(), 3)
+        self.assertEqual(self.read(), b"".join(b"%04d" % i for i in range(10)))
+
+        DeviceLogSegment.query.update({"created_at": datetime.utcnow() - timedelta(days=60)})
+        db.session.commit()
+        self.assertEqual(self.store.apply_retention(days=30), 3)
+        self.assertEqual(self.read(), b"")
+
+        # With every segment gone the stream still ends where it did, so the device carries on
+        self.assertEqual(self.store.end_offset("dev-1", "run_sh"), 40)
+        self.assertEqual(self.store.start_offset("dev-1", "run_sh"), 40)
+        with self.assertRaises(LogOffsetError):
+            self.store.append("dev-1", "run_sh", 44, b"gap")
+        self.assertEqual(self.store.append("dev-1", "run_sh", 40, b"0010"), 44)
+        self.assertEqual(self.read(40), b"0010")
+
+    @patch('services.log_store.Config.LOG_INLINE_MAX_BYTES', 16)
+    def test_delete_for_device(self):
+        self.store.append("dev-1", "run_sh", 0, b"short\n")
+        self.store.append("dev-1", "run_sh", 6, os.urandom(256)) # to S3
+        db.session.add(Device(device_id="dev-2"))
+        db.session.commit()
+        self.store.append("dev-2", "run_sh", 0, b"kept\n")
+        self.store._record_end("dev-1", "run_sh", 262)
+        db.session.commit()
+
+        keys = self.store.delete_for_device("dev-1")
+        db.session.delete(db.session.get(Device, "dev-1"))
+        db.session.commit()
+        self.assertEqual(len(keys), 2)
+        self.assertLessEqual(set(keys), set(self.s3.objects)) # left until the rows are committed gone
+        self.store.delete_objects(keys)
+
+        self.assertEqual([key.split("/")[1] for key in self.s3.objects], ["dev-2"])
+        for model in (DeviceLogSegment, DeviceLogSearchDoc, DeviceLogStream):
+            self.assertEqual(model.query.filter_by(device_id="dev-1").count(), 0)
+        self.assertEqual(b"".join(self.store.read_range("dev-2", "run_sh")), b"kept\n")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import json
+import time
+import threading
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, Device, AllowedUploader
+from services.permissions import permissions
+from routes.management import management_bp
+from services.log_store import log_store
+from services.log_events import LogNotifier, log_notifier
+from routes.device import device_bp
+from testing import mock_auth
+
+class TestLogStream(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app.register_blueprint(management_bp)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(Device(device_id="dev-1"))
+        db.session.add(AllowedUploader(user_id=5, email="ops@example.com"))
+        db.session.commit()
+        permissions.invalidate(publish=False)
+        self.addCleanup(permissions.invalidate, publish=False) # the uploader set is cached process-wide
+        log_store.append("dev-1", "run_sh", 0, "line one\nline two\n".encode())
+
+        mock_auth(self, user_id=5)
+        self.headers = {"Authorization": "Bearer fake-token"}
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_range_request(self):
+        resp = self.client.get('/devices/dev-1/logs?type=run_sh',
+                               headers={**self.headers, "Range": "bytes=5-11"})
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp.data, b"one\nlin")
+        self.assertEqual(resp.headers["Content-Range"], "bytes 5-11/18")
+
+        resp = self.client.get('/devices/dev-1/logs?type=run_sh&offset=9', headers=self.headers)
+        self.assertEqual(resp.data, b"line two\n")
+
+    @patch('routes.management.Config.LOG_STREAM_MAX_SECONDS', 0.3)
+    @patch('routes.management.Config.LOG_STREAM_POLL_SECONDS', 0.05)
+    def test_sse_resumes_from_last_event_id(self):
+        resp = self.client.get('/devices/dev-1/logs/stream?type=run_sh',
+                               headers={**self.headers, "Last-Event-ID": "9"})
+        self.assertEqual(resp.mimetype, "text/event-stream")
+        events = [json.loads(line[6:]) for line in resp.get_data(as_text=True).splitlines()
+                  if line.startswith("data: ")]
+        self.assertEqual(events, [{"text": "line two\n", "offset": 18}])
+
+    @patch('routes.management.Config.LOG_STREAM_MAX_SECONDS', 0.1)
+    @patch('middleware.auth.Config.STREAM_TOKEN_SECRET', "test-secret")
+    def test_sse_accepts_stream_token(self):
+        resp = self.client.post('/devices/dev-1/logs/stream/token', headers=self.headers)
+        self.assertEqual(resp.status_code, 200)
+        url = resp.json["url"]
+
+        # No Authorization header, as from an EventSource
+        resp = self.client.get(f'{url}&type=run_sh&offset=9')
+        self.assertEqual((resp.status_code, resp.mimetype), (200, "text/event-stream"))
+        resp.close()
+
+        # Bound to the stream it was issued for
+        token = url.split("token=")[1]
+        resp = self.client.get(f'/devices/dev-2/logs/stream?type=run_sh&token={token}')
+        self.assertEqual(resp.status_code, 401)
+        resp = self.client.get(f'/devices/dev-1/logs?type=run_sh&token={token}')
+        self.assertEqual(resp.status_code, 401)
+
+        with patch('middleware.auth.Config.STREAM_TOKEN_TTL_SECONDS', -1):
+            self.assertEqual(self.client.get(f'{url}&type=run_sh').status_code, 401)
+
+    def test_search(self):
+        log_store.append("dev-1", "run_sh", 18, "ERROR <disk> full\n".encode())
+        resp = self.client.get('/devices/logs/search?q=disk&limit=1', headers=self.headers)
+        self.assertEqual(resp.status_code, 200)
+        results = resp.json["results"]
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["offset"], 18)
+        self.assertEqual(results[0]["source"], "stream")
+        # Log text is escaped, only the highlight is markup
+        self.assertIn("&lt;<mark>disk</mark>&gt;", results[0]["snippet"])
+        self.assertIsNone(resp.json["next_cursor"])
+
+        # Both segments match: two pages of one
+        resp = self.client.get('/devices/logs/search?q=e&limit=1', headers=self.headers)
+        self.assertEqual(resp.json["results"][0]["offset"], 18)
+        cursor = resp.json["next_cursor"]
+        resp = self.client.get(f'/devices/logs/search?q=e&limit=1&cursor={cursor}', headers=self.headers)
+        self.assertEqual(resp.json["results"][0]["offset"], 0)
+        self.assertIsNone(resp.json["next_cursor"])
+
+    @patch('routes.management.Config.LOG_STREAM_MAX_SECONDS', 0.1)
+    def test_snapshot_uploads_reach_the_stream(self):
+        self.app.register_blueprint(device_bp)
+        woken = []
+        waiter = threading.Thread(target=lambda: woken.append(log_notifier.wait("dev-1", "startup", 0, 5)))
+        waiter.start()
+        while not log_notifier._streams:
+            time.sleep(0.01)
+
+        # Legacy full uploads: each one re-sends the whole log
+        for logs in ("boot\n", "boot\nready\n"):
+            resp = self.client.post('/device/logs', json={"device_id": "dev-1", "type": "startup", "logs": logs},
+                                    headers=self.headers)
+            self.assertEqual(resp.status_code, 200)
+        waiter.join(1)
+        self.assertEqual(woken, [True])
+
+        resp = self.client.get('/devices/dev-1/logs/stream?type=startup&offset=0', headers=self.headers)
+        events = [json.loads(line[6:]) for line in resp.get_data(as_text=True).splitlines()
+                  if line.startswith("data: ")]
+        self.assertEqual("".join(e["text"] for e in events), "boot\nready\n")
+
+        # Searched through the snapshot only, not again through the stream
+        resp = self.client.get('/devices/logs/search?q=ready', headers=self.headers)
+        self.assertEqual([r["source"] for r in resp.json["results"]], ["snapshot"])
+
+    def test_notifier_wakes_waiters(self):
+        notifier = LogNotifier()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(notifier.wait("dev-1", "run_sh", 10, 5)))
+        waiter.start()
+        while not notifier._streams:
+            time.sleep(0.01)
+        notifier.notify("dev-1", "run_sh", 20)
+        waiter.join(1)
+        self.assertEqual(result, [True])
+        self.assertEqual(notifier._streams, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from flask import Flask
+from models import db, Device
+from services.pagination import keyset_page, decode_cursor, PaginationError
+
+class TestKeysetPagination(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        base = datetime(2024, 1, 1)
+        for i in range(7):
+            # Two devices share a timestamp, one has never been seen
+            last_seen = None if i == 6 else base + timedelta(minutes=min(i, 4))
+            db.session.add(Device(device_id=f"dev-{i}", last_seen=last_seen))
+        db.session.commit()
+        # The column default fills in an explicit None on insert
+        Device.query.filter_by(device_id="dev-6").update({"last_seen": None})
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def walk(self, sort_column, descending, limit):
+        ids, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(Device.query, sort_column, Device.device_id, descending, limit, cursor and decode_cursor(cursor))
+            ids.extend(d.device_id for d in rows)
+            if cursor is None:
+                return ids
+
+    def test_pages_by_primary_key(self):
+        self.assertEqual(self.walk(Device.device_id, False, 3), [f"dev-{i}" for i in range(7)])
+        self.assertEqual(self.walk(Device.device_id, True, 2), [f"dev-{i}" for i in reversed(range(7))])
+
+    def test_pages_by_nullable_column_with_ties(self):
+        # dev-4 and dev-5 tie on last_seen; dev-6 (NULL) comes last either way
+        self.assertEqual(self.walk(Device.last_seen, True, 2),
+                         ["dev-5", "dev-4", "dev-3", "dev-2", "dev-1", "dev-0", "dev-6"])
+        self.assertEqual(self.walk(Device.last_seen, False, 3),
+                         ["dev-0", "dev-1", "dev-2", "dev-3", "dev-4", "dev-5", "dev-6"])
+
+    def test_bad_cursor(self):
+        with self.assertRaises(PaginationError):
+            decode_cursor("not-a-cursor")
+
+if __name__ == '__main__':
+    unittest.main()
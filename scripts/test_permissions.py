@@ -0,0 +1,97 @@
+import unittest
+import sys
+import os
+import time
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+from models import db, AllowedUploader
+from services.permissions import PermissionService
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+class TestPermissionService(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(AllowedUploader(user_id=5, email="ops@example.com"))
+        db.session.commit()
+
+        self.queries = 0
+        def count(*args):
+            self.queries += 1
+        event.listen(db.engine, "before_cursor_execute", count)
+        self.addCleanup(event.remove, db.engine, "before_cursor_execute", count)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def make_service(self, redis_client=None):
+        return PermissionService(redis_client, ttl_seconds=60, super_admin_id="1")
+
+    def test_roles_are_answered_from_memory(self):
+        service = self.make_service()
+        self.assertTrue(service.is_super_admin("1"))
+        self.assertFalse(service.is_super_admin("5"))
+        for _ in range(10):
+            self.assertTrue(service.is_uploader("5"))
+            self.assertTrue(service.is_uploader(1))
+            self.assertFalse(service.is_uploader("6"))
+        self.assertEqual(self.queries, 1)
+
+    def test_invalidate_reloads(self):
+        service = self.make_service()
+        self.assertFalse(service.is_uploader("6"))
+        db.session.add(AllowedUploader(user_id=6, email="new@example.com"))
+        db.session.commit()
+        self.assertFalse(service.is_uploader("6")) # still cached
+        service.invalidate()
+        self.assertTrue(service.is_uploader("6"))
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_invalidation_reaches_other_workers(self):
+        server = fakeredis.FakeServer()
+        worker_a = self.make_service(fakeredis.FakeRedis(server=server, decode_responses=True))
+        worker_b = self.make_service(fakeredis.FakeRedis(server=server, decode_responses=True))
+        self.assertFalse(worker_b.is_uploader("6"))
+        time.sleep(0.2) # let worker_b's listener subscribe
+
+        db.session.add(AllowedUploader(user_id=6, email="new@example.com"))
+        db.session.commit()
+        worker_a.invalidate()
+
+        deadline = time.time() + 2
+        while worker_b._uploaders is not None and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(worker_b.is_uploader("6"))
+
+    @unittest.skipIf(fakeredis is None, "fakeredis not installed")
+    def test_device_owner_changes_reach_other_workers(self):
+        server = fakeredis.FakeServer()
+        worker_a = self.make_service(fakeredis.FakeRedis(server=server, decode_responses=True))
+        worker_b = self.make_service(fakeredis.FakeRedis(server=server, decode_responses=True))
+        changed = []
+        worker_b.on_device_owner_changed(changed.append)
+        worker_b.listen()
+        time.sleep(0.2) # let worker_b's listener subscribe
+
+        worker_a.device_owner_changed("dev-1")
+        deadline = time.time() + 2
+        while not changed and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(changed, ["dev-1"])
+
+if __name__ == '__main__':
+    unittest.main()
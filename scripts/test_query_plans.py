@@ -0,0 +1,108 @@
+import abc
+import json
+import unittest
+import sys
+import os
+from datetime import datetime
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, text
+from migrations import upgrade
+from models import Artifact, Device, DeviceCommand, DeviceLog
+from services.device_sweeper import LIVE
+
+# Hot queries and the index each one must use (see migrations/versions/0002)
+HOT_QUERIES = {
+    "heartbeat_pending_commands": (
+        select(DeviceCommand).filter_by(device_id="dev-1", status="pending"),
+        {"ix_device_commands_pending", "ix_device_commands_device_status"}
+    ),
+    "requeue_expired_leases": (
+        select(DeviceCommand).filter(DeviceCommand.status == "sent", DeviceCommand.lease_expires_at < datetime(2024, 1, 1)),
+        {"ix_device_commands_lease"}
+    ),
+    "list_devices_by_last_seen": (
+        select(Device).order_by(Device.last_seen.desc().nulls_last(), Device.device_id.desc()).limit(100),
+        {"ix_devices_last_seen"}
+    ),
+    "list_artifacts_page": (
+        select(Artifact).order_by(Artifact.created_at.desc(), Artifact.id.desc()).limit(100),
+        {"ix_artifacts_created"}
+    ),
+    "offline_sweep_overdue": (
+        select(Device.device_id).where(LIVE, Device.last_seen < datetime(2024, 1, 1))
+        .order_by(Device.last_seen).limit(1000),
+        {"ix_devices_live_last_seen"}
+    ),
+    "upload_logs_lookup": (
+        select(DeviceLog).filter_by(device_id="dev-1", log_type="run_sh").limit(1),
+        {"ix_device_logs_device_type_created"}
+    ),
+    "get_device_logs": (
+        select(DeviceLog).filter_by(device_id="dev-1", log_type="run_sh")
+        .order_by(DeviceLog.created_at.desc()).limit(50),
+        {"ix_device_logs_device_type_created"}
+    ),
+    "check_update_latest": (
+        select(Artifact).filter_by(device_type="cam", artifact_type="firmware", is_active=True)
+        .order_by(Artifact.created_at.desc()).limit(1),
+        {"ix_artifacts_active_lookup"}
+    ),
+}
+
+def _compile(engine, stmt):
+    return str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+def _pg_index_names(plan):
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= _pg_index_names(child)
+    return names
+
+class QueryPlanMixin(abc.ABC):
+    engine = None
+
+    @abc.abstractmethod
+    def index_names(self, conn, sql):
+        """Names of the indexes the plan for `sql` uses."""
+
+    def test_migrations_are_idempotent(self):
+        self.assertEqual(upgrade(self.engine), [])
+
+    def test_hot_queries_use_indexes(self):
+        with self.engine.connect() as conn:
+            for name, (stmt, expected) in HOT_QUERIES.items():
+                used = self.index_names(conn, _compile(self.engine, stmt))
+                self.assertTrue(used & expected, f"{name} did not use {expected}; plan used {used or 'no index'}")
+
+class TestSqliteQueryPlans(QueryPlanMixin, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine("sqlite://")
+        upgrade(cls.engine)
+
+    def index_names(self, conn, sql):
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql)).fetchall()
+        return {word for row in rows for word in str(row[-1]).split() if word.startswith("ix_")}
+
+@unittest.skipUnless(os.getenv("TEST_DATABASE_URL"), "TEST_DATABASE_URL (PostgreSQL) not set")
+class TestPostgresQueryPlans(QueryPlanMixin, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine(os.getenv("TEST_DATABASE_URL"))
+        upgrade(cls.engine)
+
+    def index_names(self, conn, sql):
+        # Tiny test tables would otherwise always get a sequential scan
+        conn.execute(text("SET enable_seqscan = off"))
+        plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return _pg_index_names(plan[0]["Plan"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import time
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_socketio import SocketIO
+from models import db, Device, AllowedUploader
+from routes.terminal_socket import register_socket_events, NAMESPACE
+from services.permissions import permissions
+from services.socket_auth import socket_sessions
+from testing import mock_auth
+
+class TestSocketAuth(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.socketio = SocketIO(self.app, async_mode='threading')
+        register_socket_events(self.socketio)
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Device(device_id="mine", user_id="7"))
+            db.session.add(Device(device_id="theirs", user_id="8"))
+            db.session.commit()
+
+        self.verify = mock_auth(self, token="good")
+        permissions.invalidate(publish=False)
+        self.addCleanup(permissions.invalidate, publish=False) # the uploader set is cached process-wide
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def client(self, token):
+        return self.socketio.test_client(self.app, namespace=NAMESPACE, auth={"token": token} if token else None)
+
+    def test_connect_requires_valid_token(self):
+        self.assertFalse(self.client(None).is_connected(NAMESPACE))
+        self.assertFalse(self.client("bad").is_connected(NAMESPACE))
+        self.assertTrue(self.client("good").is_connected(NAMESPACE))
+
+    def test_events_are_checked_without_reverifying(self):
+        device = self.client("good")
+        browser = self.client("good")
+        device.emit('join', {"device_id": "mine", "type": "device"}, namespace=NAMESPACE)
+        browser.emit('join', {"device_id": "theirs", "type": "browser"}, namespace=NAMESPACE)
+        denied = browser.get_received(NAMESPACE)
+        self.assertIn("Access denied", denied[-1]["args"][0]["data"])
+
+        verifications = self.verify.call_count
+        for i in range(50):
+            browser.emit('input', {"device_id": "mine", "data": "x"}, namespace=NAMESPACE)
+            browser.emit('input', {"device_id": "theirs", "data": "y"}, namespace=NAMESPACE)
+        self.assertEqual(self.verify.call_count, verifications)
+
+        received = [m["args"][0] for m in device.get_received(NAMESPACE) if m["name"] == "input"]
+        self.assertEqual(received, ["x"] * 50)
+
+    def test_device_registered_after_connect(self):
+        browser = self.client("good")
+        with self.app.app_context():
+            db.session.add(Device(device_id="new", user_id="7"))
+            db.session.commit()
+        browser.emit('join', {"device_id": "new", "type": "browser"}, namespace=NAMESPACE)
+        self.assertIn("Interested in new", browser.get_received(NAMESPACE)[-1]["args"][0]["data"])
+
+    def test_unbind_revokes_open_sockets(self):
+        with patch.object(permissions, 'super_admin_id', "7"):
+            device = self.client("good") # keeps access to every device
+        browser = self.client("good")
+        device.emit('join', {"device_id": "mine", "type": "device"}, namespace=NAMESPACE)
+        browser.emit('join', {"device_id": "mine", "type": "browser"}, namespace=NAMESPACE)
+        browser.get_received(NAMESPACE)
+
+        with self.app.app_context():
+            db.session.get(Device, "mine").user_id = None
+            db.session.commit()
+        permissions.device_owner_changed("mine", publish=False) # as DELETE /api/user/devices/<id> does
+
+        browser.emit('input', {"device_id": "mine", "data": "x"}, namespace=NAMESPACE)
+        device.emit('output', {"device_id": "mine", "data": "secret"}, namespace=NAMESPACE)
+        time.sleep(0.1) # output coalescing window
+        self.assertEqual([m for m in device.get_received(NAMESPACE) if m["name"] == "input"], [])
+        self.assertEqual([m for m in browser.get_received(NAMESPACE) if m["name"] == "output"], [])
+
+        # The device itself still streams to its new viewers
+        viewer = self.client("good")
+        with patch.object(permissions, 'super_admin_id', "7"):
+            viewer.emit('join', {"device_id": "mine", "type": "browser"}, namespace=NAMESPACE)
+        device.emit('output', {"device_id": "mine", "data": "hello"}, namespace=NAMESPACE)
+        time.sleep(0.1)
+        self.assertEqual([m["args"][0] for m in viewer.get_received(NAMESPACE) if m["name"] == "output"], ["hello"])
+        self.assertEqual([m for m in browser.get_received(NAMESPACE) if m["name"] == "output"], [])
+
+        browser.emit('join', {"device_id": "mine", "type": "browser"}, namespace=NAMESPACE)
+        self.assertIn("Access denied", browser.get_received(NAMESPACE)[-1]["args"][0]["data"])
+
+    def test_uploaders_reach_every_device(self):
+        # Same reach as the HTTP terminal/command routes (require_uploader), unbound devices included
+        with self.app.app_context():
+            db.session.add(Device(device_id="unbound"))
+            db.session.add(AllowedUploader(user_id=7, email="ops@example.com"))
+            db.session.commit()
+        permissions.invalidate(publish=False)
+
+        browser = self.client("good")
+        for device_id in ("theirs", "unbound"):
+            browser.emit('join', {"device_id": device_id, "type": "browser"}, namespace=NAMESPACE)
+            self.assertIn(f"Interested in {device_id}", browser.get_received(NAMESPACE)[-1]["args"][0]["data"])
+
+    def test_unbound_devices_are_refused_to_other_users(self):
+        with self.app.app_context():
+            db.session.add(Device(device_id="unbound"))
+            db.session.commit()
+        browser = self.client("good")
+        browser.emit('join', {"device_id": "unbound", "type": "browser"}, namespace=NAMESPACE)
+        self.assertIn("Access denied", browser.get_received(NAMESPACE)[-1]["args"][0]["data"])
+
+    def test_refused_joins_are_not_requeried(self):
+        browser = self.client("good")
+        with self.app.app_context(), patch.object(socket_sessions, '_owned_devices',
+                                                  wraps=socket_sessions._owned_devices) as owned:
+            for _ in range(5):
+                browser.emit('join', {"device_id": "theirs", "type": "browser"}, namespace=NAMESPACE)
+            self.assertEqual(owned.call_count, 1)
+
+            # Handed over to this user: the cached refusal is dropped
+            db.session.get(Device, "theirs").user_id = "7"
+            db.session.commit()
+            permissions.device_owner_changed("theirs", publish=False)
+            browser.emit('join', {"device_id": "theirs", "type": "browser"}, namespace=NAMESPACE)
+        self.assertIn("Interested in theirs", browser.get_received(NAMESPACE)[-1]["args"][0]["data"])
+
+if __name__ == '__main__':
+    unittest.main()
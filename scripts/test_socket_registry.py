@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.socket_registry import SocketRegistry, RedisSocketRegistry
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+class TestSocketRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = SocketRegistry()
+
+    def test_bind_and_disconnect(self):
+        self.registry.connect('/terminal', 'sid1')
+        self.registry.bind('/terminal', 'dev1', 'sid1')
+        self.registry.bind('/terminal', 'dev2', 'sid1')
+        self.assertEqual(self.registry.get_sid('/terminal', 'dev1'), 'sid1')
+
+        released = self.registry.disconnect('/terminal', 'sid1')
+        self.assertEqual(sorted(released), ['dev1', 'dev2'])
+        self.assertIsNone(self.registry.get_sid('/terminal', 'dev1'))
+        self.assertEqual(self.registry.connection_count('/terminal'), 0)
+
+    def test_rebind_moves_authority(self):
+        self.registry.bind('/camera', 'dev1', 'old')
+        self.registry.bind('/camera', 'dev1', 'new')
+
+        # The stale SID no longer owns the device
+        self.assertEqual(self.registry.disconnect('/camera', 'old'), [])
+        self.assertEqual(self.registry.get_sid('/camera', 'dev1'), 'new')
+
+    def test_namespaces_are_separate(self):
+        self.registry.connect('/terminal', 'sid1')
+        self.registry.connect('/camera', 'sid1')
+        self.registry.connect('/camera', 'sid2')
+        self.registry.bind('/camera', 'dev1', 'sid2')
+
+        self.assertEqual(self.registry.stats(), {
+            '/camera': {'connections': 2, 'devices': 1},
+            '/terminal': {'connections': 1, 'devices': 0}
+        })
+
+    def test_member_groups(self):
+        self.registry.add_member('/terminal', 'legacy:dev1', 'sid1')
+        self.assertTrue(self.registry.has_members('/terminal', 'legacy:dev1'))
+        self.registry.remove_member('/terminal', 'legacy:dev1', 'sid1')
+        self.assertFalse(self.registry.has_members('/terminal', 'legacy:dev1'))
+
+        self.registry.add_member('/terminal', 'legacy:dev1', 'sid2')
+        self.registry.disconnect('/terminal', 'sid2')
+        self.assertFalse(self.registry.has_members('/terminal', 'legacy:dev1'))
+
+@unittest.skipIf(fakeredis is None, "fakeredis not installed")
+class TestRedisSocketRegistry(TestSocketRegistry):
+    # Same behaviour as the in-process registry, against a Redis stand-in
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.registry = RedisSocketRegistry(fakeredis.FakeRedis(server=self.server, decode_responses=True))
+
+    def test_crashed_worker_is_reaped(self):
+        crashed = RedisSocketRegistry(fakeredis.FakeRedis(server=self.server, decode_responses=True))
+        crashed.heartbeat(now=1000)
+        crashed.connect('/terminal', 'sid1')
+        crashed.bind('/terminal', 'dev1', 'sid1')
+        crashed.add_member('/terminal', 'legacy:dev1', 'sid1')
+        self.registry.heartbeat(now=1050)
+        self.registry.connect('/terminal', 'sid2')
+
+        self.assertEqual(self.registry.reap(60, now=1055), 0) # still within the timeout
+        self.assertEqual(self.registry.reap(60, now=1070), 1)
+        self.assertIsNone(self.registry.get_sid('/terminal', 'dev1'))
+        self.assertFalse(self.registry.has_members('/terminal', 'legacy:dev1'))
+        self.assertEqual(self.registry.connection_count('/terminal'), 1) # this worker's sid2 is kept
+
+if __name__ == '__main__':
+    unittest.main()
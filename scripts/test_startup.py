@@ -0,0 +1,43 @@
+import unittest
+import subprocess
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Measured cold import of app.py is ~0.5s; the budget leaves room for slower CI machines
+IMPORT_BUDGET_SECONDS = 3.0
+
+# Runs in a fresh interpreter: any connection attempted during import fails loudly
+PROBE = """
+import socket, sys, time
+def refuse(self, address):
+    raise AssertionError(f"network I/O during import: {address}")
+socket.socket.connect = refuse
+socket.socket.connect_ex = refuse
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(elapsed, 'boto3' in sys.modules)
+"""
+
+class TestStartup(unittest.TestCase):
+    def test_import_is_fast_and_offline(self):
+        env = dict(os.environ, S3_ENDPOINT_URL="http://10.255.255.1:9", POSTGRES_HOST="10.255.255.1")
+        result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                                capture_output=True, text=True, timeout=30)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        elapsed, boto_loaded = result.stdout.split()[-2:]
+        self.assertLess(float(elapsed), IMPORT_BUDGET_SECONDS)
+        self.assertEqual(boto_loaded, "False")
+
+    def test_factory_does_not_connect(self):
+        sys.path.insert(0, ROOT)
+        from app import create_app
+        from services.s3_service import s3_service
+        app = create_app()
+        self.assertIsNone(s3_service._s3)
+        self.assertEqual(app.test_client().get("/healthz").json, {"status": "ok"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import io
+import hashlib
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from routes.api import api_bp
+from services.streaming_upload import StreamingUpload, MIN_PART_BYTES
+from testing import mock_auth
+
+class FakeS3:
+    """Both the boto3 client calls and the S3Service helpers StreamingUpload uses."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.largest_part = 0
+
+    @property
+    def s3(self):
+        return self
+
+    def put_bytes(self, key, data, content_type=None):
+        self.objects[key] = data
+
+    def create_multipart_upload(self, Bucket, Key, ContentType):
+        upload_id = f"up-{len(self.uploads)}"
+        self.uploads[upload_id] = []
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.largest_part = max(self.largest_part, len(Body))
+        self.uploads[UploadId].append(Body)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[Key] = b"".join(self.uploads.pop(UploadId))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        del self.uploads[UploadId]
+
+class TestStreamingUpload(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        patcher = patch('services.streaming_upload.s3_service', self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_auth(self)
+
+        self.app = Flask(__name__)
+        self.app.register_blueprint(api_bp)
+        self.client = self.app.test_client()
+        self.headers = {"Authorization": "Bearer token"}
+
+    def test_large_file_is_sent_in_parts(self):
+        data = os.urandom(2 * MIN_PART_BYTES + 123)
+        upload = StreamingUpload("7/big.bin", part_size=MIN_PART_BYTES)
+        for i in range(0, len(data), 64 * 1024):
+            upload.write(data[i:i + 64 * 1024])
+        self.assertEqual(upload.complete(), hashlib.sha256(data).hexdigest())
+        self.assertEqual(self.s3.objects["7/big.bin"], data)
+        # Never more than one part held or sent at a time
+        self.assertEqual(self.s3.largest_part, MIN_PART_BYTES)
+
+    def test_checksum_mismatch_aborts(self):
+        upload = StreamingUpload("7/big.bin", part_size=MIN_PART_BYTES)
+        upload.write(b"x" * (MIN_PART_BYTES + 1))
+        with self.assertRaises(ValueError):
+            upload.complete("0" * 64)
+        self.assertEqual((self.s3.objects, self.s3.uploads), ({}, {}))
+
+    def test_multipart_form_upload(self):
+        resp = self.client.post("/upload", headers=self.headers, data={
+            "user_id": "ignored",
+            "file": (io.BytesIO(b"hello world"), "../notes.txt")
+        }, content_type="multipart/form-data")
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json
+        self.assertTrue(body["key"].startswith("7/") and body["key"].endswith("_notes.txt"))
+        self.assertEqual((body["size"], body["sha256"]), (11, hashlib.sha256(b"hello world").hexdigest()))
+        self.assertEqual(self.s3.objects[body["key"]], b"hello world")
+
+    def test_raw_body_upload(self):
+        resp = self.client.post("/upload?filename=fw.bin", headers=dict(self.headers, **{
+            "X-Content-SHA256": hashlib.sha256(b"firmware").hexdigest()
+        }), data=b"firmware", content_type="application/octet-stream")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json["size"], 8)
+
+        resp = self.client.post("/upload", headers=self.headers, data=b"x", content_type="application/octet-stream")
+        self.assertEqual(resp.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+
+# Add parent dir
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes.terminal_socket import OutputCoalescer, merge_chunks, legacy_group, NAMESPACE
+from services.socket_registry import socket_registry
+
+class FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+        self.tasks = []
+
+    def emit(self, event, payload, to=None, namespace=None):
+        self.emitted.append((event, payload, to))
+
+    def start_background_task(self, target, *args):
+        self.tasks.append((target, args))
+
+    def sleep(self, seconds):
+        pass
+
+    def run_tasks(self):
+        tasks, self.tasks = self.tasks, []
+        for target, args in tasks:
+            target(*args)
+
+class TestTerminalRelay(unittest.TestCase):
+    def test_merge_chunks(self):
+        self.assertEqual(merge_chunks(["a", "b", "c"]), ["abc"])
+        self.assertEqual(merge_chunks([b"a", b"b"]), [b"ab"])
+        self.assertEqual(merge_chunks(["a", b"b", "c"]), ["a", b"b", "c"])
+        self.assertEqual(merge_chunks(["a", None, "b"]), ["a", None, "b"])
+
+    def test_burst_is_one_emit(self):
+        sio = FakeSocketIO()
+        coalescer = OutputCoalescer(sio, 8)
+        for i in range(100):
+            coalescer.push("dev1", f"line {i}\n")
+
+        # Only the first chunk schedules a flush
+        self.assertEqual(len(sio.tasks), 1)
+        sio.run_tasks()
+
+        self.assertEqual(len(sio.emitted), 1)
+        event, payload, room = sio.emitted[0]
+        self.assertEqual(room, "device_dev1_browsers")
+        self.assertEqual(payload, "".join(f"line {i}\n" for i in range(100)))
+
+    def test_legacy_room_is_opt_in(self):
+        sio = FakeSocketIO()
+        coalescer = OutputCoalescer(sio, 0)
+        coalescer.push("dev1", "x")
+        self.assertEqual([e[2] for e in sio.emitted], ["device_dev1_browsers"])
+
+        socket_registry.add_member(NAMESPACE, legacy_group("dev1"), "sid1")
+        coalescer.push("dev1", "y")
+        self.assertEqual([e[2] for e in sio.emitted[1:]], ["device_dev1_browsers", "device_dev1"])
+
+        # Disconnect drops the opt-in
+        socket_registry.disconnect(NAMESPACE, "sid1")
+        self.assertFalse(socket_registry.has_members(NAMESPACE, legacy_group("dev1")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+"""Stand-ins shared by the scripts/test_*.py suites."""
+from unittest.mock import patch, MagicMock
+
+
+def auth_service(user_id=7, token=None):
+    """
+    Side effect for middleware.auth.requests.get, the call to the auth
+    service's /api/token/verify. Every token belongs to `user_id`; with
+    `token`, only "Bearer <token>" is valid and anything else gets a 401.
+    """
+    def verify(url, headers=None, timeout=None):
+        resp = MagicMock()
+        if token is not None and (headers or {}).get("Authorization") != f"Bearer {token}":
+            resp.status_code = 401
+            return resp
+        resp.status_code = 200
+        resp.json.return_value = {"isValid": True, "user_id": user_id}
+        return resp
+    return verify
+
+
+def mock_auth(testcase, user_id=7, token=None):
+    """Patches the auth service call for the rest of `testcase`. Returns the mock."""
+    patcher = patch('middleware.auth.requests.get', side_effect=auth_service(user_id, token))
+    mock = patcher.start()
+    testcase.addCleanup(patcher.stop)
+    return mock
@@ -0,0 +1,185 @@
+import os
+import time
+import uuid
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from config import Config
+from services.s3_service import s3_service
+
+logger = logging.getLogger("seaweed-flask")
+
+STALE_TEMP_SECONDS = 3600 # A temp file not written to for this long is left over from a crashed fill
+LOCK_NAME = ".lock" # Held exclusively while a fill makes room and renames its file into place
+
+
+class ArtifactTooLarge(Exception):
+    """The object would not fit in the cache at all; serve it from S3 instead."""
+
+
+class ArtifactCache:
+    """
+    Byte-bounded LRU of S3 objects on local disk, for the artifact download proxy.
+
+    The directory is the index, shared by every worker: recency is each
+    file's mtime (bumped on every hit), and the byte total is rebuilt from
+    the directory under an exclusive lock on LOCK_NAME whenever a fill has
+    to make room, so all workers together stay within max_bytes.
+
+    Each object is fetched from S3 once per worker: concurrent misses in a
+    process wait on the first caller's download instead of starting their
+    own. Files are written under a temporary name and renamed into place,
+    so a reader never sees a partial object. open() returns the file with
+    a shared lock held until it is closed, and eviction skips locked files,
+    so an object being served is never removed under its response.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or Config.ARTIFACT_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else Config.ARTIFACT_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        self._inflight = {} # filename -> Event set when the fill finishes
+        self._created = False
+
+    def _filename(self, key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _ensure_directory(self):
+        # Lazily, so importing the module touches no disk
+        if not self._created:
+            os.makedirs(self.directory, exist_ok=True)
+            self._created = True
+
+    def contains(self, key):
+        """Whether `key` is cached, without touching its LRU position."""
+        self._ensure_directory()
+        return os.path.exists(os.path.join(self.directory, self._filename(key)))
+
+    def open(self, key, size=None):
+        """
+        The cached object opened for reading, downloading it on a miss.
+        Returns (file, hit); `file.name` is its path. It cannot be evicted
+        until the file is closed. `size`, when known, lets oversized objects
+        be refused before any download.
+        """
+        if size is not None and size > self.max_bytes:
+            raise ArtifactTooLarge(key)
+        self._ensure_directory()
+        name = self._filename(key)
+        path = os.path.join(self.directory, name)
+
+        while True:
+            f = self._open_entry(path)
+            if f is not None:
+                return f, True
+            with self._lock:
+                event = self._inflight.get(name)
+                if event is None:
+                    event = self._inflight[name] = threading.Event()
+                    break
+            # Someone else in this process is filling it; re-check once they are done (or failed)
+            event.wait()
+
+        try:
+            return self._fill(key, name, path), False
+        finally:
+            with self._lock:
+                del self._inflight[name]
+            event.set()
+
+    def _open_entry(self, path):
+        # Returns the file under a shared lock, or None if it is not (or no longer) cached
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        fcntl.flock(f, fcntl.LOCK_SH)
+        if os.fstat(f.fileno()).st_nlink == 0:
+            f.close() # Evicted or replaced between open and lock
+            return None
+        try:
+            os.utime(path) # Most recently used
+        except OSError:
+            pass
+        return f
+
+    def _fill(self, key, name, path):
+        tmp = f"{path}.{uuid.uuid4().hex}"
+        try:
+            with open(tmp, "wb") as f:
+                s3_service.download_to(key, f)
+                size = f.tell()
+            if size > self.max_bytes:
+                raise ArtifactTooLarge(key)
+            with self._directory_lock():
+                self._evict(size, keep=name)
+                os.replace(tmp, path)
+                # Opened before the lock is released, so no other worker can evict it first
+                return self._open_entry(path)
+        except BaseException:
+            self._unlink(tmp)
+            raise
+
+    @contextmanager
+    def _directory_lock(self):
+        with open(os.path.join(self.directory, LOCK_NAME), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _scan(self):
+        # [(mtime, path, size)] of cached objects; abandoned temp files are removed on the way
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name == LOCK_NAME or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if "." in entry.name:
+                # Temp file. Another worker may still be writing it, so only remove abandoned ones
+                if time.time() - stat.st_mtime > STALE_TEMP_SECONDS:
+                    self._unlink(entry.path)
+                continue
+            files.append((stat.st_mtime, entry.path, stat.st_size))
+        return files
+
+    def _evict(self, incoming, keep=None):
+        # Caller holds the directory lock. Least recently used first; files being served are skipped.
+        files = self._scan()
+        total = sum(size for _, _, size in files) + incoming
+        for _, path, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if os.path.basename(path) == keep:
+                continue
+            try:
+                with open(path, "rb") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    self._unlink(path)
+            except (BlockingIOError, FileNotFoundError):
+                continue
+            total -= size
+            logger.debug(f"Evicted {os.path.basename(path)} ({size} bytes) from artifact cache")
+
+    def discard(self, key):
+        """Drops a cached object, e.g. when its artifact is deleted. Open readers keep their copy."""
+        self._ensure_directory()
+        self._unlink(os.path.join(self.directory, self._filename(key)))
+
+    def _unlink(self, path):
+        # Another worker may have removed it first
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        self._ensure_directory()
+        files = self._scan()
+        return {"objects": len(files), "bytes": sum(size for _, _, size in files), "max_bytes": self.max_bytes}
+
+
+artifact_cache = ArtifactCache()
@@ -0,0 +1,138 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from config import Config
+from models import db, Artifact
+from services.s3_service import s3_service, DELETE_BATCH_SIZE
+
+logger = logging.getLogger("seaweed-flask")
+
+ARTIFACT_PREFIX = "artifacts/"
+SAMPLE_SIZE = 100 # Keys listed per category in the report; counts are always complete
+
+
+def iter_objects(prefix=ARTIFACT_PREFIX):
+    """(key, size, last_modified) for every object under `prefix`, in S3's (UTF-8 byte) key order."""
+    paginator = s3_service.s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=Config.S3_BUCKET, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj["Key"], obj["Size"], obj["LastModified"]
+
+
+def iter_artifact_keys(prefix=ARTIFACT_PREFIX, batch_size=1000):
+    """(s3_key, artifact_id) ordered like the S3 listing, streamed from the database."""
+    key = Artifact.s3_key
+    if db.engine.dialect.name == "postgresql":
+        # The database collation may sort differently; "C" compares bytes, as S3 does
+        key = key.collate("C")
+    query = (db.session.query(Artifact.s3_key, Artifact.id)
+             .filter(Artifact.s3_key.startswith(prefix, autoescape=True))
+             .order_by(key, Artifact.id)
+             .execution_options(yield_per=batch_size))
+    for row in query:
+        yield row.s3_key, row.id
+
+
+def merge_join(objects, rows):
+    """
+    Walks both sorted streams once, yielding (key, object, artifact_ids):
+    object is (size, last_modified) or None, artifact_ids is [] for orphans.
+    Holds one object and one key's rows at a time.
+    """
+    objects, rows = iter(objects), iter(rows)
+    obj = next(objects, None)
+    row = next(rows, None)
+    while obj is not None or row is not None:
+        if row is None or (obj is not None and obj[0] < row[0]):
+            yield obj[0], obj[1:], []
+            obj = next(objects, None)
+            continue
+
+        key, ids = row[0], []
+        while row is not None and row[0] == key:
+            ids.append(row[1])
+            row = next(rows, None)
+        if obj is not None and obj[0] == key:
+            yield key, obj[1:], ids
+            obj = next(objects, None)
+        else:
+            yield key, None, ids
+
+
+class ArtifactReconciler:
+    """
+    Reconciles the objects under artifacts/ with the Artifact rows that
+    reference them:
+
+    - orphans: objects no row points at (e.g. a presigned upload whose
+      create_artifact never came). Only those older than the grace period
+      are reported or deleted, so in-progress uploads are left alone.
+    - missing: rows whose object does not exist.
+    - empty: referenced objects of size 0.
+
+    Rows are never deleted here; missing ones need a human decision.
+    """
+
+    def __init__(self, grace_hours=None):
+        self.grace = timedelta(hours=grace_hours if grace_hours is not None else Config.ARTIFACT_ORPHAN_GRACE_HOURS)
+
+    def run(self, delete=False, now=None):
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - self.grace
+        report = {
+            "objects": 0, "bytes": 0, "referenced": 0,
+            "orphans": 0, "orphan_bytes": 0, "recent_orphans": 0,
+            "missing": 0, "empty": 0, "deleted": 0, "delete_failed": 0,
+            "samples": {"orphans": [], "missing": [], "empty": []}
+        }
+        pending = []
+
+        for key, obj, artifact_ids in merge_join(iter_objects(), iter_artifact_keys()):
+            if obj is None:
+                report["missing"] += 1
+                self._sample(report, "missing", {"key": key, "artifact_ids": artifact_ids})
+                continue
+
+            size, last_modified = obj
+            report["objects"] += 1
+            report["bytes"] += size
+            if artifact_ids:
+                report["referenced"] += 1
+                if size == 0:
+                    report["empty"] += 1
+                    self._sample(report, "empty", {"key": key, "artifact_ids": artifact_ids})
+            elif last_modified > cutoff:
+                report["recent_orphans"] += 1
+            else:
+                report["orphans"] += 1
+                report["orphan_bytes"] += size
+                self._sample(report, "orphans", {"key": key, "size": size, "last_modified": last_modified.isoformat()})
+                if delete:
+                    pending.append(key)
+                    if len(pending) >= DELETE_BATCH_SIZE:
+                        self._delete(pending, report)
+                        pending = []
+
+        if pending:
+            self._delete(pending, report)
+        logger.info(f"Artifact reconciliation: {report['orphans']} orphan(s), {report['missing']} missing, "
+                    f"{report['empty']} empty, {report['deleted']} deleted")
+        return report
+
+    def _sample(self, report, category, item):
+        if len(report["samples"][category]) < SAMPLE_SIZE:
+            report["samples"][category].append(item)
+
+    def _delete(self, keys, report):
+        # An artifact may have been created for one of these since the listing passed it
+        # Own connection: the session is still streaming the ordered key list
+        with db.engine.connect() as conn:
+            claimed = set(conn.execute(select(Artifact.s3_key).where(Artifact.s3_key.in_(keys))).scalars())
+        keys = [key for key in keys if key not in claimed]
+        for key, error in s3_service.delete_files(keys).items():
+            if error:
+                report["delete_failed"] += 1
+                logger.error(f"Failed to delete orphan artifact object {key}: {error}")
+            else:
+                report["deleted"] += 1
+
@@ -0,0 +1,101 @@
+import uuid
+import logging
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from config import Config
+from models import db, DeviceCommand, CommandOutputChunk
+from services.s3_service import s3_service
+from services.log_store import compress, decompress, EXTENSIONS, log_store
+
+logger = logging.getLogger("seaweed-flask")
+
+STREAMS = ("stdout", "stderr", "result")
+RESULT_SEQ = 2**31 - 1 # Slot of the overflowing result text; device seqs must stay below it
+
+
+class CommandOutputStore:
+    """
+    Incremental output of long-running device commands.
+
+    Devices post chunks numbered by `seq`; a re-sent seq is ignored, so
+    retries are idempotent. Chunks are compressed and, past
+    COMMAND_OUTPUT_INLINE_MAX_BYTES, written to S3 with only the index row kept.
+    """
+
+    def __init__(self, encoding=None):
+        self.encoding = encoding or log_store.encoding
+
+    def append(self, command, seq, stream, content):
+        """Stores `content` (bytes) as chunk `seq`. Returns the chunk, or None if seq was already stored."""
+        if self._exists(command.id, seq):
+            return None
+
+        blob = compress(content, self.encoding)
+        chunk = CommandOutputChunk(
+            id=str(uuid.uuid4()),
+            command_id=command.id,
+            seq=seq,
+            stream=stream,
+            length=len(content),
+            encoding=self.encoding,
+            stored_size=len(blob),
+            created_at=datetime.utcnow()
+        )
+        if len(blob) > Config.COMMAND_OUTPUT_INLINE_MAX_BYTES:
+            chunk.s3_key = f"commands/{command.device_id}/{command.id}/{seq:010d}-{chunk.id}.{EXTENSIONS[self.encoding]}"
+            s3_service.put_bytes(chunk.s3_key, blob)
+        else:
+            chunk.data = blob
+
+        db.session.add(chunk)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Concurrent retry of the same seq
+            db.session.rollback()
+            self.delete_objects([chunk.s3_key])
+            return None
+        return chunk
+
+    def _exists(self, command_id, seq):
+        return db.session.query(CommandOutputChunk.id).filter_by(command_id=command_id, seq=seq).first() is not None
+
+    def load(self, chunk):
+        blob = chunk.data if chunk.s3_key is None else s3_service.get_bytes(chunk.s3_key)
+        return decompress(blob, chunk.encoding)
+
+    def read(self, command_id, after_seq=-1, limit=100):
+        """Chunks with seq > after_seq, in order, via the (command_id, seq) unique index."""
+        return (CommandOutputChunk.query
+                .filter(CommandOutputChunk.command_id == command_id, CommandOutputChunk.seq > after_seq)
+                .order_by(CommandOutputChunk.seq)
+                .limit(limit)
+                .all())
+
+    def summary(self, command_id):
+        chunks, size = (db.session.query(func.count(CommandOutputChunk.id), func.coalesce(func.sum(CommandOutputChunk.length), 0))
+                        .filter(CommandOutputChunk.command_id == command_id)
+                        .one())
+        return {"chunks": chunks, "bytes": int(size)}
+
+    def delete_for_device(self, device_id):
+        """
+        Deletes the output chunk rows of every command of `device_id` and returns
+        their S3 keys. The caller commits, then passes the keys to delete_objects().
+        """
+        command_ids = db.session.query(DeviceCommand.id).filter_by(device_id=device_id)
+        query = CommandOutputChunk.query.filter(CommandOutputChunk.command_id.in_(command_ids))
+        keys = [key for (key,) in query.with_entities(CommandOutputChunk.s3_key).filter(CommandOutputChunk.s3_key.isnot(None))]
+        query.delete(synchronize_session=False)
+        db.session.flush()
+        return keys
+
+    def delete_objects(self, keys):
+        # Batched DeleteObjects; failures are logged and the objects left for a later sweep
+        for key, error in s3_service.delete_files(keys).items():
+            if error:
+                logger.error(f"Failed to delete command output object {key}: {error}")
+
+
+command_output = CommandOutputStore()
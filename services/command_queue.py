@@ -0,0 +1,117 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from config import Config
+from models import db, DeviceCommand
+
+logger = logging.getLogger("seaweed-flask")
+
+PENDING, SENT, TIMED_OUT = "pending", "sent", "timed_out"
+EXECUTED, FAILED = "executed", "failed"
+RESULT_STATUSES = (EXECUTED, FAILED) # The terminal statuses a device may report
+FINISHED_STATUSES = (EXECUTED, FAILED, TIMED_OUT) # No more output is accepted
+
+
+class CommandQueue:
+    """
+    Per-device command queue with at-least-once delivery.
+
+    A heartbeat claims pending commands under a lease. Claiming locks the rows
+    with FOR UPDATE SKIP LOCKED, so two concurrent heartbeats (e.g. a cloned
+    device) never hand out the same command. A command whose lease runs out
+    before the device reports a result goes back to pending after an
+    exponential backoff, until max_attempts is reached and it is marked
+    timed_out.
+    """
+
+    def __init__(self, lease_seconds=None, backoff_seconds=None, backoff_max_seconds=None):
+        self.lease_seconds = lease_seconds or Config.COMMAND_LEASE_SECONDS
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else Config.COMMAND_RETRY_BACKOFF_SECONDS
+        self.backoff_max_seconds = backoff_max_seconds or Config.COMMAND_RETRY_BACKOFF_MAX_SECONDS
+
+    def enqueue(self, device_id, command, max_attempts=None):
+        cmd = DeviceCommand(
+            device_id=device_id,
+            command=command,
+            status=PENDING,
+            attempts=0,
+            max_attempts=max_attempts or Config.COMMAND_MAX_ATTEMPTS
+        )
+        db.session.add(cmd)
+        return cmd
+
+    def backoff(self, attempts):
+        return min(self.backoff_seconds * 2 ** max(attempts - 1, 0), self.backoff_max_seconds)
+
+    def claim(self, device_id, limit=None, now=None):
+        """
+        Leases up to `limit` claimable commands for `device_id`, oldest first.
+        The caller commits; the row locks are held until then.
+        """
+        now = now or datetime.utcnow()
+        self.requeue_expired(device_id=device_id, now=now)
+
+        # Served by ix_device_commands_pending (device_id, created_at) WHERE status = 'pending'
+        commands = (DeviceCommand.query
+                    .filter(DeviceCommand.device_id == device_id, DeviceCommand.status == PENDING)
+                    .filter(or_(DeviceCommand.next_attempt_at.is_(None), DeviceCommand.next_attempt_at <= now))
+                    .order_by(DeviceCommand.created_at)
+                    .limit(limit or Config.COMMAND_CLAIM_LIMIT)
+                    .with_for_update(skip_locked=True)
+                    .all())
+
+        lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+        for cmd in commands:
+            cmd.status = SENT
+            cmd.attempts = (cmd.attempts or 0) + 1
+            cmd.lease_expires_at = lease_expires_at
+            cmd.next_attempt_at = None
+        return commands
+
+    def requeue_expired(self, device_id=None, now=None, batch_size=500):
+        """
+        Re-queues (or times out) 'sent' commands whose lease has expired.
+        Scoped to one device from claim(); across all devices from the sweeper.
+        Returns the number of commands handled. The caller commits.
+        """
+        now = now or datetime.utcnow()
+        query = DeviceCommand.query.filter(DeviceCommand.status == SENT, DeviceCommand.lease_expires_at < now)
+        if device_id is not None:
+            query = query.filter(DeviceCommand.device_id == device_id)
+
+        expired = query.limit(batch_size).with_for_update(skip_locked=True).all()
+        for cmd in expired:
+            cmd.lease_expires_at = None
+            if (cmd.attempts or 0) >= (cmd.max_attempts or Config.COMMAND_MAX_ATTEMPTS):
+                cmd.status = TIMED_OUT
+                cmd.executed_at = now
+                logger.warning(f"Command {cmd.id} for {cmd.device_id} timed out after {cmd.attempts} attempts")
+            else:
+                cmd.status = PENDING
+                cmd.next_attempt_at = now + timedelta(seconds=self.backoff(cmd.attempts))
+        return len(expired)
+
+    def extend_lease(self, cmd, now=None):
+        """Pushes a running command's lease out by another lease period. The caller commits."""
+        cmd.lease_expires_at = (now or datetime.utcnow()) + timedelta(seconds=self.lease_seconds)
+
+    def complete(self, cmd, status, result, now=None):
+        """
+        Records the device's result. Late results for re-queued or timed-out
+        commands are still accepted (the device did run it); a repeated result
+        for a finished command is ignored. Returns False if ignored.
+        `status` must be one of RESULT_STATUSES (ValueError otherwise).
+        """
+        if status not in RESULT_STATUSES:
+            raise ValueError(f"Invalid result status {status!r}")
+        if cmd.status not in (PENDING, SENT, TIMED_OUT):
+            return False
+        cmd.status = status
+        cmd.result = result
+        cmd.executed_at = now or datetime.utcnow()
+        cmd.lease_expires_at = None
+        cmd.next_attempt_at = None
+        return True
+
+
+command_queue = CommandQueue()
@@ -0,0 +1,104 @@
+import time
+import logging
+import threading
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.pool import QueuePool
+from services.json_codec import dumps_compact, loads
+
+logger = logging.getLogger("seaweed-flask")
+
+
+class PoolMetrics:
+    """Checkout wait time and exhaustion counters for the SQLAlchemy pool."""
+
+    def __init__(self, slow_checkout_seconds=1.0):
+        self.slow_checkout_seconds = slow_checkout_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.slow_checkouts = 0
+            self.exhausted = 0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            slow = seconds >= self.slow_checkout_seconds
+            if slow:
+                self.slow_checkouts += 1
+        if slow:
+            logger.warning(f"Slow DB pool checkout: waited {seconds:.3f}s")
+
+    def record_exhausted(self):
+        with self._lock:
+            self.exhausted += 1
+        logger.warning("DB pool exhausted: checkout timed out")
+
+    def snapshot(self, pool=None):
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "slow_checkouts": self.slow_checkouts,
+                "exhausted": self.exhausted
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": pool.overflow()
+            })
+        return data
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited and when it timed out."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except sa_exc.TimeoutError:
+            # Counted apart: a timeout is not a checkout, and its wait is just pool_timeout
+            pool_metrics.record_exhausted()
+            raise
+        pool_metrics.record_wait(time.perf_counter() - start)
+        return conn
+
+
+def engine_options(config):
+    """
+    Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings. Only applied to
+    PostgreSQL; SQLite (tests, scripts) keeps SQLAlchemy's defaults.
+    """
+    uri = config.get("SQLALCHEMY_DATABASE_URI") or ""
+    if not uri.startswith("postgresql"):
+        return {}
+
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+    # `json` columns store the serialized text verbatim: keep it compact (device stats are written every heartbeat)
+    options["json_serializer"] = dumps_compact
+    options["json_deserializer"] = loads
+    # Unreachable host fails instead of blocking a worker (libpq has no default)
+    options["connect_args"] = {"connect_timeout": config["DB_CONNECT_TIMEOUT_SECONDS"]}
+    if config["DB_STATEMENT_TIMEOUT_MS"]:
+        options["connect_args"]["options"] = f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"
+    return options
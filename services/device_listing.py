@@ -0,0 +1,34 @@
+from datetime import datetime
+from models import Device
+from services.pagination import PaginationError
+
+# Keyset sort keys for device lists; device_id breaks ties
+DEVICE_SORTS = {"device_id": Device.device_id, "last_seen": Device.last_seen}
+
+# Only what the list endpoints return; stats and available_cameras (JSON) stay unloaded
+DEVICE_LIST_COLUMNS = (
+    Device.device_id, Device.device_type, Device.current_version, Device.last_seen,
+    Device.status, Device.friendly_name
+)
+
+
+def filter_devices(query, args):
+    """
+    Applies the list filters shared by /devices and /api/user/devices:
+    ?device_type=, ?status=, ?q= (device_id prefix) and ?seen_after= (ISO time).
+    Raises PaginationError on a malformed seen_after.
+    """
+    if args.get("device_type"):
+        query = query.filter(Device.device_type == args["device_type"])
+    if args.get("status"):
+        query = query.filter(Device.status == args["status"])
+    if args.get("q"):
+        escaped = args["q"].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(Device.device_id.like(f"{escaped}%", escape="\\"))
+    if args.get("seen_after"):
+        try:
+            seen_after = datetime.fromisoformat(args["seen_after"].rstrip("Z"))
+        except ValueError:
+            raise PaginationError("seen_after must be an ISO 8601 timestamp")
+        query = query.filter(Device.last_seen >= seen_after)
+    return query
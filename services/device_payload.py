@@ -0,0 +1,104 @@
+import zlib
+import logging
+from flask import request
+from config import Config
+from services.json_codec import loads
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+logger = logging.getLogger("seaweed-flask")
+
+READ_SIZE = 64 * 1024
+
+
+class PayloadError(Exception):
+    """The device request body could not be decoded. `status` is 400, 413 or 415."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _too_large(max_bytes):
+    return PayloadError(f"Decoded body exceeds {max_bytes} bytes", 413)
+
+
+def decompress(body, content_encoding, max_bytes):
+    """Undoes Content-Encoding (gzip or zstd), refusing output over `max_bytes` (zip bombs)."""
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        if len(body) > max_bytes:
+            raise _too_large(max_bytes)
+        return body
+
+    if encoding in ("gzip", "x-gzip"):
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decoder.decompress(body, max_bytes + 1)
+        except zlib.error as e:
+            raise PayloadError(f"Invalid gzip body: {e}")
+        if len(data) > max_bytes:
+            raise _too_large(max_bytes)
+        if not decoder.eof:
+            raise PayloadError("Truncated gzip body")
+        return data
+
+    if encoding == "zstd" and zstandard is not None:
+        chunks, total = [], 0
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+                while True:
+                    chunk = reader.read(READ_SIZE)
+                    if not chunk:
+                        break
+                    total += len(chunk)
+                    if total > max_bytes:
+                        raise _too_large(max_bytes)
+                    chunks.append(chunk)
+        except zstandard.ZstdError as e:
+            raise PayloadError(f"Invalid zstd body: {e}")
+        return b"".join(chunks)
+
+    raise PayloadError(f"Unsupported Content-Encoding: {content_encoding}", 415)
+
+
+def decode(body, mimetype, content_encoding=None, max_bytes=None):
+    """
+    Parses a device request body: JSON, MessagePack or CBOR, optionally
+    gzip/zstd compressed. Returns the decoded object.
+    """
+    data = decompress(body, content_encoding, max_bytes or Config.DEVICE_MAX_BODY_BYTES)
+    try:
+        if mimetype == "application/json":
+            return loads(data)
+        if mimetype in ("application/msgpack", "application/x-msgpack") and msgpack is not None:
+            return msgpack.unpackb(data, raw=False)
+        if mimetype == "application/cbor" and cbor2 is not None:
+            return cbor2.loads(data)
+    except Exception as e: # Each library has its own error types
+        raise PayloadError(f"Invalid {mimetype} body: {e}")
+    raise PayloadError(f"Unsupported Content-Type: {mimetype or 'none'}", 415)
+
+
+def device_json():
+    """
+    The request body of a device endpoint as a dict, in place of request.json.
+    Raises PayloadError; the app turns it into a JSON error response.
+    """
+    data = decode(request.get_data(cache=False), request.mimetype, request.headers.get("Content-Encoding"))
+    if not isinstance(data, dict):
+        raise PayloadError("Body must be an object")
+    return data
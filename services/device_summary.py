@@ -0,0 +1,133 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import func, case
+from config import Config
+from models import db, Device
+
+PERCENTILES = (0.5, 0.9, 0.99)
+USAGE_COLUMNS = {"cpu": Device.cpu_percent, "memory": Device.memory_percent, "disk": Device.disk_percent}
+LAST_SEEN_WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+
+
+def _percent(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, dict):
+        if value.get("percent") is not None:
+            return _percent(value["percent"])
+        if value.get("total") and value.get("used") is not None:
+            return value["used"] / value["total"] * 100
+    return None
+
+
+def usage_from_stats(stats):
+    """
+    (cpu, memory, disk) percentages from a heartbeat `stats` payload, as far as
+    they can be read. CPU may be a number or {total|load, ...}; disk is the
+    fullest entry of `disks` (or `storage`).
+    """
+    if not isinstance(stats, dict):
+        return None, None, None
+
+    cpu = stats.get("cpu")
+    if isinstance(cpu, dict):
+        cpu = cpu.get("total", cpu.get("load"))
+    cpu = _percent(cpu)
+
+    memory = _percent(stats.get("memory"))
+
+    disks = stats.get("disks") or stats.get("storage") or []
+    if isinstance(disks, dict):
+        disks = [disks]
+    disk_values = [p for p in (_percent(d) for d in disks) if p is not None]
+    return cpu, memory, max(disk_values) if disk_values else None
+
+
+def _percentile_cont(values, q):
+    # Same interpolation as PostgreSQL's percentile_cont
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class DeviceSummary:
+    """
+    Fleet-wide counts and usage percentiles, aggregated in SQL and cached for
+    DEVICE_SUMMARY_TTL_SECONDS so dashboards polling it cost one lookup.
+    Concurrent requests for an expired summary wait for a single recompute.
+    """
+
+    def __init__(self, ttl_seconds=None):
+        self.ttl = ttl_seconds if ttl_seconds is not None else Config.DEVICE_SUMMARY_TTL_SECONDS
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires = 0.0
+
+    def get(self):
+        if self._value is not None and time.monotonic() < self._expires:
+            return self._value
+        with self._lock:
+            if self._value is None or time.monotonic() >= self._expires:
+                self._value = self.compute()
+                self._expires = time.monotonic() + self.ttl
+            return self._value
+
+    def invalidate(self):
+        self._expires = 0.0
+
+    def compute(self, now=None):
+        now = now or datetime.utcnow()
+        online_since = now - timedelta(seconds=Config.DEVICE_OFFLINE_AFTER_SECONDS)
+
+        def count_by(column):
+            rows = db.session.query(column, func.count()).group_by(column).all()
+            return {str(key) if key is not None else "unknown": count for key, count in rows}
+
+        windows = [func.sum(case((Device.last_seen >= now - timedelta(seconds=s), 1), else_=0))
+                   for s in LAST_SEEN_WINDOWS.values()]
+        total, online, *seen = db.session.query(
+            func.count(),
+            func.sum(case((Device.last_seen >= online_since, 1), else_=0)),
+            *windows
+        ).select_from(Device).one()
+
+        return {
+            "total": total,
+            "online": online or 0,
+            "offline": total - (online or 0),
+            "online_threshold_seconds": Config.DEVICE_OFFLINE_AFTER_SECONDS,
+            "seen_within": {name: count or 0 for name, count in zip(LAST_SEEN_WINDOWS, seen)},
+            "by_status": count_by(Device.status),
+            "by_device_type": count_by(Device.device_type),
+            "by_version": count_by(Device.current_version),
+            # Only devices reporting recently: stale stats would skew the picture
+            "usage": self._usage_percentiles(online_since),
+            "generated_at": now.isoformat() + "Z"
+        }
+
+    def _usage_percentiles(self, online_since):
+        recent = Device.last_seen >= online_since
+        if db.engine.dialect.name == "postgresql":
+            columns = [func.percentile_cont(q).within_group(column)
+                       for column in USAGE_COLUMNS.values() for q in PERCENTILES]
+            row = iter(db.session.query(*columns).filter(recent).one())
+            return {name: {f"p{int(q * 100)}": _round(next(row)) for q in PERCENTILES} for name in USAGE_COLUMNS}
+
+        # SQLite has no ordered-set aggregates: sort the three projected columns in Python
+        rows = db.session.query(*USAGE_COLUMNS.values()).filter(recent).all()
+        usage = {}
+        for i, name in enumerate(USAGE_COLUMNS):
+            values = sorted(row[i] for row in rows if row[i] is not None)
+            usage[name] = {f"p{int(q * 100)}": _round(_percentile_cont(values, q)) for q in PERCENTILES}
+        return usage
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+device_summary = DeviceSummary()
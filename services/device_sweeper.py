@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, text, literal_column
+from config import Config
+from models import db, Device
+from services.command_queue import command_queue
+
+logger = logging.getLogger("seaweed-flask")
+
+OFFLINE = "offline"
+# Inlined rather than bound, so the predicate matches the partial index (SQLite requires it)
+LIVE = Device.status.is_distinct_from(literal_column("'offline'"))
+ADVISORY_LOCK_ID = 7301002 # One sweeper at a time across workers/pods
+
+
+class OfflineSweeper:
+    """
+    Marks devices offline once their heartbeats stop.
+
+    Live devices (status other than offline) are kept in a partial index on
+    last_seen, which works as the priority queue of next expected heartbeats:
+    each sweep reads only its overdue front, so the cost follows the number
+    of devices that actually expired, not the fleet size. Overdue devices
+    are locked and flipped with one bulk UPDATE per batch.
+    """
+
+    def __init__(self, offline_after=None, interval=None, batch_size=None):
+        self.offline_after = offline_after or Config.DEVICE_OFFLINE_AFTER_SECONDS
+        self.interval = interval or Config.DEVICE_SWEEP_INTERVAL_SECONDS
+        self.batch_size = batch_size or Config.DEVICE_SWEEP_BATCH_SIZE
+
+    def _try_lock(self):
+        if db.engine.dialect.name != "postgresql":
+            return True
+        # Transaction-scoped: released by the commit/rollback at the end of the sweep
+        return db.session.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID}).scalar()
+
+    def sweep(self, now=None):
+        """
+        Flips overdue devices to offline and re-queues expired command leases.
+        Returns [(device_id, previous_status, last_seen)] for the devices flipped.
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.offline_after)
+        flipped = []
+
+        if not self._try_lock():
+            db.session.rollback()
+            return flipped
+        try:
+            while True:
+                # Served by ix_devices_live_last_seen; devices mid-heartbeat are skipped, not waited on
+                overdue = (select(Device.device_id, Device.status, Device.last_seen)
+                           .where(LIVE, Device.last_seen < cutoff)
+                           .order_by(Device.last_seen)
+                           .limit(self.batch_size)
+                           .with_for_update(skip_locked=True))
+                batch = db.session.execute(overdue).all()
+                if not batch:
+                    break
+                db.session.execute(
+                    update(Device)
+                    .where(Device.device_id.in_([row.device_id for row in batch]))
+                    .values(status=OFFLINE)
+                    .execution_options(synchronize_session=False)
+                )
+                flipped.extend((row.device_id, row.status, row.last_seen) for row in batch)
+                if len(batch) < self.batch_size:
+                    break
+
+            # Devices that went away also stop acknowledging commands
+            command_queue.requeue_expired(now=now)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if flipped:
+            logger.info(f"Marked {len(flipped)} device(s) offline")
+        return flipped
+
+    def run(self, app, socketio):
+        from routes.device_socket import emit_status_change
+        logger.info(f"Offline sweeper started (every {self.interval}s, offline after {self.offline_after}s)")
+        while True:
+            try:
+                with app.app_context():
+                    for device_id, previous, last_seen in self.sweep():
+                        emit_status_change(device_id, OFFLINE, previous, last_seen)
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"Offline sweep failed: {e}")
+            socketio.sleep(self.interval)
+
+
+offline_sweeper = OfflineSweeper()
+
+
+def start_sweeper(app, socketio):
+    if not Config.DEVICE_SWEEPER_ENABLED:
+        return
+    socketio.start_background_task(offline_sweeper.run, app, socketio)
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+from config import Config
+from models import db, Device, DeviceTombstone
+from services.pagination import PaginationError, encode_cursor, decode_cursor
+from services.device_listing import DEVICE_LIST_COLUMNS
+from sqlalchemy.orm import load_only
+
+
+class CursorExpired(Exception):
+    """The ?since= cursor predates tombstone retention; the client must do a full sync."""
+
+
+def parse_since(since):
+    """'0' (or empty) starts from scratch; anything else is a cursor from a previous response."""
+    if since in ("", "0"):
+        return 0
+    try:
+        revision, issued_at = decode_cursor(since)
+        revision = int(revision)
+    except (PaginationError, ValueError, TypeError):
+        raise PaginationError("Invalid since cursor")
+    if issued_at < datetime.utcnow() - timedelta(days=Config.DEVICE_TOMBSTONE_RETENTION_DAYS):
+        raise CursorExpired()
+    return revision
+
+
+def changes_since(since, user_id=None, limit=None, now=None):
+    """
+    Devices and tombstones with revision > `since`, in revision order.
+    Returns (devices, tombstones, cursor_revision, more).
+
+    Revisions come from a sequence, so a slow transaction can commit a lower
+    revision after a higher one has been read. Items written within the last
+    DEVICE_SYNC_GRACE_SECONDS are returned but not moved past by the cursor,
+    so they (and anything that commits behind them) are sent again next time.
+    """
+    limit = min(limit or Config.PAGE_MAX_LIMIT, Config.PAGE_MAX_LIMIT)
+    now = now or datetime.utcnow()
+    settled_before = now - timedelta(seconds=Config.DEVICE_SYNC_GRACE_SECONDS)
+
+    devices = (Device.query
+               .options(load_only(*DEVICE_LIST_COLUMNS, Device.revision, Device.updated_at))
+               .filter(Device.revision > since))
+    tombstones = DeviceTombstone.query.filter(DeviceTombstone.revision > since)
+    if user_id is not None:
+        devices = devices.filter(Device.user_id == user_id)
+        tombstones = tombstones.filter(DeviceTombstone.user_id == user_id)
+    else:
+        # The fleet-wide list only loses devices that were deleted
+        tombstones = tombstones.filter(DeviceTombstone.deleted.is_(True))
+
+    devices = devices.order_by(Device.revision).limit(limit + 1).all()
+    tombstones = tombstones.order_by(DeviceTombstone.revision).limit(limit + 1).all()
+
+    items = sorted(devices + tombstones, key=lambda item: item.revision)
+    more = len(items) > limit
+    items = items[:limit]
+
+    cursor = since
+    for item in items:
+        written_at = item.updated_at if isinstance(item, Device) else item.created_at
+        if written_at is None or written_at > settled_before:
+            break
+        cursor = item.revision
+
+    devices = [item for item in items if isinstance(item, Device)]
+    # A device that came back (re-created or re-bound) outranks its older tombstone
+    present = {d.device_id for d in devices}
+    tombstones = [item for item in items if isinstance(item, DeviceTombstone) and item.device_id not in present]
+    return devices, tombstones, cursor, more and cursor > since
+
+
+def sync_response(since, serialize, user_id=None, limit=None):
+    """JSON body for a ?since= request: changed rows, removed ids and the next cursor."""
+    revision = parse_since(since)
+    devices, tombstones, cursor, more = changes_since(revision, user_id=user_id, limit=limit)
+    return {
+        "devices": [serialize(d) for d in devices],
+        "removed": [t.device_id for t in tombstones],
+        "cursor": encode_cursor([cursor, datetime.utcnow()]),
+        "more": more
+    }
+
+
+def purge_tombstones(days=None):
+    """Drops tombstones past retention (cursors that old are refused). Returns the number removed."""
+    cutoff = datetime.utcnow() - timedelta(days=days if days is not None else Config.DEVICE_TOMBSTONE_RETENTION_DAYS)
+    removed = DeviceTombstone.query.filter(DeviceTombstone.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
@@ -0,0 +1,221 @@
+import re
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from config import Config
+from models import db, StoredFile, UserStorage, UploadReservation
+from services.s3_service import s3_service, UPLOAD_URL_EXPIRES_SECONDS
+from services.artifact_gc import merge_join
+
+logger = logging.getLogger("seaweed-flask")
+
+# Top-level prefixes owned by the service itself, not by users
+SYSTEM_PREFIXES = ("artifacts/", "commands/", "logs/")
+UUID_PREFIX = re.compile(r"^[0-9a-f]{32}_")
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def display_name(key):
+    """Filename as uploaded: the key without `<user_id>/` and the uuid prefix added by build_key."""
+    return UUID_PREFIX.sub("", key.split("/", 1)[-1])
+
+
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _insert(model):
+    return (postgresql if db.engine.dialect.name == "postgresql" else sqlite).insert(model)
+
+
+class FileIndex:
+    """
+    The `files` table and per-user totals in `user_storage`.
+
+    Uploads and deletes update both in one transaction, so usage and quota
+    checks are a single-row read. Presigned uploads hold their declared size
+    in `upload_reservations` until they are indexed or the URL expires.
+    Anything that bypasses the API (uploads whose completion call never came,
+    Filer UI edits) is picked up by reconcile(), which also rebuilds the totals.
+    """
+
+    def record(self, user_id, key, size, content_type=None, etag=None, sha256=None, last_modified=None):
+        """Adds or refreshes the metadata of an uploaded object. Caller commits."""
+        row = db.session.get(StoredFile, key, with_for_update=True)
+        if row is None:
+            row = StoredFile(key=key, user_id=user_id, name=display_name(key), size=0)
+            db.session.add(row)
+            objects = 1
+        else:
+            objects = 0
+        bytes_delta = size - row.size
+        row.size = size
+        row.content_type = content_type or row.content_type
+        row.etag = etag or row.etag
+        row.sha256 = sha256 or row.sha256
+        row.created_at = _naive_utc(last_modified) or datetime.utcnow()
+        self._adjust(user_id, bytes_delta, objects)
+        db.session.execute(delete(UploadReservation).where(UploadReservation.key == key))
+        return row
+
+    def remove(self, keys):
+        """Drops the metadata of deleted objects. Caller commits."""
+        keys = [key for key in keys if key]
+        if not keys:
+            return
+        per_user = {}
+        for user_id, size in (db.session.query(StoredFile.user_id, StoredFile.size)
+                              .filter(StoredFile.key.in_(keys)).with_for_update()):
+            total, count = per_user.get(user_id, (0, 0))
+            per_user[user_id] = (total + size, count + 1)
+        db.session.execute(delete(StoredFile).where(StoredFile.key.in_(keys)))
+        for user_id, (size, count) in per_user.items():
+            self._adjust(user_id, -size, -count)
+
+    def _adjust(self, user_id, bytes_delta, objects_delta):
+        if not bytes_delta and not objects_delta:
+            return
+        stmt = _insert(UserStorage).values(user_id=user_id, bytes=bytes_delta, objects=objects_delta)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[UserStorage.user_id],
+            set_={"bytes": UserStorage.bytes + bytes_delta, "objects": UserStorage.objects + objects_delta}
+        ))
+
+    def usage(self, user_id):
+        row = db.session.get(UserStorage, str(user_id))
+        return {
+            "bytes": row.bytes if row else 0,
+            "objects": row.objects if row else 0,
+            "reserved_bytes": self.reserved(user_id),
+            "quota_bytes": Config.USER_QUOTA_BYTES or None
+        }
+
+    def reserved(self, user_id, now=None):
+        """Bytes held by presigned uploads that are neither indexed nor expired."""
+        return (db.session.query(func.coalesce(func.sum(UploadReservation.size), 0))
+                .filter(UploadReservation.user_id == str(user_id),
+                        UploadReservation.expires_at > (now or datetime.utcnow()))
+                .scalar())
+
+    def check_quota(self, user_id, incoming_bytes):
+        """Raises QuotaExceeded if `incoming_bytes` more would put the user over USER_QUOTA_BYTES."""
+        if not Config.USER_QUOTA_BYTES:
+            return
+        usage = self.usage(user_id)
+        used = usage["bytes"] + usage["reserved_bytes"]
+        if used + incoming_bytes > Config.USER_QUOTA_BYTES:
+            raise QuotaExceeded(f"Storage quota exceeded: {used} of {Config.USER_QUOTA_BYTES} bytes used or reserved")
+
+    def reserve(self, user_id, key, size, now=None):
+        """
+        Holds `size` bytes of quota for a presigned upload to `key` until it is
+        recorded or the URL expires. The user's totals row is locked, so
+        concurrent presigns are checked one after another. Caller commits.
+        """
+        if not Config.USER_QUOTA_BYTES:
+            return
+        user_id = str(user_id)
+        db.session.execute(_insert(UserStorage).values(user_id=user_id, bytes=0, objects=0).on_conflict_do_nothing())
+        db.session.get(UserStorage, user_id, with_for_update=True, populate_existing=True)
+        self.check_quota(user_id, size)
+        now = now or datetime.utcnow()
+        db.session.add(UploadReservation(key=key, user_id=user_id, size=size,
+                                         expires_at=now + timedelta(seconds=UPLOAD_URL_EXPIRES_SECONDS)))
+
+    def remaining(self, user_id):
+        """Bytes left under the quota, or None when there is no quota."""
+        if not Config.USER_QUOTA_BYTES:
+            return None
+        usage = self.usage(user_id)
+        return max(Config.USER_QUOTA_BYTES - usage["bytes"] - usage["reserved_bytes"], 0)
+
+    def reconcile(self, now=None):
+        """
+        Brings `files` in line with the bucket, one user prefix at a time:
+        objects without a row are indexed, rows whose object is gone are
+        dropped, sizes are corrected, and each user's totals are recomputed.
+        Each prefix is a merge join of the S3 listing with the rows in key
+        order, so memory stays flat however many files a user has.
+        Returns counts of rows added, updated and removed.
+        """
+        started = _naive_utc(now or datetime.now(timezone.utc))
+        counts = {"users": 0, "added": 0, "updated": 0, "removed": 0}
+        db_users = {user_id for (user_id,) in db.session.query(StoredFile.user_id).distinct()}
+        db.session.execute(delete(UploadReservation).where(UploadReservation.expires_at <= started))
+        db.session.commit()
+        for user_id in sorted(set(self._user_prefixes()) | db_users):
+            self._reconcile_user(user_id, started, counts)
+            counts["users"] += 1
+        logger.info(f"File index reconciliation: {counts}")
+        return counts
+
+    def _user_prefixes(self):
+        paginator = s3_service.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=Config.S3_BUCKET, Delimiter="/"):
+            for prefix in page.get("CommonPrefixes", []):
+                if prefix["Prefix"] not in SYSTEM_PREFIXES:
+                    yield prefix["Prefix"][:-1]
+
+    def _iter_objects(self, prefix):
+        paginator = s3_service.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=Config.S3_BUCKET, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["Size"], obj["LastModified"], obj.get("ETag", "").strip('"')
+
+    def _iter_rows(self, user_id):
+        key = StoredFile.key.collate("C") if db.engine.dialect.name == "postgresql" else StoredFile.key
+        query = (db.session.query(StoredFile.key, StoredFile.size, StoredFile.created_at)
+                 .filter(StoredFile.user_id == user_id)
+                 .order_by(key)
+                 .execution_options(yield_per=1000))
+        for row in query:
+            yield row.key, (row.size, row.created_at)
+
+    def _reconcile_user(self, user_id, started, counts):
+        try:
+            # Lock the totals first so a concurrent upload's adjustment lands after the rebuild
+            db.session.query(UserStorage).filter_by(user_id=user_id).with_for_update().first()
+            for key, obj, rows in merge_join(self._iter_objects(f"{user_id}/"), self._iter_rows(user_id)):
+                if obj is None:
+                    size, created_at = rows[0]
+                    if created_at < started: # A row newer than the listing may be an upload in progress
+                        db.session.execute(delete(StoredFile).where(StoredFile.key == key))
+                        counts["removed"] += 1
+                    continue
+                size, last_modified, etag = obj
+                if not rows:
+                    db.session.execute(_insert(StoredFile).values(
+                        key=key, user_id=user_id, name=display_name(key), size=size, etag=etag,
+                        created_at=_naive_utc(last_modified)
+                    ).on_conflict_do_nothing())
+                    counts["added"] += 1
+                elif rows[0][0] != size:
+                    db.session.execute(StoredFile.__table__.update().where(StoredFile.key == key)
+                                       .values(size=size, etag=etag, created_at=_naive_utc(last_modified)))
+                    counts["updated"] += 1
+
+            # Uploads now indexed are counted in the totals below: settle their reservations
+            db.session.execute(delete(UploadReservation).where(
+                UploadReservation.user_id == user_id,
+                UploadReservation.key.in_(db.session.query(StoredFile.key).filter(StoredFile.user_id == user_id))
+            ))
+            total_bytes, total_objects = (db.session.query(func.coalesce(func.sum(StoredFile.size), 0), func.count())
+                                          .filter(StoredFile.user_id == user_id).one())
+            db.session.execute(_insert(UserStorage).values(
+                user_id=user_id, bytes=total_bytes, objects=total_objects
+            ).on_conflict_do_update(
+                index_elements=[UserStorage.user_id], set_={"bytes": total_bytes, "objects": total_objects}
+            ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+file_index = FileIndex()
@@ -0,0 +1,48 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps_compact(obj):
+    """JSON text without whitespace, for JSON columns (PostgreSQL `json` stores the text as given)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass # e.g. integers over 64 bits; the stdlib handles those
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def loads(s):
+    return orjson.loads(s) if orjson is not None else json.loads(s)
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson: request bodies and jsonify()
+    responses are parsed/serialized in C. Output matches the default
+    provider's compact form (sorted keys, datetimes as HTTP dates via
+    `default`), except non-ASCII text is sent as UTF-8 instead of escaped.
+    Falls back to the stdlib for options orjson has no equivalent for
+    (e.g. indent in debug mode) or when orjson is not installed.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.keys() - {"separators"}:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
@@ -0,0 +1,43 @@
+import threading
+
+
+class LogNotifier:
+    """
+    Wakes log stream subscribers in this process when a stream grows.
+    Subscribers on other workers fall back to polling the end offset,
+    so a missed notification only delays delivery, never loses data.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = {} # (device_id, log_type) -> [Condition, end_offset, waiters]
+
+    def notify(self, device_id, log_type, end_offset):
+        with self._lock:
+            entry = self._streams.get((device_id, log_type))
+        if entry is None:
+            return
+        with entry[0]:
+            entry[1] = max(entry[1], end_offset)
+            entry[0].notify_all()
+
+    def wait(self, device_id, log_type, known_end, timeout):
+        """Blocks until the stream passes `known_end` or `timeout` elapses. Returns True if it grew."""
+        key = (device_id, log_type)
+        with self._lock:
+            entry = self._streams.setdefault(key, [threading.Condition(), known_end, 0])
+            entry[2] += 1
+        try:
+            with entry[0]:
+                if entry[1] > known_end:
+                    return True
+                entry[0].wait(timeout)
+                return entry[1] > known_end
+        finally:
+            with self._lock:
+                entry[2] -= 1
+                if entry[2] == 0:
+                    self._streams.pop(key, None)
+
+
+log_notifier = LogNotifier()
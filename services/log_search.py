@@ -0,0 +1,115 @@
+import re
+import html
+import base64
+from datetime import datetime
+from sqlalchemy import func, literal_column, or_, and_
+from config import Config
+from models import db, Device, DeviceLogSearchDoc
+
+# ts_headline markers; swapped for <mark> after the snippet is HTML-escaped
+_START, _STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = f"StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=25, MinWords=8, FragmentDelimiter=\" … \""
+
+
+def _searchable(text):
+    # PostgreSQL text cannot hold NUL; very long documents exceed tsvector limits
+    return text.replace("\x00", "")[:Config.LOG_SEARCH_MAX_CHARS]
+
+
+def _device_type(device_id):
+    return db.session.query(Device.device_type).filter_by(device_id=device_id).scalar()
+
+
+def index_segment(segment, content):
+    """Adds the search document for a new log segment to the current session."""
+    db.session.add(DeviceLogSearchDoc(
+        segment_id=segment.id,
+        device_id=segment.device_id,
+        device_type=_device_type(segment.device_id),
+        log_type=segment.log_type,
+        start_offset=segment.start_offset,
+        content=_searchable(content.decode("utf-8", errors="replace")),
+        created_at=segment.created_at or datetime.utcnow()
+    ))
+
+
+def index_snapshot(log_entry):
+    """Creates or refreshes the search document for a legacy DeviceLog row."""
+    doc = DeviceLogSearchDoc.query.filter_by(log_id=log_entry.id).first()
+    if doc is None:
+        doc = DeviceLogSearchDoc(log_id=log_entry.id, device_id=log_entry.device_id, log_type=log_entry.log_type)
+        db.session.add(doc)
+    doc.device_type = _device_type(log_entry.device_id)
+    doc.content = _searchable(log_entry.log_content or "")
+    doc.created_at = log_entry.created_at or datetime.utcnow()
+
+
+def encode_cursor(created_at, doc_id):
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{doc_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    created_at, doc_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    return datetime.fromisoformat(created_at), doc_id
+
+
+def _highlight(snippet):
+    return html.escape(snippet).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _fallback_snippet(content, q, width=80):
+    # Non-PostgreSQL databases (tests, local SQLite): plain substring match
+    match = re.search(re.escape(q), content, re.IGNORECASE)
+    if not match:
+        return content[:width]
+    start = max(match.start() - width // 2, 0)
+    end = min(match.end() + width // 2, len(content))
+    return (content[start:match.start()] + _START + match.group(0) + _STOP + content[match.end():end])
+
+
+def search(q, device_type=None, log_type=None, since=None, until=None, limit=20, cursor=None):
+    """
+    Newest-first search over device logs with keyset pagination.
+    Returns (results, next_cursor).
+    """
+    is_postgres = db.engine.dialect.name == "postgresql"
+    Doc = DeviceLogSearchDoc
+
+    columns = [Doc.id, Doc.segment_id, Doc.device_id, Doc.device_type, Doc.log_type, Doc.start_offset, Doc.created_at]
+    if is_postgres:
+        tsquery = func.websearch_to_tsquery('simple', q)
+        query = db.session.query(*columns, func.ts_headline('simple', Doc.content, tsquery, HEADLINE_OPTIONS).label("snippet"))
+        query = query.filter(literal_column("device_log_search_docs.search_vector").op("@@")(tsquery))
+    else:
+        query = db.session.query(*columns, Doc.content.label("snippet"))
+        escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(Doc.content.ilike(f"%{escaped}%", escape="\\"))
+
+    if device_type:
+        query = query.filter(Doc.device_type == device_type)
+    if log_type:
+        query = query.filter(Doc.log_type == log_type)
+    if since:
+        query = query.filter(Doc.created_at >= since)
+    if until:
+        query = query.filter(Doc.created_at < until)
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = query.filter(or_(Doc.created_at < created_at, and_(Doc.created_at == created_at, Doc.id < doc_id)))
+
+    rows = query.order_by(Doc.created_at.desc(), Doc.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+
+    results = []
+    for row in rows[:limit]:
+        snippet = row.snippet if is_postgres else _fallback_snippet(row.snippet or "", q)
+        results.append({
+            "device_id": row.device_id,
+            "device_type": row.device_type,
+            "type": row.log_type,
+            "source": "stream" if row.segment_id else "snapshot",
+            "offset": row.start_offset,
+            "created_at": row.created_at.isoformat(),
+            "snippet": _highlight(snippet or "")
+        })
+    return results, next_cursor
@@ -0,0 +1,291 @@
+import gzip
+import uuid
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from config import Config
+from models import db, DeviceLogSegment, DeviceLogSearchDoc, DeviceLogStream
+from services.s3_service import s3_service
+from services.log_events import log_notifier
+from services.log_search import index_segment
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger("seaweed-flask")
+
+EXTENSIONS = {"gzip": "gz", "zstd": "zst"}
+
+
+class LogOffsetError(Exception):
+    """A chunk started past the end of the stored stream (the device must resend from expected_offset)."""
+
+    def __init__(self, expected_offset):
+        super().__init__(f"Expected offset {expected_offset}")
+        self.expected_offset = expected_offset
+
+
+def compress(data, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class LogStore:
+    """
+    Append-only device log streams, one per (device_id, log_type).
+
+    Devices send chunks with the byte offset they start at. Re-sent bytes are
+    dropped, so retries are idempotent, and a chunk that would leave a gap is
+    rejected with the offset the server expects next.
+    """
+
+    def __init__(self, encoding=None):
+        encoding = encoding or Config.LOG_COMPRESSION
+        if encoding == "zstd" and zstandard is None:
+            logger.warning("zstandard not installed, falling back to gzip for device logs")
+            encoding = "gzip"
+        self.encoding = encoding
+
+    def _stream(self, device_id, log_type):
+        return DeviceLogSegment.query.filter_by(device_id=device_id, log_type=log_type)
+
+    def end_offset(self, device_id, log_type):
+        last = (self._stream(device_id, log_type)
+                .with_entities(DeviceLogSegment.start_offset, DeviceLogSegment.length)
+                .order_by(DeviceLogSegment.start_offset.desc())
+                .first())
+        if last:
+            return last.start_offset + last.length
+        # Every segment expired: resume from the offset retention recorded
+        expired = db.session.get(DeviceLogStream, (device_id, log_type))
+        return expired.end_offset if expired else 0
+
+    def start_offset(self, device_id, log_type):
+        """First byte still retained (older segments may have been expired)."""
+        first = (self._stream(device_id, log_type)
+                 .with_entities(DeviceLogSegment.start_offset)
+                 .order_by(DeviceLogSegment.start_offset)
+                 .limit(1)
+                 .scalar())
+        if first is None:
+            return self.end_offset(device_id, log_type)
+        return first
+
+    def append(self, device_id, log_type, offset, content, index=True):
+        """
+        Stores `content` (bytes) starting at `offset`. Returns the new end offset.
+        index=False skips the search document, for text that already has one.
+        """
+        end = self.end_offset(device_id, log_type)
+        if offset > end:
+            raise LogOffsetError(end)
+        if offset < end:
+            # Overlap with what we already have (e.g. a retried upload)
+            content = content[end - offset:]
+            offset = end
+        if not content:
+            return end
+
+        segment = self._build_segment(device_id, log_type, offset, content)
+        db.session.add(segment)
+        if index:
+            index_segment(segment, content)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent upload for the same offset
+            db.session.rollback()
+            self.delete_objects([segment.s3_key])
+            current = self.end_offset(device_id, log_type)
+            if current > offset:
+                raise LogOffsetError(current)
+            raise
+
+        log_notifier.notify(device_id, log_type, offset + len(content))
+        return offset + len(content)
+
+    def _build_segment(self, device_id, log_type, offset, content):
+        blob = compress(content, self.encoding)
+        segment = DeviceLogSegment(
+            id=str(uuid.uuid4()),
+            device_id=device_id,
+            log_type=log_type,
+            start_offset=offset,
+            length=len(content),
+            encoding=self.encoding,
+            stored_size=len(blob),
+            created_at=datetime.utcnow()
+        )
+        if len(blob) > Config.LOG_INLINE_MAX_BYTES:
+            segment.s3_key = f"logs/{device_id}/{log_type}/{offset:020d}-{segment.id}.{EXTENSIONS[self.encoding]}"
+            s3_service.put_bytes(segment.s3_key, blob)
+        else:
+            segment.data = blob
+        return segment
+
+    def _load(self, segment):
+        blob = segment.data if segment.s3_key is None else s3_service.get_bytes(segment.s3_key)
+        return decompress(blob, segment.encoding)
+
+    def read_range(self, device_id, log_type, offset=0, length=None):
+        """
+        Yields the stream's bytes from `offset` (up to `length` bytes), one
+        segment at a time, so only a single segment is ever held in memory.
+        """
+        stop = offset + length if length is not None else None
+
+        # Seek to the segment containing `offset` via the (device_id, log_type, start_offset) index
+        first = (self._stream(device_id, log_type)
+                 .with_entities(DeviceLogSegment.start_offset)
+                 .filter(DeviceLogSegment.start_offset <= offset)
+                 .order_by(DeviceLogSegment.start_offset.desc())
+                 .limit(1)
+                 .scalar()) or 0
+
+        query = self._stream(device_id, log_type).filter(DeviceLogSegment.start_offset >= first)
+        if stop is not None:
+            query = query.filter(DeviceLogSegment.start_offset < stop)
+
+        for segment in query.order_by(DeviceLogSegment.start_offset).yield_per(16):
+            lo = max(offset - segment.start_offset, 0)
+            hi = segment.length if stop is None else min(stop - segment.start_offset, segment.length)
+            if lo < hi:
+                yield self._load(segment)[lo:hi]
+
+    def apply_retention(self, days=None, batch_size=1000):
+        """Deletes segments older than `days` (LOG_RETENTION_DAYS). Returns the number removed."""
+        cutoff = datetime.utcnow() - timedelta(days=days if days is not None else Config.LOG_RETENTION_DAYS)
+        removed = 0
+        while True:
+            batch = (DeviceLogSegment.query
+                     .with_entities(DeviceLogSegment.id, DeviceLogSegment.s3_key, DeviceLogSegment.device_id,
+                                    DeviceLogSegment.log_type, DeviceLogSegment.start_offset, DeviceLogSegment.length)
+                     .filter(DeviceLogSegment.created_at < cutoff)
+                     .limit(batch_size)
+                     .all())
+            if not batch:
+                return removed
+
+            ends = {}
+            for row in batch:
+                stream = (row.device_id, row.log_type)
+                ends[stream] = max(ends.get(stream, 0), row.start_offset + row.length)
+            for (device_id, log_type), end in ends.items():
+                self._record_end(device_id, log_type, end)
+
+            ids = [row.id for row in batch]
+            DeviceLogSearchDoc.query.filter(DeviceLogSearchDoc.segment_id.in_(ids)).delete(synchronize_session=False)
+            DeviceLogSegment.query.filter(DeviceLogSegment.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            self.delete_objects([row.s3_key for row in batch])
+            removed += len(batch)
+
+    def _record_end(self, device_id, log_type, end):
+        # Raises the stream's recorded end offset to `end`; never lowers it
+        stmt = (postgresql if db.engine.dialect.name == "postgresql" else sqlite).insert(DeviceLogStream).values(
+            device_id=device_id, log_type=log_type, end_offset=end)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[DeviceLogStream.device_id, DeviceLogStream.log_type],
+            set_={"end_offset": case((DeviceLogStream.end_offset < end, end), else_=DeviceLogStream.end_offset)}
+        ))
+
+    def compact(self, device_id, log_type, target_bytes=None):
+        """
+        Merges runs of adjacent small inline segments into segments of about
+        `target_bytes` uncompressed. Returns the number of segments removed.
+        """
+        target_bytes = target_bytes or Config.LOG_COMPACT_TARGET_BYTES
+        candidates = (self._stream(device_id, log_type)
+                      .with_entities(DeviceLogSegment.id, DeviceLogSegment.start_offset, DeviceLogSegment.length)
+                      .filter(DeviceLogSegment.s3_key.is_(None), DeviceLogSegment.length < target_bytes)
+                      .order_by(DeviceLogSegment.start_offset)
+                      .all())
+
+        removed = 0
+        run, run_bytes = [], 0
+        for row in candidates + [None]:
+            contiguous = row is not None and run and row.start_offset == run[-1].start_offset + run[-1].length
+            if run and not (contiguous and run_bytes + row.length <= target_bytes):
+                removed += self._merge(device_id, log_type, run)
+                run, run_bytes = [], 0
+            if row is not None:
+                run.append(row)
+                run_bytes += row.length
+        return removed
+
+    def _merge(self, device_id, log_type, run):
+        if len(run) < 2:
+            return 0
+        segments = (DeviceLogSegment.query
+                    .filter(DeviceLogSegment.id.in_([row.id for row in run]))
+                    .order_by(DeviceLogSegment.start_offset)
+                    .all())
+        content = b"".join(self._load(segment) for segment in segments)
+        newest = max(segment.created_at for segment in segments)
+
+        # Search documents survive the merge: detach them, then point them at the new segment
+        ids = [segment.id for segment in segments]
+        doc_ids = [doc_id for (doc_id,) in DeviceLogSearchDoc.query.with_entities(DeviceLogSearchDoc.id)
+                   .filter(DeviceLogSearchDoc.segment_id.in_(ids))]
+        if doc_ids:
+            DeviceLogSearchDoc.query.filter(DeviceLogSearchDoc.id.in_(doc_ids)).update(
+                {"segment_id": None}, synchronize_session=False)
+
+        for segment in segments:
+            db.session.delete(segment)
+        db.session.flush()
+
+        merged = self._build_segment(device_id, log_type, run[0].start_offset, content)
+        merged.created_at = newest # Retention keeps the merged segment as long as its newest part
+        db.session.add(merged)
+        db.session.flush()
+        if doc_ids:
+            DeviceLogSearchDoc.query.filter(DeviceLogSearchDoc.id.in_(doc_ids)).update(
+                {"segment_id": merged.id}, synchronize_session=False)
+        db.session.commit()
+        return len(segments) - 1
+
+    def compact_all(self, target_bytes=None, min_segments=8):
+        """Compacts every stream with at least `min_segments` small inline segments."""
+        target_bytes = target_bytes or Config.LOG_COMPACT_TARGET_BYTES
+        streams = (DeviceLogSegment.query
+                   .with_entities(DeviceLogSegment.device_id, DeviceLogSegment.log_type)
+                   .filter(DeviceLogSegment.s3_key.is_(None), DeviceLogSegment.length < target_bytes)
+                   .group_by(DeviceLogSegment.device_id, DeviceLogSegment.log_type)
+                   .having(func.count() >= min_segments)
+                   .all())
+        return sum(self.compact(device_id, log_type, target_bytes) for device_id, log_type in streams)
+
+    def delete_for_device(self, device_id):
+        """
+        Deletes every log segment, search document (snapshot ones included) and
+        recorded stream end of `device_id` and returns the segments' S3 keys.
+        The caller commits, then passes the keys to delete_objects().
+        """
+        segments = DeviceLogSegment.query.filter(DeviceLogSegment.device_id == device_id)
+        keys = [key for (key,) in segments.with_entities(DeviceLogSegment.s3_key).filter(DeviceLogSegment.s3_key.isnot(None))]
+        DeviceLogSearchDoc.query.filter(DeviceLogSearchDoc.device_id == device_id).delete(synchronize_session=False)
+        segments.delete(synchronize_session=False)
+        DeviceLogStream.query.filter(DeviceLogStream.device_id == device_id).delete(synchronize_session=False)
+        db.session.flush()
+        return keys
+
+    def delete_objects(self, keys):
+        # Batched DeleteObjects; failures are logged and the objects left for a later sweep
+        for key, error in s3_service.delete_files(keys).items():
+            if error:
+                logger.error(f"Failed to delete log segment object {key}: {error}")
+
+
+log_store = LogStore()
@@ -0,0 +1,91 @@
+import json
+import base64
+from urllib.parse import urlencode
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+from config import Config
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    payload = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in payload]
+    except (ValueError, TypeError, KeyError):
+        raise PaginationError("Invalid cursor")
+
+
+def page_args(sort_options, default_sort):
+    """
+    Reads ?limit=, ?cursor= and ?sort= (a key of `sort_options`, optionally
+    prefixed with '-' for descending). Raises PaginationError on bad input.
+    """
+    try:
+        limit = int(request.args.get("limit", Config.PAGE_DEFAULT_LIMIT))
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    limit = min(max(limit, 1), Config.PAGE_MAX_LIMIT)
+
+    sort = request.args.get("sort", default_sort)
+    descending = sort.startswith("-")
+    if sort.lstrip("-") not in sort_options:
+        raise PaginationError(f"sort must be one of {', '.join(sorted(sort_options))} (prefix '-' for descending)")
+
+    cursor = request.args.get("cursor")
+    return limit, sort_options[sort.lstrip("-")], descending, decode_cursor(cursor) if cursor else None
+
+
+def keyset_page(query, sort_column, key_column, descending=False, limit=None, cursor=None):
+    """
+    One page of `query` ordered by (sort_column, key_column), resuming after
+    `cursor`. NULL sort values come last in either direction. Returns
+    (rows, next_cursor); next_cursor is None on the last page.
+
+    Rows must expose `sort_column` and `key_column` as attributes of the same
+    name (entities or with_entities() rows).
+    """
+    limit = limit or Config.PAGE_DEFAULT_LIMIT
+    same_column = sort_column is key_column
+
+    if cursor is not None:
+        value, key = (cursor[0], cursor[0]) if same_column else cursor
+        after_key = key_column < key if descending else key_column > key
+        if same_column:
+            query = query.filter(after_key)
+        elif value is None:
+            query = query.filter(sort_column.is_(None), after_key)
+        else:
+            after_value = sort_column < value if descending else sort_column > value
+            query = query.filter(or_(after_value, and_(sort_column == value, after_key), sort_column.is_(None)))
+
+    order = []
+    if not same_column:
+        order.append((sort_column.desc() if descending else sort_column.asc()).nulls_last())
+    order.append(key_column.desc() if descending else key_column.asc())
+
+    rows = query.order_by(*order).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    last = rows[limit - 1]
+    values = [getattr(last, key_column.key)] if same_column else \
+        [getattr(last, sort_column.key), getattr(last, key_column.key)]
+    return rows[:limit], encode_cursor(values)
+
+
+def page_headers(next_cursor):
+    """X-Next-Cursor plus an RFC 8288 Link header for the next page (bodies stay plain arrays)."""
+    if not next_cursor:
+        return {}
+    args = request.args.to_dict()
+    args["cursor"] = next_cursor
+    return {"X-Next-Cursor": next_cursor, "Link": f'<{request.base_url}?{urlencode(args)}>; rel="next"'}
@@ -0,0 +1,132 @@
+import time
+import logging
+import threading
+from config import Config
+from models import db, AllowedUploader
+
+logger = logging.getLogger("seaweed-flask")
+
+INVALIDATE_CHANNEL = "permissions:invalidate"
+DEVICE_MESSAGE_PREFIX = "device:" # Followed by the device_id whose owner changed
+
+
+class PermissionService:
+    """
+    Role checks for the management API, answered from memory.
+
+    The uploader set is loaded once and reloaded after invalidate() (called
+    when uploaders are added or removed) or after PERMISSIONS_CACHE_TTL_SECONDS.
+    With Redis, invalidations are published so every worker drops its copy;
+    the TTL bounds staleness if a message is ever missed.
+
+    Device ownership changes (bind, unbind, delete) go out on the same
+    channel, to the listeners registered with on_device_owner_changed().
+    """
+
+    def __init__(self, redis_client=None, ttl_seconds=None, super_admin_id=None):
+        self.redis = redis_client
+        self.ttl = ttl_seconds if ttl_seconds is not None else Config.PERMISSIONS_CACHE_TTL_SECONDS
+        self.super_admin_id = str(super_admin_id if super_admin_id is not None else Config.SUPER_ADMIN_ID or "") or None
+        self._lock = threading.Lock()
+        self._uploaders = None
+        self._loaded_at = 0.0
+        self._generation = 0 # Bumped by invalidate(); a load that raced with one is discarded
+        self._listener = None
+        self._device_listeners = []
+
+    def is_super_admin(self, user_id):
+        return self.super_admin_id is not None and str(user_id) == self.super_admin_id
+
+    def is_uploader(self, user_id):
+        return self.is_super_admin(user_id) or str(user_id) in self._uploader_ids()
+
+    def _uploader_ids(self):
+        self._ensure_listener()
+        uploaders = self._uploaders
+        if uploaders is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return uploaders
+
+        with self._lock:
+            if self._uploaders is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._uploaders
+            generation = self._generation
+            uploaders = frozenset(str(user_id) for (user_id,) in db.session.query(AllowedUploader.user_id))
+            if generation == self._generation:
+                self._uploaders = uploaders
+                self._loaded_at = time.monotonic()
+            return uploaders
+
+    def invalidate(self, publish=True):
+        """Drops the cached uploader set here and, with Redis, in every other worker."""
+        self._drop()
+        if publish and self.redis is not None:
+            try:
+                self.redis.publish(INVALIDATE_CHANNEL, "uploaders")
+            except Exception as e:
+                logger.error(f"Failed to publish permission invalidation: {e}")
+
+    def on_device_owner_changed(self, listener):
+        """Calls listener(device_id) in this worker whenever a device's owner changes in any worker."""
+        self._device_listeners.append(listener)
+
+    def device_owner_changed(self, device_id, publish=True):
+        """Tells the listeners here and, with Redis, in every other worker."""
+        self._device_changed(device_id)
+        if publish and self.redis is not None:
+            try:
+                self.redis.publish(INVALIDATE_CHANNEL, f"{DEVICE_MESSAGE_PREFIX}{device_id}")
+            except Exception as e:
+                logger.error(f"Failed to publish device owner change: {e}")
+
+    def listen(self):
+        """Starts the invalidation listener (with Redis) if it is not running yet."""
+        self._ensure_listener()
+
+    def _device_changed(self, device_id):
+        for listener in self._device_listeners:
+            try:
+                listener(device_id)
+            except Exception as e:
+                logger.error(f"Device owner change listener failed for {device_id}: {e}")
+
+    def _drop(self):
+        with self._lock:
+            self._generation += 1
+            self._uploaders = None
+
+    def _ensure_listener(self):
+        if self.redis is None or self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="permissions-invalidation", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATE_CHANNEL)
+                # Anything may have changed while we were not subscribed
+                self._drop()
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    if message["data"].startswith(DEVICE_MESSAGE_PREFIX):
+                        self._device_changed(message["data"][len(DEVICE_MESSAGE_PREFIX):])
+                    else:
+                        self._drop()
+            except Exception as e:
+                logger.error(f"Permission invalidation listener failed, resubscribing: {e}")
+                time.sleep(1)
+
+
+def create_permission_service(redis_url=None):
+    if not redis_url:
+        return PermissionService()
+    # Optional dependency, as for the socket registry
+    import redis
+    return PermissionService(redis.Redis.from_url(redis_url, decode_responses=True))
+
+
+permissions = create_permission_service(Config.REDIS_URL)
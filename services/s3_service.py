@@ -1,54 +1,111 @@
 import uuid
 import logging
-import boto3
-from botocore.config import Config as BotoConfig
-from botocore.exceptions import ClientError
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from config import Config
 
 logger = logging.getLogger("seaweed-flask")
 
+DELETE_BATCH_SIZE = 1000 # DeleteObjects maximum
+UPLOAD_URL_EXPIRES_SECONDS = 900 # Presigned PUT lifetime; quota reservations expire with it
+
+
+def _client(endpoint_url, **boto_config):
+    # boto3 is imported on first use: it is slow to import and not needed to boot
+    import boto3
+    from botocore.config import Config as BotoConfig
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=Config.AWS_ACCESS_KEY,
+        aws_secret_access_key=Config.AWS_SECRET_KEY,
+        region_name=Config.AWS_REGION,
+        verify=False,
+        config=BotoConfig(s3={"addressing_style": "path"}, signature_version="s3v4", **boto_config),
+    )
+
+
 class S3Service:
+    """
+    Clients are built on first use, not at import, so booting a worker,
+    collecting tests or running migrations never waits on S3. The bucket is
+    checked (and created if missing) the first time the client is needed.
+    """
+
     def __init__(self):
-        try:
-            self.s3 = boto3.client(
-                "s3",
-                endpoint_url=Config.S3_ENDPOINT,
-                aws_access_key_id=Config.AWS_ACCESS_KEY,
-                aws_secret_access_key=Config.AWS_SECRET_KEY,
-                region_name=Config.AWS_REGION,
-                verify=False,
-                config=BotoConfig(
-                    s3={"addressing_style": "path"},
-                    signature_version="s3v4",
-                    retries={'max_attempts': 5, 'mode': 'standard'}
-                ),
-            )
-            self.ensure_bucket()
-        except Exception as e:
-            logger.error(f"Critical error during S3 client initialization: {e}")
-            # We don't raise here to allow the app to start and log the error.
-            # Subsequent requests will fail with a clearer error message.
-            self.s3 = None
+        self._lock = threading.Lock()
+        self._s3 = None
+        self._signing_client = None
+        self._probe_client = None
+        self._bucket_checked = False
 
-    def ensure_bucket(self):
-        if not self.s3:
+    @property
+    def s3(self):
+        if self._s3 is not None and self._bucket_checked:
+            return self._s3
+        with self._lock:
+            if self._s3 is None:
+                try:
+                    self._s3 = _client(
+                        Config.S3_ENDPOINT,
+                        connect_timeout=Config.S3_CONNECT_TIMEOUT_SECONDS,
+                        retries={'max_attempts': 5, 'mode': 'standard'}
+                    )
+                except Exception as e:
+                    logger.error(f"Critical error during S3 client initialization: {e}")
+                    # Callers fail with "S3 client not initialized"; the next use retries
+                    return None
+            if not self._bucket_checked:
+                self._bucket_checked = True
+                self.ensure_bucket(self._s3)
+            return self._s3
+
+    @property
+    def signing_client(self):
+        # Presigned URLs are signed for the public host (see generate_presigned_upload)
+        if self._signing_client is None:
+            public_url_parsed = urlparse(Config.PUBLIC_S3_URL)
+            self._signing_client = _client(f"{public_url_parsed.scheme}://{public_url_parsed.netloc}")
+        return self._signing_client
+
+    def ensure_bucket(self, client=None):
+        """Creates the bucket if it is missing. Returns True once it is known to exist."""
+        client = client or self.s3
+        if not client:
             logger.error("Cannot ensure bucket: S3 client not initialized")
-            return
+            return False
 
+        from botocore.exceptions import ClientError
         try:
-            self.s3.head_bucket(Bucket=Config.S3_BUCKET)
+            client.head_bucket(Bucket=Config.S3_BUCKET)
+            return True
         except ClientError as e:
             error_code = e.response.get('Error', {}).get('Code')
             if error_code == '404' or error_code == 'NoSuchBucket':
                 logger.info("Creating bucket %s", Config.S3_BUCKET)
                 try:
-                    self.s3.create_bucket(Bucket=Config.S3_BUCKET)
+                    client.create_bucket(Bucket=Config.S3_BUCKET)
+                    return True
                 except Exception as create_e:
                     logger.error(f"Failed to create bucket: {create_e}")
             else:
                 logger.error(f"Error checking bucket: {e}")
         except Exception as e:
-            logger.error(f"Unexpected error connecting to S3 during startup: {e}")
+            logger.error(f"Unexpected error connecting to S3: {e}")
+        return False
+
+    def check(self):
+        """
+        Readiness probe: one HEAD on the bucket with short timeouts and no
+        retries, so a slow S3 reports unready instead of hanging the probe.
+        Raises on failure.
+        """
+        if self._probe_client is None:
+            timeout = Config.HEALTH_CHECK_TIMEOUT_SECONDS
+            self._probe_client = _client(Config.S3_ENDPOINT, connect_timeout=timeout, read_timeout=timeout,
+                                         retries={'max_attempts': 1, 'mode': 'standard'})
+        self._probe_client.head_bucket(Bucket=Config.S3_BUCKET)
 
     def build_key(self, user_id: str, filename: str) -> str:
         return f"{user_id}/{uuid.uuid4().hex}_{filename}"
@@ -64,7 +121,7 @@ class S3Service:
     def public_url(self, key: str) -> str:
         return f"{Config.PUBLIC_S3_URL}/{Config.S3_BUCKET}/{key}"
 
-    def generate_presigned_upload(self, user_id, filename, content_type, device_type=None, version=None):
+    def generate_presigned_upload(self, user_id, filename, content_type, device_type=None, version=None, content_length=None):
         if not self.s3:
             raise Exception("S3 client not initialized")
         
@@ -80,36 +137,29 @@ class S3Service:
             # but preserve the path structure that the backend S3 expects (/bucket/key).
             
             # Extract host from PUBLIC_S3_URL
-            from urllib.parse import urlparse
             public_url_parsed = urlparse(Config.PUBLIC_S3_URL) # e.g. https://api.robogenic.site/s3
             public_host = f"{public_url_parsed.scheme}://{public_url_parsed.netloc}" # https://api.robogenic.site
-            
-            # Create a temporary client bound to the public host for signing
-            # We disable SSL verify because internal->external loopback might have cert issues, 
-            # and we only need the string generation, not actual connection.
-            signing_client = boto3.client(
-                "s3",
-                endpoint_url=public_host,
-                aws_access_key_id=Config.AWS_ACCESS_KEY,
-                aws_secret_access_key=Config.AWS_SECRET_KEY,
-                region_name=Config.AWS_REGION,
-                verify=False,
-                config=BotoConfig(
-                    s3={"addressing_style": "path"},
-                    signature_version="s3v4"
-                ),
-            )
+
+            # The signing client is bound to the public host. SSL verify is disabled because
+            # internal->external loopback might have cert issues, and we only need the string
+            # generation, not actual connection.
+            signing_client = self.signing_client
+
+            params = {
+                "Bucket": Config.S3_BUCKET,
+                "Key": key,
+                "ContentType": content_type,
+            }
+            if content_length is not None:
+                # Signed, so the PUT must carry exactly the size the quota was checked against
+                params["ContentLength"] = content_length
 
             # Generate URL where Path is /bucket/key (standard boto3 behavior with path addressing)
             # Host will be api.robogenic.site
             upload_url = signing_client.generate_presigned_url(
                 "put_object",
-                Params={
-                    "Bucket": Config.S3_BUCKET,
-                    "Key": key,
-                    "ContentType": content_type,
-                },
-                ExpiresIn=900,
+                Params=params,
+                ExpiresIn=UPLOAD_URL_EXPIRES_SECONDS,
             )
             
             # Now, if our public URL has a path prefix (like /s3) that Nginx strips before forwarding,
@@ -156,22 +206,9 @@ class S3Service:
     def generate_presigned_download(self, key):
         try:
             # Similar fix for download URLs to match Host header
-            from urllib.parse import urlparse
             public_url_parsed = urlparse(Config.PUBLIC_S3_URL)
             public_host = f"{public_url_parsed.scheme}://{public_url_parsed.netloc}"
-
-            signing_client = boto3.client(
-                "s3",
-                endpoint_url=public_host,
-                aws_access_key_id=Config.AWS_ACCESS_KEY,
-                aws_secret_access_key=Config.AWS_SECRET_KEY,
-                region_name=Config.AWS_REGION,
-                verify=False,
-                config=BotoConfig(
-                    s3={"addressing_style": "path"},
-                    signature_version="s3v4"
-                ),
-            )
+            signing_client = self.signing_client
 
             url = signing_client.generate_presigned_url(
                 "get_object",
@@ -188,6 +225,44 @@ class S3Service:
             logger.error(f"Error generating download URL: {e}")
             raise
 
+    def put_bytes(self, key, data, content_type="application/octet-stream"):
+        if not self.s3:
+            raise Exception("S3 client not initialized")
+        try:
+            self.s3.put_object(Bucket=Config.S3_BUCKET, Key=key, Body=data, ContentType=content_type)
+        except Exception as e:
+            logger.error(f"Error uploading object {key}: {e}")
+            raise
+
+    def get_bytes(self, key):
+        if not self.s3:
+            raise Exception("S3 client not initialized")
+        try:
+            return self.s3.get_object(Bucket=Config.S3_BUCKET, Key=key)["Body"].read()
+        except Exception as e:
+            logger.error(f"Error reading object {key}: {e}")
+            raise
+
+    def download_to(self, key, fileobj):
+        """Streams an object into a writable file object (multi-part, ranged GETs for large objects)."""
+        if not self.s3:
+            raise Exception("S3 client not initialized")
+        try:
+            self.s3.download_fileobj(Config.S3_BUCKET, key, fileobj)
+        except Exception as e:
+            logger.error(f"Error downloading object {key}: {e}")
+            raise
+
+    def head(self, key):
+        """Size, etag, content type and last modified time of an object, without fetching it."""
+        resp = self.s3.head_object(Bucket=Config.S3_BUCKET, Key=key)
+        return {
+            "size": resp["ContentLength"],
+            "etag": resp.get("ETag", "").strip('"'),
+            "content_type": resp.get("ContentType"),
+            "last_modified": resp["LastModified"]
+        }
+
     def delete_file(self, key):
         if not self.s3:
             raise Exception("S3 client not initialized")
@@ -197,4 +272,52 @@ class S3Service:
             logger.error(f"Error deleting file: {e}")
             raise
 
+    def delete_files(self, keys):
+        """
+        Deletes many keys with DeleteObjects, DELETE_BATCH_SIZE keys per call and
+        up to S3_DELETE_CONCURRENCY calls in flight. Returns {key: None} for
+        deleted keys and {key: "error message"} for the rest; never raises.
+        """
+        keys = list(dict.fromkeys(k for k in keys if k))
+        if not keys:
+            return {}
+        if not self.s3:
+            return {key: "S3 client not initialized" for key in keys}
+
+        batches = [keys[i:i + DELETE_BATCH_SIZE] for i in range(0, len(keys), DELETE_BATCH_SIZE)]
+        results = {}
+        workers = min(Config.S3_DELETE_CONCURRENCY, len(batches))
+        if workers <= 1:
+            for batch in batches:
+                results.update(self._delete_batch(batch))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for batch_results in pool.map(self._delete_batch, batches):
+                    results.update(batch_results)
+        return results
+
+    def _delete_batch(self, keys):
+        results = dict.fromkeys(keys)
+        try:
+            # Quiet mode: the response lists only the keys that failed
+            resp = self.s3.delete_objects(
+                Bucket=Config.S3_BUCKET,
+                Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+            )
+        except Exception as e:
+            logger.error(f"Error deleting {len(keys)} objects: {e}")
+            return {key: str(e) for key in keys}
+        for error in resp.get("Errors", []):
+            results[error["Key"]] = error.get("Message") or error.get("Code") or "Delete failed"
+        return results
+
+    def iter_keys(self, prefix):
+        """All keys under `prefix`, one listing page at a time."""
+        if not self.s3:
+            raise Exception("S3 client not initialized")
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=Config.S3_BUCKET, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
 s3_service = S3Service()
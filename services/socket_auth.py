@@ -0,0 +1,136 @@
+import time
+import threading
+import logging
+from flask_socketio import ConnectionRefusedError
+from models import db, Device
+from middleware.auth import verify_token, AuthError
+from services.permissions import permissions
+from config import Config
+
+logger = logging.getLogger("seaweed-flask")
+
+ALL_DEVICES = None # Super admin and uploaders: every device, as over HTTP (require_uploader)
+
+
+class SocketSession:
+    __slots__ = ("user_id", "device_ids", "denied")
+
+    def __init__(self, user_id, device_ids):
+        self.user_id = user_id
+        self.device_ids = device_ids
+        self.denied = {} # device_id -> monotonic time until which a failed join is not re-checked
+
+    def allows(self, device_id):
+        return self.device_ids is ALL_DEVICES or device_id in self.device_ids
+
+
+def token_from(auth, headers):
+    """Authorization header value from the Socket.IO `auth` payload or the handshake headers."""
+    token = auth.get("token") if isinstance(auth, dict) else None
+    if token:
+        return token if token.startswith("Bearer ") else f"Bearer {token}"
+    return headers.get("Authorization")
+
+
+class SocketSessions:
+    """
+    Per-connection identity for the streaming namespaces.
+
+    The token is verified once, on connect, through the same path as
+    require_auth; the user_id and the devices it may reach (every device for
+    uploaders, otherwise the ones it owns) are then kept per SID,
+    so high-rate events (input, output, resize, frame) are authorized with a
+    dictionary lookup instead of an auth service round trip.
+
+    When a device changes owner (permissions.device_owner_changed), every
+    session holding it loses it, and the namespace's revoke hook takes the
+    socket out of that device's rooms.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {} # (namespace, sid) -> SocketSession
+        self._revoke_hooks = {} # namespace -> fn(sid, device_id)
+
+    def on_revoke(self, namespace, hook):
+        """Registers hook(sid, device_id), called when a socket in `namespace` loses a device."""
+        self._revoke_hooks[namespace] = hook
+
+    def authenticate(self, namespace, sid, auth_header):
+        """Verifies the token and binds the session. Raises AuthError."""
+        user_id = verify_token(auth_header)
+        permissions.listen() # Ownership changes made by other workers
+        session = SocketSession(user_id, self._owned_devices(user_id))
+        with self._lock:
+            self._sessions[(namespace, sid)] = session
+        return session
+
+    def get(self, namespace, sid):
+        return self._sessions.get((namespace, sid))
+
+    def allows(self, namespace, sid, device_id):
+        session = self._sessions.get((namespace, sid))
+        return session is not None and session.allows(device_id)
+
+    def authorize_join(self, namespace, sid, device_id):
+        """
+        Like allows(), but re-reads ownership on a miss: the device may have been
+        registered after this socket connected. Joins are rare, so the query
+        stays off the streaming path.
+        """
+        session = self._sessions.get((namespace, sid))
+        if session is None:
+            return False
+        if session.allows(device_id):
+            return True
+        # Misses are remembered briefly, so repeated joins for a device the user
+        # does not own don't each cost a query
+        if session.denied.get(device_id, 0) > time.monotonic():
+            return False
+        owned = self._owned_devices(session.user_id)
+        with self._lock:
+            session.device_ids = owned
+            if not session.allows(device_id):
+                session.denied[device_id] = time.monotonic() + Config.SOCKET_OWNERSHIP_MISS_TTL_SECONDS
+        return session.allows(device_id)
+
+    def device_owner_changed(self, device_id):
+        """Revokes `device_id` from every session here (the new owner gets it on their next join)."""
+        revoked = []
+        with self._lock:
+            for (namespace, sid), session in self._sessions.items():
+                session.denied.pop(device_id, None)
+                if session.device_ids is not ALL_DEVICES and device_id in session.device_ids:
+                    session.device_ids = session.device_ids - {device_id}
+                    revoked.append((namespace, sid))
+        for namespace, sid in revoked:
+            logger.info(f"Revoked {device_id} from {namespace} connection {sid}")
+            hook = self._revoke_hooks.get(namespace)
+            if hook is not None:
+                hook(sid, device_id)
+
+    def drop(self, namespace, sid):
+        with self._lock:
+            self._sessions.pop((namespace, sid), None)
+
+    def _owned_devices(self, user_id):
+        if permissions.is_uploader(user_id):
+            return ALL_DEVICES
+        rows = db.session.query(Device.device_id).filter(Device.user_id == user_id).all()
+        return frozenset(device_id for (device_id,) in rows)
+
+
+socket_sessions = SocketSessions()
+permissions.on_device_owner_changed(socket_sessions.device_owner_changed)
+
+
+def authenticate_connect(namespace, sid, auth, headers):
+    """
+    Connect-handler helper: binds the session or refuses the connection.
+    Raising ConnectionRefusedError makes Flask-SocketIO reject the handshake.
+    """
+    try:
+        return socket_sessions.authenticate(namespace, sid, token_from(auth, headers))
+    except AuthError as e:
+        logger.warning(f"Refused {namespace} connection {sid}: {e.message}")
+        raise ConnectionRefusedError(e.message)
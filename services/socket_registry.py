@@ -0,0 +1,304 @@
+import os
+import time
+import uuid
+import socket
+import threading
+import logging
+from config import Config
+
+logger = logging.getLogger("seaweed-flask")
+
+
+class SocketRegistry:
+    """
+    Bidirectional sid <-> device_id index for the Socket.IO namespaces.
+
+    Each namespace keeps the authoritative SID per device plus the reverse
+    mapping, so disconnect cleanup is O(devices bound to that SID) instead of
+    a scan over every connected device. Named member groups (e.g. the legacy
+    terminal room) are tracked the same way.
+
+    This in-process implementation is used for single-worker deployments and
+    tests; RedisSocketRegistry shares the same state across workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = {}     # namespace -> set of SIDs
+        self._sid_by_device = {}   # namespace -> {device_id: sid}
+        self._devices_by_sid = {}  # namespace -> {sid: set of device_ids}
+        self._members = {}         # namespace -> {group: set of SIDs}
+        self._groups_by_sid = {}   # namespace -> {sid: set of groups}
+
+    def connect(self, namespace, sid):
+        with self._lock:
+            self._connections.setdefault(namespace, set()).add(sid)
+
+    def disconnect(self, namespace, sid):
+        """Forgets the SID and returns the device_ids it was authoritative for."""
+        with self._lock:
+            self._connections.get(namespace, set()).discard(sid)
+            devices = self._devices_by_sid.get(namespace, {}).pop(sid, set())
+            sid_by_device = self._sid_by_device.get(namespace, {})
+            for device_id in devices:
+                if sid_by_device.get(device_id) == sid:
+                    del sid_by_device[device_id]
+
+            members = self._members.get(namespace, {})
+            for group in self._groups_by_sid.get(namespace, {}).pop(sid, set()):
+                _discard(members, group, sid)
+            return list(devices)
+
+    def bind(self, namespace, device_id, sid):
+        """Makes `sid` the authoritative connection for `device_id`."""
+        with self._lock:
+            sid_by_device = self._sid_by_device.setdefault(namespace, {})
+            devices_by_sid = self._devices_by_sid.setdefault(namespace, {})
+
+            previous = sid_by_device.get(device_id)
+            if previous is not None and previous != sid:
+                _discard(devices_by_sid, previous, device_id)
+
+            sid_by_device[device_id] = sid
+            devices_by_sid.setdefault(sid, set()).add(device_id)
+
+    def get_sid(self, namespace, device_id):
+        return self._sid_by_device.get(namespace, {}).get(device_id)
+
+    def add_member(self, namespace, group, sid):
+        with self._lock:
+            self._members.setdefault(namespace, {}).setdefault(group, set()).add(sid)
+            self._groups_by_sid.setdefault(namespace, {}).setdefault(sid, set()).add(group)
+
+    def remove_member(self, namespace, group, sid):
+        with self._lock:
+            _discard(self._members.get(namespace, {}), group, sid)
+            _discard(self._groups_by_sid.get(namespace, {}), sid, group)
+
+    def has_members(self, namespace, group):
+        return bool(self._members.get(namespace, {}).get(group))
+
+    def connection_count(self, namespace):
+        return len(self._connections.get(namespace, ()))
+
+    def stats(self):
+        with self._lock:
+            namespaces = set(self._connections) | set(self._sid_by_device)
+            return {
+                namespace: {
+                    "connections": len(self._connections.get(namespace, ())),
+                    "devices": len(self._sid_by_device.get(namespace, {}))
+                }
+                for namespace in sorted(namespaces)
+            }
+
+
+def _discard(index, key, value):
+    values = index.get(key)
+    if values is not None:
+        values.discard(value)
+        if not values:
+            del index[key]
+
+
+# Every key a script touches is passed in KEYS, and all of them carry the
+# namespace's hash tag, so each script runs on a single Redis Cluster slot.
+# Keys that depend on state (the previous SID, the SID's groups) are read
+# first; the script re-checks that state and returns false if it changed, and
+# the caller retries.
+
+# KEYS: dev2sid hash, sid's device set, previous sid's device set
+# ARGV: device_id, sid, previous sid as read ("" if none)
+_BIND_SCRIPT = """
+local prev = redis.call('HGET', KEYS[1], ARGV[1]) or ''
+if prev ~= ARGV[3] then
+    return false
+end
+if prev ~= '' and prev ~= ARGV[2] then
+    redis.call('SREM', KEYS[3], ARGV[1])
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('SADD', KEYS[2], ARGV[1])
+return 1
+"""
+
+# KEYS: connections set, dev2sid hash, sid's device set, sid's group set, worker's sid set, member set per group
+# ARGV: sid, then the groups as read (matching the member sets in KEYS)
+_DISCONNECT_SCRIPT = """
+if redis.call('SCARD', KEYS[4]) ~= #ARGV - 1 then
+    return false
+end
+for i = 2, #ARGV do
+    if redis.call('SISMEMBER', KEYS[4], ARGV[i]) == 0 then
+        return false
+    end
+end
+redis.call('SREM', KEYS[1], ARGV[1])
+redis.call('SREM', KEYS[5], ARGV[1])
+local devices = redis.call('SMEMBERS', KEYS[3])
+for _, device_id in ipairs(devices) do
+    if redis.call('HGET', KEYS[2], device_id) == ARGV[1] then
+        redis.call('HDEL', KEYS[2], device_id)
+    end
+end
+for i = 6, #KEYS do
+    redis.call('SREM', KEYS[i], ARGV[1])
+end
+redis.call('DEL', KEYS[3], KEYS[4])
+return devices
+"""
+
+
+class RedisSocketRegistry:
+    """
+    SocketRegistry backed by Redis so every worker and node agrees on the
+    authoritative SID per device. Keys for one namespace share a hash tag,
+    and the scripts declare every key they touch, so they run on Redis
+    Cluster too.
+
+    Each worker also records the SIDs it accepted and heartbeats (see
+    run_heartbeat). A worker that dies without running its disconnect
+    handlers stops heartbeating, and reap() releases its SIDs once it has
+    been silent for SOCKET_REGISTRY_WORKER_TIMEOUT_SECONDS.
+    """
+
+    def __init__(self, client, prefix="sockreg"):
+        self.redis = client
+        self.prefix = prefix
+        self._bind = client.register_script(_BIND_SCRIPT)
+        self._disconnect = client.register_script(_DISCONNECT_SCRIPT)
+        self._pid = None
+        self._worker_id = None
+
+    @property
+    def worker_id(self):
+        # Per process: the registry may be created before gunicorn forks its workers
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._worker_id = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+        return self._worker_id
+
+    def _key(self, namespace, *parts):
+        return ":".join((self.prefix, "{" + namespace + "}") + parts)
+
+    def connect(self, namespace, sid):
+        pipe = self.redis.pipeline()
+        pipe.sadd(f"{self.prefix}:namespaces", namespace)
+        pipe.sadd(self._key(namespace, "conns"), sid)
+        pipe.sadd(self._key(namespace, "worker", self.worker_id), sid)
+        pipe.execute()
+
+    def disconnect(self, namespace, sid):
+        return self._release(namespace, sid, self.worker_id)
+
+    def _release(self, namespace, sid, worker_id):
+        while True:
+            groups = sorted(self.redis.smembers(self._key(namespace, "groups", sid)))
+            devices = self._disconnect(
+                keys=[
+                    self._key(namespace, "conns"),
+                    self._key(namespace, "dev2sid"),
+                    self._key(namespace, "sid", sid),
+                    self._key(namespace, "groups", sid),
+                    self._key(namespace, "worker", worker_id),
+                ] + [self._key(namespace, "members", group) for group in groups],
+                args=[sid] + groups
+            )
+            if devices is not None:
+                return devices
+
+    def bind(self, namespace, device_id, sid):
+        self.redis.sadd(f"{self.prefix}:namespaces", namespace)
+        dev2sid = self._key(namespace, "dev2sid")
+        while True:
+            previous = self.redis.hget(dev2sid, device_id) or ""
+            if self._bind(
+                keys=[dev2sid, self._key(namespace, "sid", sid), self._key(namespace, "sid", previous or sid)],
+                args=[device_id, sid, previous]
+            ):
+                return
+
+    def heartbeat(self, now=None):
+        self.redis.zadd(f"{self.prefix}:workers", {self.worker_id: now if now is not None else time.time()})
+
+    def reap(self, max_age, now=None):
+        """Releases the SIDs of workers silent for `max_age` seconds. Returns how many."""
+        now = now if now is not None else time.time()
+        workers_key = f"{self.prefix}:workers"
+        released = 0
+        for worker_id in self.redis.zrangebyscore(workers_key, "-inf", now - max_age):
+            sids = 0
+            for namespace in self.redis.smembers(f"{self.prefix}:namespaces"):
+                worker_key = self._key(namespace, "worker", worker_id)
+                for sid in self.redis.smembers(worker_key):
+                    self._release(namespace, sid, worker_id)
+                    sids += 1
+                self.redis.delete(worker_key)
+            self.redis.zrem(workers_key, worker_id)
+            logger.warning(f"Released {sids} socket(s) of unresponsive worker {worker_id}")
+            released += sids
+        return released
+
+    def get_sid(self, namespace, device_id):
+        return self.redis.hget(self._key(namespace, "dev2sid"), device_id)
+
+    def add_member(self, namespace, group, sid):
+        pipe = self.redis.pipeline()
+        pipe.sadd(self._key(namespace, "members", group), sid)
+        pipe.sadd(self._key(namespace, "groups", sid), group)
+        pipe.execute()
+
+    def remove_member(self, namespace, group, sid):
+        pipe = self.redis.pipeline()
+        pipe.srem(self._key(namespace, "members", group), sid)
+        pipe.srem(self._key(namespace, "groups", sid), group)
+        pipe.execute()
+
+    def has_members(self, namespace, group):
+        return bool(self.redis.exists(self._key(namespace, "members", group)))
+
+    def connection_count(self, namespace):
+        return self.redis.scard(self._key(namespace, "conns"))
+
+    def stats(self):
+        namespaces = sorted(self.redis.smembers(f"{self.prefix}:namespaces"))
+        pipe = self.redis.pipeline()
+        for namespace in namespaces:
+            pipe.scard(self._key(namespace, "conns"))
+            pipe.hlen(self._key(namespace, "dev2sid"))
+        counts = pipe.execute()
+        return {
+            namespace: {"connections": counts[2 * i], "devices": counts[2 * i + 1]}
+            for i, namespace in enumerate(namespaces)
+        }
+
+
+def run_heartbeat(registry, socketio):
+    """Per worker: heartbeat, and release the SIDs of workers that stopped heartbeating."""
+    logger.info(f"Socket registry heartbeat started for worker {registry.worker_id}")
+    while True:
+        try:
+            registry.heartbeat()
+            registry.reap(Config.SOCKET_REGISTRY_WORKER_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.error(f"Socket registry heartbeat failed: {e}")
+        socketio.sleep(Config.SOCKET_REGISTRY_HEARTBEAT_SECONDS)
+
+
+def start_heartbeat(socketio):
+    # The in-process registry dies with its worker; only the shared one needs reaping
+    if isinstance(socket_registry, RedisSocketRegistry):
+        socketio.start_background_task(run_heartbeat, socket_registry, socketio)
+
+
+def create_socket_registry(redis_url=None):
+    if not redis_url:
+        return SocketRegistry()
+
+    # Optional dependency: only needed for multi-worker deployments
+    import redis
+    logger.info("Using Redis socket registry")
+    return RedisSocketRegistry(redis.Redis.from_url(redis_url, decode_responses=True))
+
+
+socket_registry = create_socket_registry(Config.REDIS_URL)
@@ -0,0 +1,140 @@
+import hashlib
+import logging
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData
+from config import Config
+from services.s3_service import s3_service
+
+logger = logging.getLogger("seaweed-flask")
+
+READ_CHUNK_BYTES = 64 * 1024
+MIN_PART_BYTES = 5 * 1024 * 1024 # S3 minimum for every part but the last
+MAX_PARTS = 10000
+
+
+class UploadError(ValueError):
+    """The request body was not an acceptable upload (HTTP 400)."""
+
+
+class StreamingUpload:
+    """
+    Writes a stream of chunks to one S3 object without holding it in memory.
+
+    Data is buffered up to one part (UPLOAD_PART_SIZE_BYTES) at a time; the
+    first full part starts a multipart upload and each further part is sent
+    as soon as it fills. Objects smaller than one part are sent with a single
+    PUT. SHA-256 and size are computed as the bytes pass through.
+    """
+
+    def __init__(self, key, content_type="application/octet-stream", part_size=None):
+        self.key = key
+        self.content_type = content_type
+        self.part_size = max(part_size or Config.UPLOAD_PART_SIZE_BYTES, MIN_PART_BYTES)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    def write(self, data):
+        if not data:
+            return
+        self.sha256.update(data)
+        self.size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._upload_part(part)
+
+    def _upload_part(self, body):
+        s3 = s3_service.s3
+        if not s3:
+            raise Exception("S3 client not initialized")
+        if self._upload_id is None:
+            self._upload_id = s3.create_multipart_upload(
+                Bucket=Config.S3_BUCKET, Key=self.key, ContentType=self.content_type
+            )["UploadId"]
+        part_number = len(self._parts) + 1
+        if part_number > MAX_PARTS:
+            raise UploadError("File too large")
+        resp = s3.upload_part(Bucket=Config.S3_BUCKET, Key=self.key, UploadId=self._upload_id,
+                              PartNumber=part_number, Body=body)
+        self._parts.append({"PartNumber": part_number, "ETag": resp["ETag"]})
+
+    def complete(self, expected_sha256=None):
+        """
+        Flushes the last part and makes the object visible. With expected_sha256,
+        a mismatch aborts the upload instead, so a corrupt file is never stored.
+        """
+        digest = self.sha256.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != digest:
+            self.abort()
+            raise UploadError(f"SHA-256 mismatch: received {digest}")
+
+        if self._upload_id is None:
+            s3_service.put_bytes(self.key, bytes(self._buffer), self.content_type)
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            s3_service.s3.complete_multipart_upload(
+                Bucket=Config.S3_BUCKET, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts}
+            )
+        self._buffer = bytearray()
+        return digest
+
+    def abort(self):
+        """Discards uploaded parts so they do not linger (and count) in the bucket."""
+        self._buffer = bytearray()
+        if self._upload_id is None:
+            return
+        try:
+            s3_service.s3.abort_multipart_upload(Bucket=Config.S3_BUCKET, Key=self.key, UploadId=self._upload_id)
+        except Exception as e:
+            logger.error(f"Failed to abort multipart upload {self._upload_id} for {self.key}: {e}")
+        self._upload_id = None
+
+
+def iter_stream(stream, chunk_size=READ_CHUNK_BYTES):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_multipart_file(stream, boundary, field="file"):
+    """
+    Yields (filename, content_type) once for the first file part named `field`,
+    then that part's bytes as they are parsed from `stream`. Other form fields
+    are skipped without being buffered.
+    """
+    decoder = MultipartDecoder(boundary.encode(), max_form_memory_size=READ_CHUNK_BYTES)
+    in_file = found = False
+    chunks = iter_stream(stream)
+    try:
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, NeedData):
+                decoder.receive_data(next(chunks, None))
+            elif isinstance(event, File):
+                in_file = not found and event.name == field
+                if in_file:
+                    found = True
+                    yield event.filename, event.headers.get("Content-Type")
+            elif isinstance(event, Field):
+                in_file = False
+            elif isinstance(event, Data):
+                if in_file:
+                    yield event.data
+                    in_file = event.more_data
+            elif isinstance(event, Epilogue):
+                break
+    except UploadError:
+        raise
+    except ValueError as e:
+        # Truncated body, bad boundary, oversized form field
+        raise UploadError(f"Malformed multipart body: {e}")
+
+    if not found:
+        raise UploadError(f"multipart body has no '{field}' file part")
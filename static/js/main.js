@@ -93,6 +93,22 @@ async function apiCall(endpoint, options = {}) {
     return response;
 }
 
+// Fetches every page of a keyset-paginated list endpoint (pages are linked by X-Next-Cursor).
+// `itemsOf` picks the list out of each page's body, for endpoints that wrap it in an object.
+// Returns the concatenated array, or null if any request failed.
+async function apiCallAll(endpoint, itemsOf = data => data) {
+    const items = [];
+    let cursor = null;
+    do {
+        const sep = endpoint.includes('?') ? '&' : '?';
+        const res = await apiCall(cursor ? `${endpoint}${sep}cursor=${encodeURIComponent(cursor)}` : endpoint);
+        if (!res || !res.ok) return null;
+        items.push(...itemsOf(await res.json()));
+        cursor = res.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return items;
+}
+
 // --- Common UI Helpers ---
 
 function openModal(id) {
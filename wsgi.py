@@ -0,0 +1,55 @@
+"""
+Production entry point.
+
+    python wsgi.py                          # single async worker
+    gunicorn -c gunicorn.conf.py wsgi:app   # same, managed by gunicorn
+
+Monkey-patching has to happen before anything imports sockets, threading or
+psycopg2, so this module patches first and only then builds the app.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ASYNC_MODE = os.getenv("ASYNC_MODE") or "eventlet"
+
+if ASYNC_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+    from psycogreen.eventlet import patch_psycopg
+elif ASYNC_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+else:
+    raise RuntimeError(f"Unsupported ASYNC_MODE for production serving: {ASYNC_MODE}")
+
+# psycopg2 is a C extension, so it needs its own wait callback to yield to the
+# hub instead of blocking the whole worker. requests and boto3 use the patched
+# socket module and are cooperative once monkey_patch() has run.
+patch_psycopg()
+
+from config import Config
+Config.ASYNC_MODE = ASYNC_MODE
+
+from app import create_app, socketio
+from services.device_sweeper import start_sweeper
+from services.socket_registry import start_heartbeat
+
+app = create_app()
+# One per worker; a PostgreSQL advisory lock keeps all but one idle
+start_sweeper(app, socketio)
+start_heartbeat(socketio)
+
+
+def server_options():
+    """Connection limits for the underlying eventlet / gevent WSGI server."""
+    if ASYNC_MODE == "eventlet":
+        return {"max_size": Config.WORKER_CONNECTIONS}
+    from gevent.pool import Pool
+    return {"spawn": Pool(Config.WORKER_CONNECTIONS)}
+
+
+if __name__ == "__main__":
+    socketio.run(app, host="0.0.0.0", port=Config.FLASK_PORT, **server_options())